@@ -1,7 +1,11 @@
 """Authentication utilities and dependencies for JWT-based auth."""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Any
+from typing import Any, Callable, TypeVar
 import hashlib
+import time
+from fastapi_cache import FastAPICache
 from fastapi_cache.decorator import cache
 
 from fastapi import Depends, HTTPException, status
@@ -10,18 +14,31 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.cache import remember_user_token, token_cache, wrote_recently
 from app.config import settings
-from app.db import get_session
+from app.db import get_session, open_read_session
+from app.metrics import record_cache_lookup
 from app.repositories.users import get_user_by_id
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
+# bcrypt releases the GIL while hashing, so a small thread pool keeps the
+# ~100-300 ms of work per call off the event loop without process overhead.
+_hash_executor: ThreadPoolExecutor | None = None
+_hasher_stats = {"in_flight": 0, "completed": 0, "wait_seconds": 0.0}
+
+T = TypeVar("T")
+
+
+def _token_digest(token: str) -> str:
+    return hashlib.sha256(str(token).encode("utf-8")).hexdigest()
+
 
 def _user_cache_key_builder(func, namespace, request, response, args, kwargs) -> str:
     token = kwargs.get("token") or (args[0] if args else "")
     try:
-        key = hashlib.sha256(str(token).encode("utf-8")).hexdigest()
+        key = _token_digest(token)
     except Exception:
         key = "invalid"
     return f"{namespace}:user:{key}"
@@ -52,6 +69,85 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def password_hasher_stats() -> dict[str, Any]:
+    """Return queue-depth and throughput counters of the password hasher pool.
+
+    Returns:
+        Mapping with pool size, calls in flight, calls waiting for a free
+        worker, completed calls and total seconds spent waiting in the queue.
+    """
+    workers = settings.password_hash_workers
+    in_flight = _hasher_stats["in_flight"]
+    return {
+        "workers": workers,
+        "in_flight": in_flight,
+        "queued": max(0, in_flight - workers),
+        "completed": _hasher_stats["completed"],
+        "wait_seconds_total": round(_hasher_stats["wait_seconds"], 6),
+    }
+
+
+def _get_hash_executor() -> ThreadPoolExecutor:
+    global _hash_executor
+    if _hash_executor is None:
+        _hash_executor = ThreadPoolExecutor(
+            max_workers=settings.password_hash_workers, thread_name_prefix="bcrypt"
+        )
+    return _hash_executor
+
+
+def shutdown_password_hasher() -> None:
+    """Stop the bcrypt worker threads, if started; queued calls are cancelled."""
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=False, cancel_futures=True)
+        _hash_executor = None
+
+
+async def _run_in_hasher(func: Callable[..., T], *args: Any) -> T:
+    submitted = time.perf_counter()
+
+    def run() -> tuple[T, float]:
+        # Counters are only mutated on the event loop thread
+        waited = time.perf_counter() - submitted
+        return func(*args), waited
+
+    _hasher_stats["in_flight"] += 1
+    try:
+        loop = asyncio.get_running_loop()
+        result, waited = await loop.run_in_executor(_get_hash_executor(), run)
+    finally:
+        _hasher_stats["in_flight"] -= 1
+    _hasher_stats["completed"] += 1
+    _hasher_stats["wait_seconds"] += waited
+    return result
+
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password in the bcrypt worker pool without blocking the event loop.
+
+    Args:
+        password: Plain-text password.
+
+    Returns:
+        Hashed password string suitable for storage.
+    """
+    return await _run_in_hasher(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password in the bcrypt worker pool without blocking the event loop.
+
+    Args:
+        plain_password: Password provided by the user.
+        hashed_password: Stored bcrypt hash.
+
+    Returns:
+        True if the password matches the hash, otherwise False.
+    """
+    return await _run_in_hasher(verify_password, plain_password, hashed_password)
+
+
 def create_access_token(
     data: dict[str, Any], expires_minutes: int | None = None
 ) -> str:
@@ -124,17 +220,8 @@ def decode_token(token: str) -> dict[str, Any]:
     key_builder=_user_cache_key_builder,
     namespace="auth",
 )
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    session: AsyncSession = Depends(get_session),
-):
-    """FastAPI dependency that returns the current authenticated user.
-
-    Uses Redis to cache user info per access token when REDIS_URL is configured.
-    Cache TTL is aligned to the JWT access token expiry.
-    """
-    # cache handled by fastapi-cache2 via decorator
-
+async def _load_current_user(token: str, session: AsyncSession) -> dict[str, Any]:
+    """Validate the token and load the user snapshot (Redis-cached when configured)."""
     # Decode token (still required to validate and to compute TTL)
     payload = decode_token(token)
     sub = payload.get("sub")
@@ -169,3 +256,48 @@ async def get_current_user(
         else None,
     }
     return snapshot
+
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    session: AsyncSession = Depends(get_session),
+):
+    """FastAPI dependency that returns the current authenticated user.
+
+    Snapshots are cached per access token in process (bounded LRU with a short
+    TTL, never past the token expiry) in front of the Redis cache, whose TTL is
+    aligned to the JWT access token expiry. Both layers are invalidated when
+    the user changes; see :func:`app.cache.invalidate_user`.
+    """
+    digest = _token_digest(token)
+    snapshot = token_cache.get(digest)
+    record_cache_lookup("auth", "local", snapshot is not None)
+    if snapshot is not None:
+        return snapshot
+
+    snapshot = await _load_current_user(token=token, session=session)
+    # The signature was verified above (or when the Redis entry was written)
+    exp = jwt.get_unverified_claims(token).get("exp")
+    ttl = exp - time.time() if exp is not None else None
+    token_cache.set(digest, snapshot, ttl)
+    await remember_user_token(
+        snapshot["id"],
+        f"{FastAPICache.get_prefix()}:auth:user:{digest}",
+        settings.access_token_expire_minutes * 60,
+    )
+    return snapshot
+
+
+async def get_read_session(current_user=Depends(get_current_user)):
+    """FastAPI dependency that provides an AsyncSession for read-only routes.
+
+    The session is bound to a read replica when DATABASE_REPLICA_URLS is
+    configured, except within READ_YOUR_WRITES_SECONDS after the current user
+    changed contacts, so users always see their own writes.
+
+    Yields:
+        AsyncSession: Replica or primary database session.
+    """
+    use_primary = await wrote_recently(int(current_user["id"]))
+    async with await open_read_session(use_primary) as session:
+        yield session
@@ -0,0 +1,320 @@
+"""Shared Redis client, the in-process user cache and contact response caching."""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any
+
+from fastapi_cache import FastAPICache
+from redis.asyncio import Redis
+
+from app.config import settings
+from app.metrics import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+# Set by the application lifespan when REDIS_URL is configured.
+redis_client: Redis | None = None
+
+# Pub/sub channel announcing user IDs whose cached snapshots are stale.
+USER_CHANGED_CHANNEL = "contacts-cache:user-changed"
+
+def _user_tokens_key(user_id: int) -> str:
+    return f"contacts-cache:auth:tokens:{user_id}"
+
+
+class TokenCache:
+    """Bounded LRU of token digest -> user snapshot with per-entry expiry.
+
+    Keeps a reverse index of digests per user so every cached token of a
+    user can be dropped at once. Not thread-safe; use from the event loop.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, dict[str, Any]]] = OrderedDict()
+        self._by_user: dict[int, set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        """Return the cached snapshot for ``key`` if present and not expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, snapshot = entry
+        if expires_at <= time.monotonic():
+            self._discard(key)
+            return None
+        self._entries.move_to_end(key)
+        return snapshot
+
+    def set(self, key: str, snapshot: dict[str, Any], ttl: float | None = None) -> None:
+        """Cache ``snapshot`` under ``key`` for ``ttl`` seconds (capped at self.ttl)."""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        self._discard(key)
+        self._entries[key] = (time.monotonic() + ttl, snapshot)
+        self._by_user.setdefault(snapshot["id"], set()).add(key)
+        while len(self._entries) > self.maxsize:
+            self._discard(next(iter(self._entries)))
+
+    def evict_user(self, user_id: int) -> None:
+        """Drop every cached token of the given user."""
+        for key in self._by_user.pop(user_id, set()):
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._by_user.clear()
+
+    def _discard(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        user_id = entry[1]["id"]
+        keys = self._by_user.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[user_id]
+
+
+token_cache = TokenCache(
+    maxsize=settings.auth_cache_size, ttl=settings.auth_cache_ttl_seconds
+)
+
+
+async def remember_user_token(user_id: int, redis_key: str, ttl: int) -> None:
+    """Record an auth cache key under its user so it can be invalidated.
+
+    Only needed with Redis: the in-process backend is not indexed, as
+    :func:`invalidate_user` clears its whole auth namespace instead.
+
+    Args:
+        user_id: Owner of the cached snapshot.
+        redis_key: Full key of the snapshot in the fastapi-cache auth namespace.
+        ttl: Seconds the snapshot lives in the cache backend.
+    """
+    if redis_client is None:
+        return
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            tokens_key = _user_tokens_key(user_id)
+            await pipe.sadd(tokens_key, redis_key).expire(tokens_key, ttl).execute()
+    except Exception:
+        logger.warning("Failed to index auth cache key for user %s", user_id, exc_info=True)
+
+
+async def invalidate_user(user_id: int) -> None:
+    """Drop cached snapshots of a user in this process, Redis and other workers.
+
+    Call after committing any change that is visible in the user snapshot.
+
+    Args:
+        user_id: ID of the changed user.
+    """
+    token_cache.evict_user(user_id)
+    if redis_client is None:
+        try:
+            backend, prefix = FastAPICache.get_backend(), FastAPICache.get_prefix()
+        except AssertionError:  # fastapi-cache not initialised, nothing cached
+            return
+        # Users change rarely, so dropping every snapshot is cheaper than
+        # indexing each token of each user in memory
+        await backend.clear(namespace=f"{prefix}:auth:")
+        return
+    tokens_key = _user_tokens_key(user_id)
+    try:
+        keys = await redis_client.smembers(tokens_key)
+        async with redis_client.pipeline(transaction=False) as pipe:
+            await pipe.delete(tokens_key, *keys).publish(
+                USER_CHANGED_CHANNEL, user_id
+            ).execute()
+    except Exception:
+        logger.warning("Failed to invalidate cached user %s", user_id, exc_info=True)
+
+
+async def listen_for_user_changes(client: Redis) -> None:
+    """Evict users announced on the pub/sub channel until cancelled.
+
+    The local cache is cleared whenever the subscription is (re)established,
+    since invalidations published while disconnected were missed.
+    """
+    while True:
+        try:
+            async with client.pubsub() as pubsub:
+                await pubsub.subscribe(USER_CHANGED_CHANNEL)
+                token_cache.clear()
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        token_cache.evict_user(int(message["data"]))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.warning("User invalidation listener failed; retrying", exc_info=True)
+            await asyncio.sleep(1)
+
+
+def _contacts_version_key(user_id: int) -> str:
+    return f"contacts-cache:contacts:{user_id}:version"
+
+
+async def contacts_version(user_id: int) -> int | None:
+    """Return the user's contacts generation counter.
+
+    The counter is bumped by :func:`bump_contacts_version` after every
+    committed change to the user's contacts, so it identifies a state of
+    the contacts for cache keys and ETags.
+
+    Args:
+        user_id: Owner of the contacts.
+
+    Returns:
+        The generation, or None when Redis is not configured or unreachable.
+    """
+    if redis_client is None:
+        return None
+    try:
+        version = await redis_client.get(_contacts_version_key(user_id))
+    except Exception:
+        logger.warning("Failed to read contacts version of user %s", user_id, exc_info=True)
+        return None
+    return int(version or 0)
+
+
+def contacts_cache_key(
+    user_id: int, version: int | None, path: str, params: list[tuple[str, str]]
+) -> str | None:
+    """Build the response cache key of a contact read for a generation.
+
+    Keys embed the user's generation counter, so bumping the counter makes
+    every older entry unreachable at once; stale entries simply expire.
+
+    Args:
+        user_id: Owner of the contacts.
+        version: Generation from :func:`contacts_version`.
+        path: Request path.
+        params: Query parameters of the request.
+
+    Returns:
+        Cache key, or None when response caching is unavailable.
+    """
+    if version is None or settings.contacts_cache_ttl_seconds <= 0:
+        return None
+    query = "&".join(f"{k}={v}" for k, v in sorted(params))
+    digest = hashlib.sha256(f"{path}?{query}".encode("utf-8")).hexdigest()
+    return f"contacts-cache:contacts:{user_id}:v{version}:{digest}"
+
+
+async def bump_contacts_version(user_id: int) -> None:
+    """Invalidate every cached contact read of a user.
+
+    Call after committing any change to the user's contacts. Also starts the
+    user's read-your-writes window (see :func:`wrote_recently`).
+
+    Args:
+        user_id: Owner of the changed contacts.
+    """
+    await _mark_recent_write(user_id)
+    if redis_client is None:
+        return
+    try:
+        await redis_client.incr(_contacts_version_key(user_id))
+    except Exception:
+        logger.warning("Failed to bump contacts version of user %s", user_id, exc_info=True)
+
+
+async def get_cached_response(key: str) -> tuple[bytes, dict[str, str]] | None:
+    """Return the cached ``(body, headers)`` stored under ``key``, if any."""
+    if redis_client is None:
+        return None
+    try:
+        raw = await redis_client.get(key)
+    except Exception:
+        logger.warning("Failed to read cached response %s", key, exc_info=True)
+        return None
+    record_cache_lookup("contacts", "backend", raw is not None)
+    if raw is None:
+        return None
+    entry = json.loads(raw)
+    return entry["b"].encode("utf-8"), entry["h"]
+
+
+async def set_cached_response(key: str, body: bytes, headers: dict[str, str], ttl: int) -> None:
+    """Store a JSON response body and its headers for ``ttl`` seconds."""
+    if redis_client is None or ttl <= 0:
+        return
+    entry = json.dumps({"b": body.decode("utf-8"), "h": headers})
+    try:
+        await redis_client.set(key, entry, ex=ttl)
+    except Exception:
+        logger.warning("Failed to cache response %s", key, exc_info=True)
+
+
+def seconds_until_midnight(now: datetime | None = None) -> int:
+    """Seconds left until the next local midnight (at least 1)."""
+    now = now or datetime.now()
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return max(1, int((midnight - now).total_seconds()))
+
+
+def _recent_write_key(user_id: int) -> str:
+    return f"contacts-cache:contacts:{user_id}:recent-write"
+
+
+# Read-your-writes deadlines (monotonic) of users who wrote via this process.
+_local_recent_writes: dict[int, float] = {}
+
+
+async def _mark_recent_write(user_id: int) -> None:
+    window = settings.read_your_writes_seconds
+    if not settings.replica_urls or window <= 0:
+        return
+    now = time.monotonic()
+    if len(_local_recent_writes) > 10_000:
+        for uid, deadline in list(_local_recent_writes.items()):
+            if deadline <= now:
+                del _local_recent_writes[uid]
+    _local_recent_writes[user_id] = now + window
+    if redis_client is None:
+        return
+    try:
+        await redis_client.set(_recent_write_key(user_id), 1, px=int(window * 1000))
+    except Exception:
+        logger.warning("Failed to mark recent write of user %s", user_id, exc_info=True)
+
+
+async def wrote_recently(user_id: int) -> bool:
+    """Tell whether a user wrote contacts within the read-your-writes window.
+
+    Checks this process first and then Redis, so writes handled by other
+    workers are seen too.
+
+    Args:
+        user_id: User to check.
+
+    Returns:
+        True if the user's reads should go to the primary database.
+    """
+    if not settings.replica_urls:
+        return False
+    deadline = _local_recent_writes.get(user_id)
+    if deadline is not None:
+        if deadline > time.monotonic():
+            return True
+        del _local_recent_writes[user_id]
+    if redis_client is None:
+        return False
+    try:
+        return bool(await redis_client.exists(_recent_write_key(user_id)))
+    except Exception:
+        logger.warning("Failed to check recent writes of user %s", user_id, exc_info=True)
+        # Err on the side of consistency
+        return True
@@ -1,16 +1,78 @@
 """Database session and engine configuration."""
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+import itertools
+import logging
+import time
+from typing import Any
+
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 from .config import settings
 
+logger = logging.getLogger(__name__)
+
 DATABASE_URL = settings.database_url
 
-engine = create_async_engine(DATABASE_URL, echo=False, future=True)
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records how long checkouts take.
+
+    The acquire time covers waiting for a free connection, opening overflow
+    connections and pre-ping, i.e. everything a request waits for before its
+    first query can be sent.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.acquire_count = 0
+        self.acquire_seconds_total = 0.0
+        self.acquire_seconds_max = 0.0
+        self.acquire_timeouts = 0
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            self.acquire_timeouts += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self.acquire_count += 1
+            self.acquire_seconds_total += elapsed
+            self.acquire_seconds_max = max(self.acquire_seconds_max, elapsed)
+
+
+def _create_engine(url: str):
+    return create_async_engine(
+        url,
+        echo=False,
+        future=True,
+        poolclass=InstrumentedAsyncPool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+    )
+
+
+engine = _create_engine(DATABASE_URL)
 
 AsyncSessionLocal = async_sessionmaker(
     bind=engine, expire_on_commit=False, autoflush=False, autocommit=False
 )
 
+replica_engines = [_create_engine(url) for url in settings.replica_urls]
+ReplicaSessions = [
+    async_sessionmaker(bind=e, expire_on_commit=False, autoflush=False, autocommit=False)
+    for e in replica_engines
+]
+_replica_turn = itertools.count()
+# Monotonic time until which each replica is skipped after a failed connect
+_replica_down_until = [0.0] * len(replica_engines)
+
 
 async def get_session():
     """FastAPI dependency that provides an AsyncSession.
@@ -20,3 +82,82 @@ async def get_session():
     """
     async with AsyncSessionLocal() as session:
         yield session
+
+
+async def open_read_session(use_primary: bool = False) -> AsyncSession:
+    """Open a session for read-only work, preferably on a replica.
+
+    Replicas are tried round-robin; one that fails to connect is skipped for
+    ``REPLICA_RETRY_SECONDS``. Falls back to the primary when no replica is
+    configured or reachable. The caller must close the session.
+
+    Args:
+        use_primary: Skip replicas, e.g. to read the user's own recent writes.
+
+    Returns:
+        AsyncSession, already connected when bound to a replica.
+    """
+    if not use_primary and ReplicaSessions:
+        start = next(_replica_turn)
+        for offset in range(len(ReplicaSessions)):
+            index = (start + offset) % len(ReplicaSessions)
+            if _replica_down_until[index] > time.monotonic():
+                continue
+            session = ReplicaSessions[index]()
+            try:
+                await session.connection()
+            except (DBAPIError, OSError):
+                await session.close()
+                _replica_down_until[index] = (
+                    time.monotonic() + settings.replica_retry_seconds
+                )
+                logger.warning(
+                    "Read replica %d is unreachable; skipping it for %.0f s",
+                    index,
+                    settings.replica_retry_seconds,
+                    exc_info=True,
+                )
+                continue
+            return session
+    return AsyncSessionLocal()
+
+
+def pool_stats() -> dict[str, Any]:
+    """Return saturation counters of the engine's connection pool.
+
+    Returns:
+        Mapping with the pool class, its configured size and overflow limit,
+        connections checked out / idle / in overflow, and checkout counters
+        (count, total and max seconds, timeouts) when the pool is
+        instrumented. Replica pools, if any, are listed under ``replicas``
+        with their health.
+    """
+    stats = _pool_stats(engine.pool)
+    if replica_engines:
+        now = time.monotonic()
+        stats["replicas"] = [
+            {**_pool_stats(e.pool), "healthy": _replica_down_until[i] <= now}
+            for i, e in enumerate(replica_engines)
+        ]
+    return stats
+
+
+def _pool_stats(pool) -> dict[str, Any]:
+    stats: dict[str, Any] = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            max_overflow=settings.db_max_overflow,
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            # overflow() counts from -size while the base pool is not full
+            overflow_in_use=max(0, pool.overflow()),
+        )
+    if isinstance(pool, InstrumentedAsyncPool):
+        stats.update(
+            acquire_count=pool.acquire_count,
+            acquire_seconds_total=round(pool.acquire_seconds_total, 6),
+            acquire_seconds_max=round(pool.acquire_seconds_max, 6),
+            acquire_timeouts=pool.acquire_timeouts,
+        )
+    return stats
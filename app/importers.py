@@ -0,0 +1,174 @@
+"""Streaming parsers for contact imports (CSV and vCard)."""
+import codecs
+import csv
+import re
+from datetime import date
+from itertools import islice
+from typing import Any, BinaryIO, Iterator
+
+from pydantic import ValidationError
+
+from app.schemas import ContactCreate
+
+# Validated rows handed to the database per COPY batch.
+IMPORT_CHUNK_SIZE = 5000
+
+# CSV header aliases mapped to ContactCreate fields (compared lower-cased).
+CSV_FIELD_ALIASES = {
+    "first_name": "first_name",
+    "first name": "first_name",
+    "given name": "first_name",
+    "last_name": "last_name",
+    "last name": "last_name",
+    "family name": "last_name",
+    "email": "email",
+    "e-mail": "email",
+    "phone": "phone",
+    "phone number": "phone",
+    "birthday": "birthday",
+    "extra_info": "extra_info",
+    "notes": "extra_info",
+}
+
+_VCARD_ESCAPES = re.compile(r"\\([\\,;nN])")
+
+
+def iter_csv_records(stream: BinaryIO) -> Iterator[tuple[int, dict[str, Any]]]:
+    """Parse a CSV upload row by row.
+
+    The first row is the header; unknown columns are ignored and empty cells
+    become None.
+
+    Args:
+        stream: Binary file object positioned at the start of the upload.
+
+    Yields:
+        ``(line_number, record)`` tuples, where line 1 is the header.
+    """
+    text = codecs.getreader("utf-8-sig")(stream, errors="replace")
+    reader = csv.reader(text)
+    header = next(reader, None)
+    if header is None:
+        return
+    fields = [CSV_FIELD_ALIASES.get(name.strip().lower()) for name in header]
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        record = {
+            field: cell.strip() or None
+            for field, cell in zip(fields, row)
+            if field is not None
+        }
+        yield reader.line_num, record
+
+
+def _vcard_unescape(value: str) -> str:
+    return _VCARD_ESCAPES.sub(
+        lambda m: "\n" if m.group(1) in "nN" else m.group(1), value
+    )
+
+
+def _vcard_birthday(value: str) -> str:
+    """Normalize vCard BDAY values (``19900714``, ``1990-07-14``) to ISO dates."""
+    digits = value.replace("-", "")
+    if len(digits) == 8 and digits.isdigit():
+        try:
+            return date(int(digits[:4]), int(digits[4:6]), int(digits[6:])).isoformat()
+        except ValueError:
+            pass
+    return value
+
+
+def _iter_unfolded_lines(stream: BinaryIO) -> Iterator[tuple[int, str]]:
+    """Yield logical vCard lines, joining RFC 6350 folded continuations."""
+    text = codecs.getreader("utf-8-sig")(stream, errors="replace")
+    current: str | None = None
+    start = 0
+    for number, raw in enumerate(text, start=1):
+        line = raw.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield start, current
+        current, start = line, number
+    if current is not None:
+        yield start, current
+
+
+def iter_vcard_records(stream: BinaryIO) -> Iterator[tuple[int, dict[str, Any]]]:
+    """Parse a vCard (3.0/4.0) upload card by card.
+
+    Maps N (or FN), the first EMAIL and TEL, BDAY and NOTE to contact fields.
+
+    Args:
+        stream: Binary file object positioned at the start of the upload.
+
+    Yields:
+        ``(line_number, record)`` tuples, where the line is the card's BEGIN.
+    """
+    record: dict[str, Any] | None = None
+    start = 0
+    for number, line in _iter_unfolded_lines(stream):
+        name, sep, value = line.partition(":")
+        if not sep:
+            continue
+        prop = name.split(";", 1)[0].rsplit(".", 1)[-1].upper()
+        if prop == "BEGIN" and value.strip().upper() == "VCARD":
+            record, start = {}, number
+        elif record is None:
+            continue
+        elif prop == "END":
+            yield start, record
+            record = None
+        elif prop == "N":
+            parts = value.split(";")
+            record["last_name"] = _vcard_unescape(parts[0]).strip() or None
+            if len(parts) > 1:
+                record["first_name"] = _vcard_unescape(parts[1]).strip() or None
+        elif prop == "FN" and not record.get("first_name"):
+            first, _, last = _vcard_unescape(value).strip().partition(" ")
+            record["first_name"] = first or None
+            if not record.get("last_name"):
+                record["last_name"] = last or None
+        elif prop == "EMAIL":
+            record.setdefault("email", value.strip())
+        elif prop == "TEL":
+            record.setdefault("phone", value.strip().removeprefix("tel:"))
+        elif prop == "BDAY":
+            record["birthday"] = _vcard_birthday(value.strip())
+        elif prop == "NOTE":
+            record["extra_info"] = _vcard_unescape(value)
+
+
+def next_valid_chunk(
+    records: Iterator[tuple[int, dict[str, Any]]], size: int = IMPORT_CHUNK_SIZE
+) -> tuple[list[dict[str, Any]], list[dict[str, Any]]] | None:
+    """Read and validate up to ``size`` records against ContactCreate.
+
+    Args:
+        records: Iterator from :func:`iter_csv_records` or
+            :func:`iter_vcard_records`.
+        size: Max records to consume.
+
+    Returns:
+        ``(valid, rejected)`` where ``valid`` holds ``ContactCreate`` dumps and
+        ``rejected`` holds ``{"line": ..., "errors": [...]}`` entries, or None
+        once the iterator is exhausted.
+    """
+    batch = list(islice(records, size))
+    if not batch:
+        return None
+    valid: list[dict[str, Any]] = []
+    rejected: list[dict[str, Any]] = []
+    for line, record in batch:
+        try:
+            valid.append(ContactCreate.model_validate(record).model_dump())
+        except ValidationError as e:
+            rejected.append(
+                {
+                    "line": line,
+                    "errors": e.errors(include_url=False, include_context=False),
+                }
+            )
+    return valid, rejected
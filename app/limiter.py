@@ -1,10 +1,286 @@
-"""Rate limiting utilities using slowapi."""
-from fastapi import Request
+"""Rate limiting shared by all workers through Redis.
+
+Limits use a sliding window counter: the count of the current fixed window
+plus the previous window's count weighted by how much of it still overlaps
+the sliding window. That needs two integers per key and window, however
+high the limit. With ``REDIS_URL`` set, each check is a single atomic Lua
+script call (EVALSHA) timed by the Redis clock, so the limit holds across
+workers and pods. Both counters of a key are passed to the script and share
+a hash tag, so it also runs on Redis Cluster. Without Redis, or while Redis is unreachable, checks fall
+back to the same algorithm in process memory, bounded to
+``LOCAL_MAX_KEYS`` keys.
+
+Authenticated requests are limited per user (the ``sub`` of a valid bearer
+token), anonymous ones per client IP.
+"""
+import functools
+import inspect
+import logging
+import math
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+from fastapi import HTTPException, Request
 from fastapi.responses import JSONResponse
-from slowapi import Limiter
-from slowapi.util import get_remote_address
 
-limiter = Limiter(key_func=get_remote_address)
+from app import cache
+from app.auth import _token_digest, decode_token
+
+logger = logging.getLogger(__name__)
+
+# Keys kept by the in-process fallback; least recently used are evicted
+LOCAL_MAX_KEYS = 10_000
+# Seconds Redis is skipped after an error before it is tried again
+REDIS_RETRY_SECONDS = 5.0
+
+GRANULARITY_SECONDS = {
+    "second": 1,
+    "minute": 60,
+    "hour": 60 * 60,
+    "day": 24 * 60 * 60,
+    "month": 30 * 24 * 60 * 60,
+    "year": 365 * 24 * 60 * 60,
+}
+_LIMIT = re.compile(
+    r"\s*(\d+)\s*(?:/|per)\s*(\d+)?\s*(second|minute|hour|day|month|year)s?\s*",
+    re.IGNORECASE,
+)
+
+# KEYS[1], KEYS[2]: counters of even and odd windows, hashes of the window
+# index and its count; ARGV: window length (ms), limit, cost.
+# Returns {allowed, remaining, retry_after_ms}.
+SLIDING_WINDOW_SCRIPT = """
+local window = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local index = math.floor(now / window)
+local current_key = KEYS[index % 2 + 1]
+local function window_count(key, wanted)
+    local stored = redis.call('HMGET', key, 'window', 'count')
+    if tonumber(stored[1]) == wanted then
+        return tonumber(stored[2])
+    end
+    return 0
+end
+local previous = window_count(KEYS[(index - 1) % 2 + 1], index - 1)
+local current = window_count(current_key, index)
+local elapsed = now - index * window
+local count = previous * (window - elapsed) / window + current
+if count + cost > limit then
+    local retry = window - elapsed
+    if previous > 0 then
+        retry = math.min(retry, math.ceil((count + cost - limit) * window / previous))
+    end
+    return {0, 0, retry}
+end
+redis.call('HSET', current_key, 'window', index, 'count', current + cost)
+redis.call('PEXPIRE', current_key, window * 2)
+return {1, math.floor(limit - count - cost), 0}
+"""
+
+
+class RateLimitExceeded(Exception):
+    """A request went over its rate limit."""
+
+    def __init__(self, limit: str, retry_after: float):
+        super().__init__(f"Rate limit exceeded: {limit}")
+        self.limit = limit
+        self.retry_after = retry_after
+
+
+def parse_limit(limit_value: str) -> tuple[int, float]:
+    """Parse ``"50/minute"``, ``"5 per second"`` or ``"100/10 minutes"``.
+
+    Returns:
+        ``(limit, window_seconds)``.
+
+    Raises:
+        ValueError: If the string is not in that notation.
+    """
+    match = _LIMIT.fullmatch(limit_value)
+    if match is None:
+        raise ValueError(f"Invalid rate limit: {limit_value!r}")
+    amount, multiple, granularity = match.groups()
+    return int(amount), int(multiple or 1) * GRANULARITY_SECONDS[granularity.lower()]
+
+
+def get_remote_address(request: Request) -> str:
+    """Return the client IP address of a request."""
+    return request.client.host if request.client else "127.0.0.1"
+
+
+def rate_limit_key(request: Request) -> str:
+    """Return ``user:<sub>`` for a valid bearer token, else ``ip:<address>``.
+
+    The token signature is verified, so a forged ``sub`` can neither spend
+    another user's budget nor dodge the limit with fresh identities. Tokens
+    already resolved by :func:`app.auth.get_current_user` (which runs before
+    the endpoint) are taken from the in-process token cache instead.
+    """
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        snapshot = cache.token_cache.get(_token_digest(token))
+        if snapshot is not None:
+            return f"user:{snapshot['id']}"
+        try:
+            sub = decode_token(token).get("sub")
+        except HTTPException:
+            sub = None
+        if sub is not None:
+            return f"user:{sub}"
+    return f"ip:{get_remote_address(request)}"
+
+
+def _sliding_window(
+    previous: int, current: int, elapsed: float, window: float, limit: int, cost: int
+) -> tuple[bool, int, float]:
+    """Python twin of ``SLIDING_WINDOW_SCRIPT``; times in seconds."""
+    count = previous * (window - elapsed) / window + current
+    if count + cost > limit:
+        retry = window - elapsed
+        if previous > 0:
+            retry = min(retry, (count + cost - limit) * window / previous)
+        return False, 0, retry
+    return True, math.floor(limit - count - cost), 0.0
+
+
+class LocalWindows:
+    """In-process sliding window counters, bounded to ``max_keys`` keys."""
+
+    def __init__(self, max_keys: int = LOCAL_MAX_KEYS):
+        self.max_keys = max_keys
+        # key -> (window index, previous count, current count)
+        self._windows: OrderedDict[str, tuple[int, int, int]] = OrderedDict()
+
+    def hit(self, key: str, window: float, limit: int, cost: int = 1) -> tuple[bool, int, float]:
+        now = time.time()
+        index = math.floor(now / window)
+        previous = current = 0
+        entry = self._windows.pop(key, None)
+        if entry is not None:
+            last_index, last_previous, last_current = entry
+            if last_index == index:
+                previous, current = last_previous, last_current
+            elif last_index == index - 1:
+                previous = last_current
+        allowed, remaining, retry = _sliding_window(
+            previous, current, now - index * window, window, limit, cost
+        )
+        if allowed:
+            current += cost
+        self._windows[key] = (index, previous, current)
+        while len(self._windows) > self.max_keys:
+            self._windows.popitem(last=False)
+        return allowed, remaining, retry
+
+    def clear(self) -> None:
+        self._windows.clear()
+
+
+class Limiter:
+    """Decorate endpoints with ``@limiter.limit("50/minute")``.
+
+    The endpoint must accept a ``request: Request`` argument. Exceeding the
+    limit raises :class:`RateLimitExceeded`.
+
+    Args:
+        key_func: Maps a request to the identity being limited.
+        key_prefix: Prefix of the Redis keys.
+    """
+
+    def __init__(
+        self,
+        key_func: Callable[[Request], str] = rate_limit_key,
+        key_prefix: str = "ratelimit",
+    ):
+        self.key_func = key_func
+        self.key_prefix = key_prefix
+        self.enabled = True
+        self.local = LocalWindows()
+        self._scripts: dict[int, Any] = {}
+        self._redis_down_until = 0.0
+
+    async def hit(self, key: str, window: float, limit: int, cost: int = 1) -> tuple[bool, int, float]:
+        """Count a request against a limit.
+
+        Args:
+            key: Limited identity and scope.
+            window: Window length in seconds.
+            limit: Requests allowed per window.
+            cost: Units this request consumes.
+
+        Returns:
+            ``(allowed, remaining, retry_after_seconds)``.
+        """
+        client = cache.redis_client
+        if client is not None and time.monotonic() >= self._redis_down_until:
+            script = self._scripts.get(id(client))
+            if script is None:
+                script = self._scripts[id(client)] = client.register_script(
+                    SLIDING_WINDOW_SCRIPT
+                )
+            try:
+                # The hash tag keeps both windows in one Redis Cluster slot
+                allowed, remaining, retry_ms = await script(
+                    keys=[f"{self.key_prefix}:{{{key}}}:0", f"{self.key_prefix}:{{{key}}}:1"],
+                    args=[round(window * 1000), limit, cost],
+                    client=client,
+                )
+                return bool(allowed), int(remaining), int(retry_ms) / 1000
+            except Exception:
+                self._redis_down_until = time.monotonic() + REDIS_RETRY_SECONDS
+                logger.warning(
+                    "Rate limit storage unreachable, limiting in process for %.0fs",
+                    REDIS_RETRY_SECONDS,
+                    exc_info=True,
+                )
+        return self.local.hit(key, window, limit, cost)
+
+    def reset(self) -> None:
+        """Forget in-process counters and retry Redis on the next check.
+
+        Counters in Redis are left to expire after two windows.
+        """
+        self.local.clear()
+        self._scripts.clear()
+        self._redis_down_until = 0.0
+
+    def limit(self, limit_value: str) -> Callable:
+        """Limit an endpoint, e.g. ``"50/minute"`` or ``"5 per second"``.
+
+        Args:
+            limit_value: Limit as parsed by :func:`parse_limit`.
+
+        Returns:
+            Decorator for an async endpoint with a ``request`` argument.
+        """
+        amount, window = parse_limit(limit_value)
+
+        def decorator(func: Callable) -> Callable:
+            if "request" not in inspect.signature(func).parameters:
+                raise TypeError(f"{func.__qualname__} needs a 'request: Request' argument")
+            scope = f"{func.__module__}.{func.__qualname__}"
+
+            @functools.wraps(func)
+            async def wrapper(*args: Any, **kwargs: Any) -> Any:
+                if self.enabled:
+                    request = kwargs["request"]
+                    key = f"{scope}:{self.key_func(request)}"
+                    allowed, _, retry_after = await self.hit(key, window, amount)
+                    if not allowed:
+                        raise RateLimitExceeded(limit_value, retry_after)
+                return await func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+
+limiter = Limiter()
 
 
 def rate_limit_exceeded_handler(request: Request, exc: Exception):
@@ -15,9 +291,11 @@ def rate_limit_exceeded_handler(request: Request, exc: Exception):
         exc: Raised RateLimitExceeded exception.
 
     Returns:
-        JSONResponse with HTTP 429 and a short error message.
+        JSONResponse with HTTP 429, a short error message and ``Retry-After``.
     """
+    retry_after = getattr(exc, "retry_after", 0)
     return JSONResponse(
         status_code=429,
         content={"detail": "Rate limit exceeded"},
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
     )
@@ -0,0 +1,378 @@
+"""Long-lived SMTP sender with a small pool of reusable connections.
+
+Messages are queued and picked up by ``MAIL_POOL_SIZE`` workers. Each
+worker keeps one authenticated SMTP connection open and sends everything
+queued (up to ``MAIL_BATCH_SIZE`` messages) over it before waiting again,
+so bursts cost one connect/TLS/login per worker instead of one per
+message. Idle connections are closed after ``MAIL_IDLE_TIMEOUT_SECONDS``.
+
+Auth emails are rendered from templates whose headers and body are
+encoded to wire format once; each message only adds its recipient and
+token.
+"""
+import asyncio
+import logging
+import time
+from email.message import EmailMessage
+from email.policy import SMTP as SMTP_POLICY
+from email.utils import formatdate, make_msgid
+from typing import Any, NamedTuple
+
+import aiosmtplib
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Marks where the per-message token goes in a pre-rendered body
+_SLOT = "@@TOKEN@@"
+
+# Errors after which the connection is reopened and the message retried once
+_CONNECTION_ERRORS = (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPConnectError, OSError)
+
+
+class OutgoingMail(NamedTuple):
+    """A rendered message: raw RFC 5322 bytes or, for non-ASCII recipients, an EmailMessage."""
+
+    sender: str
+    recipient: str
+    content: bytes | EmailMessage
+
+
+class MailTemplate:
+    """Plain-text email with a link whose constant parts are encoded once.
+
+    Args:
+        sender: From address.
+        subject: Subject header.
+        text: Body text preceding the link.
+        link: Link up to the token, e.g. ``https://host/auth/verify?token=``.
+    """
+
+    def __init__(self, sender: str, subject: str, text: str, link: str):
+        self.sender = sender
+        self.subject = subject
+        self.text = text
+        self.link = link
+        msg = EmailMessage(policy=SMTP_POLICY)
+        msg["From"] = sender
+        msg["Subject"] = subject
+        msg.set_content(f"{text}{link}{_SLOT}\n", cte="7bit")
+        self._head, self._tail = msg.as_bytes().split(_SLOT.encode("ascii"))
+
+    def render(self, recipient: str, token: str) -> OutgoingMail:
+        """Build the message for one recipient.
+
+        Args:
+            recipient: To address.
+            token: Value appended to the link.
+
+        Returns:
+            Message ready for :meth:`Mailer.send`.
+        """
+        if not recipient.isascii():
+            msg = EmailMessage()
+            msg["From"] = self.sender
+            msg["To"] = recipient
+            msg["Subject"] = self.subject
+            msg.set_content(f"{self.text}{self.link}{token}\n")
+            return OutgoingMail(self.sender, recipient, msg)
+        headers = (
+            f"To: {recipient}\r\n"
+            f"Date: {formatdate(localtime=True)}\r\nMessage-ID: {make_msgid()}\r\n"
+        )
+        return OutgoingMail(
+            self.sender,
+            recipient,
+            headers.encode("ascii") + self._head + token.encode("ascii") + self._tail,
+        )
+
+
+class Mailer:
+    """Queue of outgoing mail drained by workers holding SMTP connections.
+
+    Args:
+        sender: From address of every message.
+        base_url: Public base URL the links in templates point to.
+        hostname: SMTP server host.
+        port: SMTP server port.
+        username: Login name, or None to skip authentication.
+        password: Login password.
+        use_tls: Connect with implicit TLS.
+        start_tls: Upgrade the connection with STARTTLS.
+        pool_size: Number of connections (and workers).
+        batch_size: Most messages sent per wake-up of a worker.
+        idle_timeout: Seconds an unused connection stays open.
+        timeout: Per-command SMTP timeout in seconds.
+    """
+
+    def __init__(
+        self,
+        *,
+        sender: str,
+        base_url: str,
+        hostname: str,
+        port: int,
+        username: str | None = None,
+        password: str | None = None,
+        use_tls: bool = False,
+        start_tls: bool = False,
+        pool_size: int = 2,
+        batch_size: int = 50,
+        idle_timeout: float = 30.0,
+        timeout: float = 30.0,
+    ):
+        base_url = base_url.rstrip("/")
+        self.templates = {
+            "verify": MailTemplate(
+                sender,
+                "Verify your email",
+                "Please verify your email by clicking the link: ",
+                f"{base_url}/auth/verify?token=",
+            ),
+            "reset": MailTemplate(
+                sender,
+                "Reset your password",
+                "You requested a password reset. Use this link to proceed: ",
+                f"{base_url}/auth/reset-password?token=",
+            ),
+        }
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.start_tls = start_tls
+        self.pool_size = pool_size
+        self.batch_size = batch_size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._queue: asyncio.Queue[tuple[OutgoingMail, asyncio.Future]] | None = None
+        self._workers: list[asyncio.Task] = []
+        self._connections = 0
+        self._connects_total = 0
+        self._sent_total = 0
+        self._failed_total = 0
+
+    @classmethod
+    def from_settings(cls) -> "Mailer":
+        """Create a mailer for the configured SMTP server."""
+        use_credentials = (
+            settings.mail_use_credentials
+            if settings.mail_use_credentials is not None
+            else bool(settings.mail_username)
+        )
+        return cls(
+            sender=settings.mail_from,
+            base_url=settings.public_base_url,
+            hostname=settings.mail_server,
+            port=settings.mail_port,
+            username=settings.mail_username if use_credentials else None,
+            password=(
+                settings.mail_password.get_secret_value()
+                if use_credentials and settings.mail_password
+                else None
+            ),
+            use_tls=settings.mail_ssl_tls,
+            start_tls=settings.mail_starttls,
+            pool_size=settings.mail_pool_size,
+            batch_size=settings.mail_batch_size,
+            idle_timeout=settings.mail_idle_timeout_seconds,
+        )
+
+    def start(self) -> None:
+        """Start the workers on the running event loop (idempotent)."""
+        if self._workers:
+            return
+        self._queue = asyncio.Queue()
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"mailer-{n}")
+            for n in range(self.pool_size)
+        ]
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """Deliver what is queued (up to ``timeout`` seconds), then close connections.
+
+        Messages still queued or being sent when the timeout expires are
+        cancelled, so their :meth:`send` calls raise ``CancelledError``.
+        """
+        if not self._workers:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Mailer closed with %d messages undelivered", self._queue.qsize())
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        for _, future in self._drain():
+            future.cancel()
+
+    async def send(self, mail: OutgoingMail) -> None:
+        """Queue a message and wait until the SMTP server accepted it.
+
+        Raises:
+            aiosmtplib.SMTPException: If the server rejected the message.
+            OSError: If the server could not be reached.
+        """
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((mail, future))
+        await future
+
+    async def send_link(self, template: str, recipient: str, token: str) -> None:
+        """Render one of ``self.templates`` and send it (see :meth:`send`).
+
+        Args:
+            template: Template name, ``verify`` or ``reset``.
+            recipient: To address.
+            token: Token appended to the template's link.
+        """
+        await self.send(self.templates[template].render(recipient, token))
+
+    def stats(self) -> dict[str, Any]:
+        """Queue depth, open connections and delivery counters."""
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "workers": len(self._workers),
+            "connections": self._connections,
+            "connects_total": self._connects_total,
+            "sent_total": self._sent_total,
+            "failed_total": self._failed_total,
+        }
+
+    def _drain(self) -> list[tuple[OutgoingMail, asyncio.Future]]:
+        items = []
+        while self._queue is not None and not self._queue.empty():
+            items.append(self._queue.get_nowait())
+            self._queue.task_done()
+        return items
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            username=self.username,
+            password=self.password,
+            use_tls=self.use_tls,
+            start_tls=self.start_tls,
+            validate_certs=False,
+            timeout=self.timeout,
+        )
+        await smtp.connect()
+        self._connections += 1
+        self._connects_total += 1
+        return smtp
+
+    async def _disconnect(self, smtp: aiosmtplib.SMTP | None) -> None:
+        if smtp is None:
+            return
+        self._connections -= 1
+        try:
+            await smtp.quit()
+        except Exception:
+            smtp.close()
+
+    async def _transmit(self, smtp: aiosmtplib.SMTP, mail: OutgoingMail) -> None:
+        if isinstance(mail.content, EmailMessage):
+            await smtp.send_message(mail.content)
+        else:
+            await smtp.sendmail(mail.sender, [mail.recipient], mail.content)
+
+    async def _deliver(
+        self,
+        smtp: aiosmtplib.SMTP | None,
+        batch: list[tuple[OutgoingMail, asyncio.Future]],
+    ) -> aiosmtplib.SMTP | None:
+        """Send a batch over ``smtp``, reconnecting once per message if it dropped.
+
+        Returns the connection to reuse. On an unexpected error or
+        cancellation the connection may be mid-transaction, so it is closed
+        before the exception propagates.
+        """
+        try:
+            for mail, future in batch:
+                if future.done():
+                    continue
+                for attempt in (1, 2):
+                    try:
+                        if smtp is None:
+                            smtp = await self._connect()
+                        await self._transmit(smtp, mail)
+                    except _CONNECTION_ERRORS as e:
+                        if smtp is not None:
+                            self._connections -= 1
+                            smtp.close()
+                            smtp = None
+                        if attempt == 2:
+                            self._fail(future, e)
+                    except aiosmtplib.SMTPException as e:
+                        # Rejected message; the connection is still usable
+                        self._fail(future, e)
+                        break
+                    else:
+                        self._sent_total += 1
+                        future.set_result(None)
+                        break
+        except BaseException:
+            if smtp is not None:
+                self._connections -= 1
+                smtp.close()
+            raise
+        return smtp
+
+    def _fail(self, future: asyncio.Future, error: Exception) -> None:
+        self._failed_total += 1
+        if not future.done():
+            future.set_exception(error)
+
+    async def _worker(self) -> None:
+        smtp = None
+        batch: list[tuple[OutgoingMail, asyncio.Future]] = []
+        try:
+            while True:
+                try:
+                    first = await asyncio.wait_for(
+                        self._queue.get(), self.idle_timeout if smtp else None
+                    )
+                except asyncio.TimeoutError:
+                    idle, smtp = smtp, None
+                    await self._disconnect(idle)
+                    continue
+                batch = [first]
+                while len(batch) < self.batch_size and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                started = time.perf_counter()
+                # _deliver owns (and on failure closes) the connection until it returns
+                connection, smtp = smtp, None
+                try:
+                    smtp = await self._deliver(connection, batch)
+                except Exception as e:
+                    logger.exception("Mail worker failed; dropping its connection")
+                    for _, future in batch:
+                        self._fail(future, e)
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+                logger.debug(
+                    "Sent %d messages in %.1f ms", len(batch), (time.perf_counter() - started) * 1000
+                )
+                batch = []
+        finally:
+            # Cancelled by close() mid-batch: release the senders still waiting
+            for _, future in batch:
+                future.cancel()
+            await self._disconnect(smtp)
+
+
+# Set by the application lifespan; see get_mailer().
+mailer: Mailer | None = None
+
+
+def get_mailer() -> Mailer:
+    """Return the shared mailer, creating it from settings when not yet set."""
+    global mailer
+    if mailer is None:
+        mailer = Mailer.from_settings()
+    return mailer
@@ -1,15 +1,19 @@
 """FastAPI application setup with CORS, auth protection, and rate limiter."""
-from contextlib import asynccontextmanager
-import redis.asyncio as redis
-from fastapi import FastAPI
+import asyncio
+import os
+from contextlib import asynccontextmanager, suppress
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.staticfiles import StaticFiles
 from fastapi_cache import FastAPICache
 from fastapi_cache.backends.inmemory import InMemoryBackend
 from fastapi_cache.backends.redis import RedisBackend
-from slowapi.errors import RateLimitExceeded
+from prometheus_client import CONTENT_TYPE_LATEST
 
+from app import cache, db, mailer, metrics, outbox_worker, overload, storage, tracing
+from app.auth import password_hasher_stats, shutdown_password_hasher
 from app.config import settings
-from app.limiter import limiter, rate_limit_exceeded_handler
+from app.limiter import RateLimitExceeded, limiter, rate_limit_exceeded_handler
 from app.routers.auth import router as auth_router
 from app.routers.contacts import router as contacts_router
 from app.routers.users import router as users_router
@@ -23,15 +27,40 @@ app = FastAPI(
 
 @asynccontextmanager
 async def lifespan(_: FastAPI):
+    listener = None
     if settings.redis_url:
-        r = redis.from_url(
+        r = tracing.TracedRedis.from_url(
             settings.redis_url,
         )
         backend = RedisBackend(r)
+        cache.redis_client = r
+        listener = asyncio.create_task(cache.listen_for_user_changes(r))
     else:
         backend = InMemoryBackend()
-    FastAPICache.init(backend, prefix="contacts-cache")
+    FastAPICache.init(metrics.InstrumentedBackend(backend), prefix="contacts-cache")
+    mailer.mailer = mailer.Mailer.from_settings()
+    mailer.mailer.start()
+    dispatcher = None
+    stop_dispatcher = asyncio.Event()
+    if settings.outbox_dispatch_in_api:
+        dispatcher = asyncio.create_task(
+            outbox_worker.run(mailer.mailer, stop_dispatcher)
+        )
     yield
+    if dispatcher is not None:
+        stop_dispatcher.set()
+        outbox_worker.notify()
+        await dispatcher
+    await mailer.mailer.close()
+    mailer.mailer = None
+    storage.shutdown_thumbnail_pool()
+    shutdown_password_hasher()
+    tracing.flush()
+    if listener is not None:
+        listener.cancel()
+        with suppress(asyncio.CancelledError):
+            await listener
+    cache.redis_client = None
 
 
 app = FastAPI(lifespan=lifespan)
@@ -40,13 +69,32 @@ app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded_handler)
 
 
+app.add_middleware(overload.LoadSheddingMiddleware)
+app.add_middleware(storage.UploadSizeLimitMiddleware, paths=("/api/users/me/avatar",))
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Link", "X-Next-Cursor"],
 )
+app.add_middleware(metrics.QueryTimingMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(tracing.TracingMiddleware)
+
+
+def _collect_runtime_stats():
+    pools = db.pool_stats()
+    labelled = {"primary": pools}
+    for index, replica in enumerate(pools.get("replicas", [])):
+        labelled[f"replica{index}"] = replica
+    yield from metrics.pool_metrics(labelled)
+    yield from metrics.hasher_metrics(password_hasher_stats())
+    yield from metrics.overload_metrics(overload.concurrency_limiter.stats())
+
+
+metrics.REGISTRY.register(metrics.StatsCollector(_collect_runtime_stats))
 
 
 @app.get("/health", tags=["health"])
@@ -54,6 +102,42 @@ async def healthcheck():
     return {"status": "ok"}
 
 
+@app.get("/health/hasher", tags=["health"])
+async def hasher_stats():
+    """Queue depth and throughput of the bcrypt worker pool."""
+    return password_hasher_stats()
+
+
+@app.get("/health/mailer", tags=["health"])
+async def mailer_stats():
+    """Queue depth, open SMTP connections and delivery counters of the mailer."""
+    return mailer.get_mailer().stats()
+
+
+@app.get("/health/overload", tags=["health"])
+async def overload_stats():
+    """Adaptive concurrency limit, requests in flight and queued, and shed counts."""
+    return overload.concurrency_limiter.stats()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint."""
+    return Response(metrics.render(), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.get("/health/pool", tags=["health"])
+async def database_pool_stats():
+    """Checked-out connections, overflow in use and checkout wait times."""
+    return db.pool_stats()
+
+
+if settings.avatar_storage == "local":
+    os.makedirs(settings.media_root, exist_ok=True)
+    app.mount(
+        settings.media_url_path, StaticFiles(directory=settings.media_root), name="media"
+    )
+
 app.include_router(auth_router)
 app.include_router(users_router)
 app.include_router(contacts_router)
@@ -0,0 +1,355 @@
+"""Prometheus metrics: a ``prometheus_client`` registry, ASGI middleware and DB hooks.
+
+Metrics are rendered in the Prometheus text exposition format by
+``GET /metrics``. Values are per process; scrape every worker. The same DB
+hooks count queries per request (``Server-Timing``) and log slow statements.
+"""
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Iterable, Iterator
+
+from fastapi_cache.backends import Backend
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    disable_created_metrics,
+    generate_latest,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, Metric
+from prometheus_client.registry import Collector
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+from app.config import settings
+
+slow_query_logger = logging.getLogger("app.slow_query")
+
+# Request and query latency buckets in seconds
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+# Counters only export <name>_total; the extra <name>_created series per
+# label set doubles the output without being used by any dashboard
+disable_created_metrics()
+
+REGISTRY = CollectorRegistry()
+
+http_requests_in_flight = Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served.", registry=REGISTRY
+)
+http_request_duration_seconds = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request duration by method, route template and status.",
+    ("method", "route", "status"),
+    buckets=DEFAULT_BUCKETS,
+    registry=REGISTRY,
+)
+db_query_duration_seconds = Histogram(
+    "db_query_duration_seconds",
+    "Database statement duration by statement type.",
+    ("operation",),
+    buckets=DEFAULT_BUCKETS,
+    registry=REGISTRY,
+)
+cache_requests_total = Counter(
+    "cache_requests_total",
+    "Cache lookups by namespace, layer (local or backend) and result.",
+    ("namespace", "layer", "result"),
+    registry=REGISTRY,
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording in-flight requests and request durations.
+
+    Requests are labelled with the matched route template (e.g.
+    ``/api/contacts/{contact_id}``) to keep label cardinality bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_flight.dec()
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "<unmatched>"
+            http_request_duration_seconds.labels(
+                scope["method"], template, str(status_code)
+            ).observe(elapsed)
+
+
+class QueryStats:
+    """Number of statements and total database time of a unit of work."""
+
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+_query_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryStats]:
+    """Count statements executed in the current context while the block runs.
+
+    SQLAlchemy's async greenlets inherit the caller's context, so queries
+    issued through AsyncSession are counted too.
+
+    Yields:
+        QueryStats updated as statements complete.
+    """
+    stats = QueryStats()
+    token = _query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _query_stats.reset(token)
+
+
+class QueryTimingMiddleware:
+    """ASGI middleware adding per-request DB statistics as ``Server-Timing``.
+
+    Emits ``db;dur=<ms>;desc="<n> queries"`` and ``app;dur=<ms>`` (time
+    until the response started). Statements run while streaming a body are
+    not included.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        with count_queries() as stats:
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    elapsed_ms = (time.perf_counter() - started) * 1000
+                    MutableHeaders(scope=message).append(
+                        "Server-Timing",
+                        f'db;dur={stats.seconds * 1000:.2f};desc="{stats.count} queries", '
+                        f"app;dur={elapsed_ms:.2f}",
+                    )
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
+
+
+def _redact(value: Any) -> str:
+    return "NULL" if value is None else f"<{type(value).__name__}>"
+
+
+def redact_parameters(parameters: Any) -> Any:
+    """Replace bound parameter values with their type names for logging.
+
+    Args:
+        parameters: DBAPI parameters (mapping, sequence, or a list of those
+            for executemany).
+
+    Returns:
+        Same shape with every value replaced; executemany batches are cut to
+        their first three rows.
+    """
+    if isinstance(parameters, dict):
+        return {key: _redact(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            rows = [redact_parameters(row) for row in parameters[:3]]
+            if len(parameters) > 3:
+                rows.append(f"... {len(parameters) - 3} more")
+            return rows
+        return [_redact(value) for value in parameters]
+    return _redact(parameters)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_metrics_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    operation = statement.lstrip().split(None, 1)[0].lower() if statement else ""
+    db_query_duration_seconds.labels(operation).observe(elapsed)
+    stats = _query_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+    threshold = settings.slow_query_ms
+    if threshold > 0 and elapsed * 1000 >= threshold:
+        slow_query_logger.warning(
+            "Slow query (%.1f ms): %s; parameters: %s",
+            elapsed * 1000,
+            statement,
+            redact_parameters(parameters),
+        )
+
+
+def record_cache_lookup(namespace: str, layer: str, hit: bool) -> None:
+    """Count a cache lookup.
+
+    Args:
+        namespace: Cache namespace, e.g. ``auth`` or ``contacts``.
+        layer: ``local`` for in-process caches, ``backend`` for Redis.
+        hit: Whether the lookup found an entry.
+    """
+    cache_requests_total.labels(namespace, layer, "hit" if hit else "miss").inc()
+
+
+class InstrumentedBackend(Backend):
+    """fastapi-cache backend wrapper counting hits and misses per namespace.
+
+    Keys look like ``<prefix>:<namespace>:...``; the namespace is the
+    second segment.
+    """
+
+    def __init__(self, backend: Backend):
+        self.backend = backend
+
+    async def get_with_ttl(self, key: str):
+        ttl, value = await self.backend.get_with_ttl(key)
+        record_cache_lookup(_key_namespace(key), "backend", value is not None)
+        return ttl, value
+
+    async def get(self, key: str):
+        value = await self.backend.get(key)
+        record_cache_lookup(_key_namespace(key), "backend", value is not None)
+        return value
+
+    async def set(self, key: str, value, expire: int | None = None) -> None:
+        await self.backend.set(key, value, expire)
+
+    async def clear(self, namespace: str | None = None, key: str | None = None) -> int:
+        return await self.backend.clear(namespace, key)
+
+
+def _key_namespace(key: str) -> str:
+    parts = key.split(":", 2)
+    return parts[1] if len(parts) > 2 else ""
+
+
+class StatsCollector(Collector):
+    """Collector building metric families from a callback at scrape time.
+
+    Pool, hasher and overload counters are kept by their owners and exposed
+    as-is, so they are read when scraped rather than mirrored into metrics.
+    """
+
+    def __init__(self, callback: Callable[[], Iterable[Metric]]):
+        self.callback = callback
+
+    def collect(self) -> Iterable[Metric]:
+        return self.callback()
+
+
+def pool_metrics(pools: dict[str, dict[str, Any]]) -> Iterator[Metric]:
+    """Build the pool metrics from :func:`app.db.pool_stats` entries.
+
+    Args:
+        pools: Stats by pool label (``primary``, ``replica0``...).
+    """
+    connections = GaugeMetricFamily(
+        "db_pool_connections",
+        "Database pool connections by pool (primary or replica index) and state.",
+        labels=("pool", "state"),
+    )
+    acquire_seconds = CounterMetricFamily(
+        "db_pool_acquire_seconds",
+        "Total time spent checking connections out of the pool.",
+        labels=("pool",),
+    )
+    acquires = CounterMetricFamily("db_pool_acquires", "Connection checkouts.", labels=("pool",))
+    timeouts = CounterMetricFamily(
+        "db_pool_timeouts", "Checkouts that hit the pool timeout.", labels=("pool",)
+    )
+    for name, stats in pools.items():
+        for state in ("checked_out", "checked_in", "overflow_in_use"):
+            if state in stats:
+                connections.add_metric((name, state), stats[state])
+        if "acquire_count" in stats:
+            acquires.add_metric((name,), stats["acquire_count"])
+            acquire_seconds.add_metric((name,), stats["acquire_seconds_total"])
+            timeouts.add_metric((name,), stats["acquire_timeouts"])
+    yield from (connections, acquire_seconds, acquires, timeouts)
+
+
+def hasher_metrics(stats: dict[str, Any]) -> Iterator[Metric]:
+    """Build the hasher metrics from :func:`app.auth.password_hasher_stats`."""
+    tasks = GaugeMetricFamily(
+        "password_hasher_tasks",
+        "bcrypt calls by state (in_flight includes queued).",
+        labels=("state",),
+    )
+    for state in ("workers", "in_flight", "queued"):
+        tasks.add_metric((state,), stats[state])
+    yield tasks
+    yield CounterMetricFamily(
+        "password_hasher_wait_seconds",
+        "Total time bcrypt calls waited for a free worker.",
+        value=stats["wait_seconds_total"],
+    )
+    yield CounterMetricFamily(
+        "password_hasher_completed", "Completed bcrypt calls.", value=stats["completed"]
+    )
+
+
+def overload_metrics(stats: dict[str, Any]) -> Iterator[Metric]:
+    """Build the overload metrics from :meth:`app.overload.AdaptiveConcurrencyLimiter.stats`."""
+    concurrency = GaugeMetricFamily(
+        "overload_concurrency",
+        "Adaptive concurrency limit and its usage by state (limit, in_flight, queued).",
+        labels=("state",),
+    )
+    for state in ("limit", "in_flight", "queued"):
+        concurrency.add_metric((state,), stats[state])
+    yield concurrency
+    yield CounterMetricFamily(
+        "overload_admitted",
+        "Requests admitted by the concurrency limiter.",
+        value=stats["admitted_total"],
+    )
+    rejected = CounterMetricFamily(
+        "overload_rejected",
+        "Requests shed with 503 by the concurrency limiter, by priority.",
+        labels=("priority",),
+    )
+    for priority, count in stats["rejected_total"].items():
+        rejected.add_metric((priority,), count)
+    yield rejected
+
+
+def render() -> bytes:
+    """Render every registered metric in the Prometheus text format."""
+    return generate_latest(REGISTRY)
@@ -4,14 +4,42 @@ from datetime import date, datetime
 from sqlalchemy import (
     Date,
     Integer,
+    SmallInteger,
     String,
     Text,
     UniqueConstraint,
     ForeignKey,
     DateTime,
+    FetchedValue,
+    Index,
     func,
+    text,
 )
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import (
+    DeclarativeBase,
+    Mapped,
+    mapped_column,
+    relationship,
+    validates,
+)
+
+
+def birthday_ordinal(value: date | None) -> int | None:
+    """Return the month-day ordinal of a date (``month * 100 + day``).
+
+    The ordinal sorts in calendar order regardless of year, e.g. 1 March is
+    301 and 29 February is 229.
+
+    Args:
+        value: Date or None.
+
+    Returns:
+        Ordinal in the range 101..1231, or None if ``value`` is None.
+    """
+    if value is None:
+        return None
+    return value.month * 100 + value.day
 
 
 class Base(DeclarativeBase):
@@ -50,6 +78,12 @@ class Contact(Base):
     __tablename__ = "contacts"
     __table_args__ = (
         UniqueConstraint("user_id", "email", name="uq_contacts_user_email"),
+        # Keyset pagination indexes, one per sort order in list_contacts
+        Index("ix_contacts_user_id_id", "user_id", "id"),
+        Index("ix_contacts_user_name", "user_id", "last_name", "first_name", "id"),
+        Index("ix_contacts_search_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_contacts_user_birthday_doy", "user_id", "birthday_doy"),
+        Index("ix_contacts_user_updated_at", "user_id", "updated_at"),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -61,6 +95,89 @@ class Contact(Base):
     email: Mapped[str] = mapped_column(String(255), nullable=False)
     phone: Mapped[str] = mapped_column(String(50), nullable=False)
     birthday: Mapped[date | None] = mapped_column(Date, nullable=True)
+    # Denormalized birthday_ordinal(birthday), kept in sync on every write so
+    # upcoming_birthdays can range-scan (user_id, birthday_doy).
+    birthday_doy: Mapped[int | None] = mapped_column(SmallInteger, nullable=True)
     extra_info: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # Weighted full-text document; a STORED generated column in PostgreSQL
+    # (migration 0006), so it is never written by the application.
+    search_vector: Mapped[str | None] = mapped_column(
+        TSVECTOR().with_variant(Text(), "sqlite"),
+        server_default=FetchedValue(),
+        server_onupdate=FetchedValue(),
+        deferred=True,
+        nullable=True,
+    )
+    # ETag fallback of contact reads without Redis; raw SQL writes must set it too.
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False,
+    )
 
     user: Mapped[User] = relationship(back_populates="contacts")
+
+    @validates("birthday")
+    def _sync_birthday_doy(self, key: str, value: date | None) -> date | None:
+        self.birthday_doy = birthday_ordinal(value)
+        return value
+
+
+# Trigram indexes backing the case-insensitive substring filters in
+# list_contacts; requires the pg_trgm extension (see migration 0005).
+Index(
+    "ix_contacts_first_name_trgm",
+    func.lower(Contact.first_name).label("first_name_lower"),
+    postgresql_using="gin",
+    postgresql_ops={"first_name_lower": "gin_trgm_ops"},
+)
+Index(
+    "ix_contacts_last_name_trgm",
+    func.lower(Contact.last_name).label("last_name_lower"),
+    postgresql_using="gin",
+    postgresql_ops={"last_name_lower": "gin_trgm_ops"},
+)
+Index(
+    "ix_contacts_email_trgm",
+    func.lower(Contact.email).label("email_lower"),
+    postgresql_using="gin",
+    postgresql_ops={"email_lower": "gin_trgm_ops"},
+)
+
+
+class EmailOutbox(Base):
+    """Email waiting to be sent, written in the transaction that requested it.
+
+    Rows are claimed by the outbox worker and deleted once the SMTP server
+    accepts the message; rows that exhaust their attempts stay with status
+    ``failed``.
+    """
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        Index(
+            "ix_email_outbox_pending",
+            "next_attempt_at",
+            postgresql_where=text("status = 'pending'"),
+            sqlite_where=text("status = 'pending'"),
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    # Mailer template name ("verify" or "reset")
+    kind: Mapped[str] = mapped_column(String(20), nullable=False)
+    recipient: Mapped[str] = mapped_column(String(255), nullable=False)
+    token: Mapped[str] = mapped_column(Text, nullable=False)
+    status: Mapped[str] = mapped_column(
+        String(20), default="pending", server_default="pending", nullable=False
+    )
+    attempts: Mapped[int] = mapped_column(
+        Integer, default=0, server_default="0", nullable=False
+    )
+    next_attempt_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
@@ -0,0 +1,157 @@
+"""Deliver emails queued in the ``email_outbox`` table.
+
+Run as its own process so SMTP latency and outages never hold up API
+workers; any number of workers can run side by side::
+
+    python -m app.outbox_worker
+
+Each round claims up to ``OUTBOX_BATCH_SIZE`` due rows (``FOR UPDATE SKIP
+LOCKED``), sends them concurrently through the pooled mailer and records
+the outcome. Failed sends are retried with exponential backoff and jitter
+until ``OUTBOX_MAX_ATTEMPTS``. With ``OUTBOX_DISPATCH_IN_API`` enabled the
+same loop also runs inside the API process, which is convenient for
+development and tests.
+"""
+import asyncio
+import logging
+import random
+import signal
+from datetime import datetime, timedelta, timezone
+
+from opentelemetry.trace import SpanKind
+
+from app import db
+from app.config import settings
+from app.mailer import Mailer
+from app.models import EmailOutbox
+from app.repositories.outbox import claim_emails, complete_emails
+from app.tracing import root_span, span
+
+logger = logging.getLogger(__name__)
+
+# Set while run() is active in this process; see notify().
+_wakeup: asyncio.Event | None = None
+
+
+def notify() -> None:
+    """Wake the dispatcher running in this process, if any, to send new rows now."""
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Delay before retrying an email that failed ``attempts`` times, with jitter."""
+    delay = settings.outbox_backoff_seconds * 2 ** (attempts - 1)
+    return random.uniform(0.5, 1.0) * min(delay, settings.outbox_backoff_max_seconds)
+
+
+async def _send(mailer: Mailer, email: EmailOutbox) -> None:
+    with span(
+        "smtp.send",
+        SpanKind.CLIENT,
+        {"server.address": mailer.hostname, "outbox.id": email.id, "outbox.kind": email.kind},
+    ):
+        await mailer.send_link(email.kind, email.recipient, email.token)
+
+
+async def dispatch_once(mailer: Mailer) -> int:
+    """Claim, send and settle one batch of due emails.
+
+    Each round that claims emails is traced as its own ``outbox.dispatch``
+    root span, with an ``smtp.send`` span per email. The claim itself runs
+    before the trace starts, so idle rounds export nothing.
+
+    Args:
+        mailer: Started mailer used for delivery.
+
+    Returns:
+        Number of emails claimed.
+    """
+    async with db.AsyncSessionLocal() as session:
+        emails = await claim_emails(
+            session, settings.outbox_batch_size, settings.outbox_lease_seconds
+        )
+    if not emails:
+        return 0
+    with root_span("outbox.dispatch", attributes={"outbox.claimed": len(emails)}):
+        await _deliver(mailer, emails)
+    return len(emails)
+
+
+async def _deliver(mailer: Mailer, emails: list[EmailOutbox]) -> None:
+    results = await asyncio.gather(
+        *(_send(mailer, e) for e in emails), return_exceptions=True
+    )
+    now = datetime.now(timezone.utc)
+    sent_ids = []
+    failures = {}
+    for email, result in zip(emails, results):
+        # CancelledError (e.g. from Mailer.close()) is a BaseException, not a send
+        if not isinstance(result, BaseException):
+            sent_ids.append(email.id)
+            continue
+        retry_at = None
+        if email.attempts < settings.outbox_max_attempts:
+            retry_at = now + timedelta(seconds=backoff_seconds(email.attempts))
+        failures[email.id] = (f"{type(result).__name__}: {result}", retry_at)
+        logger.warning(
+            "Email %s to %s failed (attempt %d): %s%s",
+            email.id,
+            email.recipient,
+            email.attempts,
+            result,
+            "" if retry_at else "; giving up",
+        )
+
+    async with db.AsyncSessionLocal() as session:
+        await complete_emails(session, sent_ids, failures)
+
+
+async def run(mailer: Mailer, stop: asyncio.Event | None = None) -> None:
+    """Dispatch emails until ``stop`` is set (or the task is cancelled).
+
+    Sleeps ``OUTBOX_POLL_SECONDS`` between rounds unless the last batch was
+    full or :func:`notify` is called.
+    """
+    global _wakeup
+    _wakeup = asyncio.Event()
+    stop = stop or asyncio.Event()
+    try:
+        while not stop.is_set():
+            try:
+                claimed = await dispatch_once(mailer)
+            except Exception:
+                logger.exception("Outbox dispatch failed")
+                claimed = 0
+            if claimed >= settings.outbox_batch_size:
+                continue
+            try:
+                await asyncio.wait_for(_wakeup.wait(), settings.outbox_poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            _wakeup.clear()
+    finally:
+        _wakeup = None
+
+
+async def main() -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, lambda: (stop.set(), notify()))
+    mailer = Mailer.from_settings()
+    mailer.start()
+    logger.info("Outbox worker started")
+    try:
+        await run(mailer, stop)
+    finally:
+        await mailer.close()
+        await db.engine.dispose()
+        logger.info("Outbox worker stopped")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+    asyncio.run(main())
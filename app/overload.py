@@ -0,0 +1,268 @@
+"""Adaptive concurrency limit and load shedding per worker process.
+
+Requests beyond the concurrency limit wait in a priority queue instead of
+piling up on the database pool. The limit adapts with AIMD: it grows by
+``1/limit`` per request that answered within ``OVERLOAD_LATENCY_TARGET_MS``
+while the limit was at least half used (about +1 per round trip), and is
+multiplied by ``OVERLOAD_BACKOFF_RATIO`` at most once per smoothed latency
+when a response is slower or fails with a 5xx. Latency is measured to the
+start of the response, so streamed exports are not mistaken for slow ones.
+Routes that are slow by design because they run bcrypt (register, login,
+password reset) are admitted like any other but their latency is not fed
+back, so a login burst does not shrink the limit for everything else.
+
+A queued request is rejected with 503 and ``Retry-After`` as soon as its
+estimated wait exceeds the queue budget of its priority, or when it has
+waited that long. ``/health*`` and ``/metrics`` bypass the limiter, auth
+refresh is served first with twice the budget, and heavy list, search,
+export, import and bulk routes are served last with half of it.
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+from app.config import settings
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+PRIORITY_NAMES = {PRIORITY_HIGH: "high", PRIORITY_NORMAL: "normal", PRIORITY_LOW: "low"}
+# Multiplier of OVERLOAD_QUEUE_BUDGET_MS per priority
+QUEUE_BUDGET_FACTORS = {PRIORITY_HIGH: 2.0, PRIORITY_NORMAL: 1.0, PRIORITY_LOW: 0.5}
+
+BYPASS_PREFIXES = ("/health", "/metrics")
+HIGH_PRIORITY_ROUTES = {("POST", "/auth/refresh")}
+LOW_PRIORITY_ROUTES = {
+    ("GET", "/api/contacts"),
+    ("GET", "/api/contacts/search"),
+    ("GET", "/api/contacts/export"),
+    ("POST", "/api/contacts/import"),
+    ("POST", "/api/contacts/bulk"),
+    ("POST", "/api/contacts/bulk/update"),
+    ("POST", "/api/contacts/bulk/delete"),
+}
+# Admitted through the limiter, but their latency does not adapt the limit
+UNMEASURED_ROUTES = {
+    ("POST", "/auth/register"),
+    ("POST", "/auth/login"),
+    ("POST", "/auth/reset-password"),
+}
+
+# Weight of the newest sample in the smoothed latency
+LATENCY_SMOOTHING = 0.1
+
+
+def request_priority(method: str, path: str) -> int | None:
+    """Return the queue priority of a request, or None if it bypasses the limiter."""
+    if method == "OPTIONS" or path.startswith(BYPASS_PREFIXES):
+        return None
+    route = (method, path.rstrip("/") or "/")
+    if route in HIGH_PRIORITY_ROUTES:
+        return PRIORITY_HIGH
+    if route in LOW_PRIORITY_ROUTES:
+        return PRIORITY_LOW
+    return PRIORITY_NORMAL
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD concurrency limit with a priority queue in front of it.
+
+    Args:
+        initial_limit: Starting concurrency limit.
+        min_limit: Lower bound of the limit.
+        max_limit: Upper bound of the limit.
+        latency_target: Seconds to first byte above which the limit shrinks.
+        queue_budget: Seconds a normal-priority request may wait for a slot.
+        backoff_ratio: Factor applied to the limit on overload.
+    """
+
+    def __init__(
+        self,
+        *,
+        initial_limit: int,
+        min_limit: int,
+        max_limit: int,
+        latency_target: float,
+        queue_budget: float,
+        backoff_ratio: float,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.queue_budget = queue_budget
+        self.backoff_ratio = backoff_ratio
+        self.limit = float(min(max(initial_limit, min_limit), max_limit))
+        self.in_flight = 0
+        self.latency = latency_target / 2
+        self._last_decrease = 0.0
+        # Heap of (priority, arrival, future); the future resolves on admission
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._arrivals = itertools.count()
+        self.admitted_total = 0
+        self.rejected_total = {name: 0 for name in PRIORITY_NAMES.values()}
+
+    @classmethod
+    def from_settings(cls) -> "AdaptiveConcurrencyLimiter":
+        """Build a limiter from the ``OVERLOAD_*`` settings."""
+        return cls(
+            initial_limit=settings.overload_initial_limit,
+            min_limit=settings.overload_min_limit,
+            max_limit=settings.overload_max_limit,
+            latency_target=settings.overload_latency_target_ms / 1000,
+            queue_budget=settings.overload_queue_budget_ms / 1000,
+            backoff_ratio=settings.overload_backoff_ratio,
+        )
+
+    def estimated_wait(self, priority: int) -> float:
+        """Seconds until a new request of ``priority`` would likely get a slot."""
+        ahead = sum(1 for p, _, future in self._waiters if p <= priority and not future.done())
+        return (ahead + 1) * self.latency / max(1, int(self.limit))
+
+    def retry_after(self, priority: int) -> int:
+        """``Retry-After`` seconds suggested to a rejected request."""
+        return max(1, math.ceil(self.estimated_wait(priority)))
+
+    async def acquire(self, priority: int) -> bool:
+        """Wait for a slot.
+
+        Args:
+            priority: One of the ``PRIORITY_*`` constants.
+
+        Returns:
+            True once admitted; False if the queue budget was or would be
+            exceeded. Admitted callers must call :meth:`release`.
+        """
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            self.admitted_total += 1
+            return True
+        budget = self.queue_budget * QUEUE_BUDGET_FACTORS[priority]
+        if self.estimated_wait(priority) > budget:
+            self.rejected_total[PRIORITY_NAMES[priority]] += 1
+            return False
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._arrivals), future)
+        heapq.heappush(self._waiters, entry)
+        try:
+            await asyncio.wait([future], timeout=budget)
+        except asyncio.CancelledError:
+            self._abandon(entry)
+            raise
+        if future.done():
+            self.admitted_total += 1
+            return True
+        self._abandon(entry)
+        self.rejected_total[PRIORITY_NAMES[priority]] += 1
+        return False
+
+    def _abandon(self, entry: tuple[int, int, asyncio.Future]) -> None:
+        future = entry[2]
+        if future.done():
+            # Admitted just as the caller gave up; pass the slot on
+            self.in_flight -= 1
+            self._wake()
+            return
+        future.cancel()
+        self._waiters.remove(entry)
+        heapq.heapify(self._waiters)
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self.in_flight += 1
+            future.set_result(None)
+
+    def release(self, latency: float | None, failed: bool = False) -> None:
+        """Free a slot and adapt the limit.
+
+        Args:
+            latency: Seconds from admission to the response start, or None
+                if no response was started.
+            failed: Whether the request failed on the server side.
+        """
+        if latency is not None or failed:
+            self._adapt(latency, failed)
+        self.in_flight -= 1
+        self._wake()
+
+    def _adapt(self, latency: float | None, failed: bool) -> None:
+        if latency is not None:
+            self.latency += LATENCY_SMOOTHING * (latency - self.latency)
+        now = time.monotonic()
+        if failed or latency > self.latency_target:
+            if now - self._last_decrease >= self.latency:
+                self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+                self._last_decrease = now
+        elif self.in_flight >= self.limit / 2:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def stats(self) -> dict[str, Any]:
+        """Return the current limit, usage, queue length and counters."""
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "queued": sum(1 for _, _, future in self._waiters if not future.done()),
+            "latency_ms": round(self.latency * 1000, 3),
+            "admitted_total": self.admitted_total,
+            "rejected_total": dict(self.rejected_total),
+        }
+
+
+concurrency_limiter = AdaptiveConcurrencyLimiter.from_settings()
+
+
+class LoadSheddingMiddleware:
+    """ASGI middleware admitting HTTP requests through a concurrency limiter.
+
+    Disabled when ``OVERLOAD_PROTECTION`` is false.
+    """
+
+    def __init__(self, app, limiter: AdaptiveConcurrencyLimiter | None = None):
+        self.app = app
+        self.limiter = limiter or concurrency_limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.overload_protection:
+            await self.app(scope, receive, send)
+            return
+        priority = request_priority(scope["method"], scope["path"])
+        if priority is None:
+            await self.app(scope, receive, send)
+            return
+        if not await self.limiter.acquire(priority):
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Server is overloaded, retry later"},
+                headers={"Retry-After": str(self.limiter.retry_after(priority))},
+            )
+            await response(scope, receive, send)
+            return
+
+        method, path = scope["method"], scope["path"]
+        measured = (method, path.rstrip("/") or "/") not in UNMEASURED_ROUTES
+        started = time.perf_counter()
+        latency = None
+        failed = False
+
+        async def send_wrapper(message):
+            nonlocal latency, failed
+            if message["type"] == "http.response.start" and latency is None:
+                latency = time.perf_counter() - started
+                failed = message["status"] >= 500
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.limiter.release(latency if measured else None, failed)
@@ -1,10 +1,89 @@
 """Repository functions for Contact entity."""
-from datetime import date
-
-from sqlalchemy import Select, and_, select, func, cast, Date, Integer, case
+import calendar
+import re
+from datetime import date, datetime, timedelta
+from typing import Any, AsyncIterator, Sequence
+
+from sqlalchemy import (
+    RowMapping,
+    Select,
+    and_,
+    case,
+    delete,
+    func,
+    or_,
+    select,
+    text,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models import Contact
+from app.cache import bump_contacts_version
+from app.models import Contact, birthday_ordinal
+
+# Rows per multi-row INSERT; keeps each statement well below the
+# 32767 bind-parameter limit of the PostgreSQL wire protocol.
+BULK_BATCH_SIZE = 1000
+
+# Columns included in exports, in output order (mirrors ContactRead).
+EXPORT_COLUMNS = (
+    Contact.id,
+    Contact.first_name,
+    Contact.last_name,
+    Contact.email,
+    Contact.phone,
+    Contact.birthday,
+    Contact.extra_info,
+)
+
+# Column tuples used for ORDER BY and keyset comparison; each must be covered
+# by a composite ``(user_id, ...)`` index (see migration 0004).
+CONTACT_SORT_KEYS = {
+    "id": (Contact.id,),
+    "name": (Contact.last_name, Contact.first_name, Contact.id),
+}
+
+
+def _contains(column, term: str):
+    """Case-insensitive substring match served by the trigram indexes.
+
+    Compares ``lower(column)`` so the predicate matches the expression GIN
+    indexes from migration 0005; LIKE wildcards in ``term`` are escaped.
+    """
+    escaped = (
+        term.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    )
+    return func.lower(column).like(f"%{escaped}%", escape="\\")
+
+
+def _contact_filters(
+    first_name: str | None, last_name: str | None, email: str | None
+) -> list:
+    """Build the substring filter conditions shared by list and bulk operations."""
+    filters = []
+    if first_name:
+        filters.append(_contains(Contact.first_name, first_name))
+    if last_name:
+        filters.append(_contains(Contact.last_name, last_name))
+    if email:
+        filters.append(_contains(Contact.email, email))
+    return filters
+
+
+def contact_sort_values(contact: Contact, sort: str = "id") -> list[Any]:
+    """Return the keyset values of a contact for the given sort order.
+
+    Args:
+        contact: Contact instance (usually the last row of a page).
+        sort: Sort order name, one of ``CONTACT_SORT_KEYS``.
+
+    Returns:
+        List of values to encode into the next page cursor.
+    """
+    return [getattr(contact, col.key) for col in CONTACT_SORT_KEYS[sort]]
 
 
 async def list_contacts(
@@ -15,9 +94,15 @@ async def list_contacts(
     email: str | None = None,
     limit: int = 100,
     offset: int = 0,
+    sort: str = "id",
+    after: Sequence[Any] | None = None,
 ):
     """List user's contacts with optional filters and pagination.
 
+    Two pagination modes are supported: ``offset`` for shallow pages and
+    keyset pagination via ``after``, which seeks directly past the last row of
+    the previous page so the cost does not grow with page depth.
+
     Args:
         session: Async SQLAlchemy session.
         user_id: Owner user ID.
@@ -26,29 +111,113 @@ async def list_contacts(
         email: Optional case-insensitive filter by email (substring).
         limit: Max number of records to return.
         offset: Number of records to skip (for pagination).
+        sort: Sort order, one of ``CONTACT_SORT_KEYS`` ("id" or "name").
+        after: Optional keyset values of the last row of the previous page,
+            as returned by :func:`contact_sort_values`.
 
     Returns:
         List of Contact objects.
     """
     stmt: Select = select(Contact).where(Contact.user_id == user_id)
-    filters = []
-
-    if first_name:
-        filters.append(Contact.first_name.ilike(f"%{first_name}%"))
-    if last_name:
-        filters.append(Contact.last_name.ilike(f"%{last_name}%"))
-    if email:
-        filters.append(Contact.email.ilike(f"%{email}%"))
+    filters = _contact_filters(first_name, last_name, email)
 
     if filters:
         stmt = stmt.where(and_(*filters))
 
-    stmt = stmt.limit(limit).offset(offset)
+    sort_cols = CONTACT_SORT_KEYS[sort]
+    if after is not None:
+        stmt = stmt.where(tuple_(*sort_cols) > tuple_(*after))
+
+    stmt = stmt.order_by(*sort_cols).limit(limit).offset(offset)
 
     res = await session.execute(stmt)
     return res.scalars().all()
 
 
+def _prefix_tsquery(text: str) -> str | None:
+    """Build a tsquery string matching every word of ``text`` as a prefix.
+
+    Only word characters are kept, so user input cannot inject tsquery
+    operators. Returns None when the text contains no searchable words.
+    """
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return None
+    return " & ".join(f"{word}:*" for word in words)
+
+
+async def search_contacts(
+    session: AsyncSession,
+    user_id: int,
+    query: str,
+    limit: int = 100,
+    after: Sequence[Any] | None = None,
+) -> list[tuple[Contact, float]]:
+    """Full-text search over names, email, phone and extra info, ranked by relevance.
+
+    Uses the weighted ``search_vector`` column and its GIN index (PostgreSQL
+    only). Every word of ``query`` must match, as a prefix, somewhere in the
+    contact. Results are ordered by rank (descending), then by ID.
+
+    Args:
+        session: Async SQLAlchemy session.
+        user_id: Owner user ID.
+        query: Free-text search string.
+        limit: Max number of records to return.
+        after: Optional ``(rank, id)`` of the last row of the previous page.
+
+    Returns:
+        List of ``(Contact, rank)`` tuples; empty if the query has no words.
+    """
+    tsquery = _prefix_tsquery(query)
+    if tsquery is None:
+        return []
+    ts_query = func.to_tsquery("simple", tsquery)
+    rank = func.ts_rank_cd(Contact.search_vector, ts_query).label("rank")
+
+    stmt: Select = select(Contact, rank).where(
+        Contact.user_id == user_id,
+        Contact.search_vector.op("@@")(ts_query),
+    )
+    if after is not None:
+        after_rank, after_id = after
+        stmt = stmt.where(
+            or_(rank < after_rank, and_(rank == after_rank, Contact.id > after_id))
+        )
+    stmt = stmt.order_by(rank.desc(), Contact.id).limit(limit)
+
+    res = await session.execute(stmt)
+    return [(contact, float(score)) for contact, score in res.all()]
+
+
+async def stream_contacts(
+    session: AsyncSession, user_id: int, batch_size: int = 1000
+) -> AsyncIterator[Sequence[RowMapping]]:
+    """Stream all of a user's contacts in ID order, one batch at a time.
+
+    Uses a server-side cursor (``yield_per``) and plain column rows instead of
+    ORM objects, so memory stays bounded by ``batch_size`` regardless of how
+    many contacts the user has.
+
+    Args:
+        session: Async SQLAlchemy session; must stay open while iterating.
+        user_id: Owner user ID.
+        batch_size: Rows fetched from the server per batch.
+
+    Yields:
+        Sequences of row mappings keyed by the names in ``EXPORT_COLUMNS``.
+    """
+    stmt = (
+        select(*EXPORT_COLUMNS)
+        .where(Contact.user_id == user_id)
+        .order_by(Contact.id)
+        .execution_options(yield_per=batch_size)
+    )
+    result = await session.stream(stmt)
+    async for partition in result.mappings().partitions():
+        yield partition
+
+
 async def get_contact(session: AsyncSession, user_id: int, contact_id: int):
     """Fetch a single contact by ID owned by the given user.
 
@@ -66,6 +235,55 @@ async def get_contact(session: AsyncSession, user_id: int, contact_id: int):
     return res.scalar_one_or_none()
 
 
+async def contacts_change_marker(
+    session: AsyncSession, user_id: int
+) -> tuple[int, int | None, datetime | None]:
+    """Return a cheap aggregate that changes whenever a user's contacts change.
+
+    Inserts move the count and max ID, deletes the count, and updates the
+    latest ``updated_at``; both maxima are served by ``(user_id, ...)``
+    indexes, so no contact rows are loaded. Only a fallback for ETags when
+    the generation counter in Redis is unavailable: ``updated_at`` is the
+    transaction start time, so an update committed by a long or racing
+    transaction may not move the maximum.
+
+    Args:
+        session: Async SQLAlchemy session.
+        user_id: Owner user ID.
+
+    Returns:
+        ``(count, max_id, max_updated_at)`` of the user's contacts.
+    """
+    res = await session.execute(
+        select(
+            func.count(), func.max(Contact.id), func.max(Contact.updated_at)
+        ).where(Contact.user_id == user_id)
+    )
+    count, max_id, max_updated_at = res.one()
+    return count, max_id, max_updated_at
+
+
+async def contact_updated_at(
+    session: AsyncSession, user_id: int, contact_id: int
+) -> datetime | None:
+    """Get the last modification time of a contact without loading it.
+
+    Args:
+        session: Async SQLAlchemy session.
+        user_id: Owner user ID.
+        contact_id: Contact ID.
+
+    Returns:
+        ``updated_at`` of the contact, or None if it does not exist.
+    """
+    res = await session.execute(
+        select(Contact.updated_at).where(
+            Contact.id == contact_id, Contact.user_id == user_id
+        )
+    )
+    return res.scalar_one_or_none()
+
+
 async def create_contact(
     session: AsyncSession,
     *,
@@ -104,9 +322,185 @@ async def create_contact(
     session.add(contact)
     await session.commit()
     await session.refresh(contact)
+    await bump_contacts_version(user_id)
     return contact
 
 
+async def bulk_create_contacts(
+    session: AsyncSession,
+    user_id: int,
+    contacts: Sequence[dict[str, Any]],
+    batch_size: int = BULK_BATCH_SIZE,
+) -> dict[str, int]:
+    """Insert many contacts in one transaction, skipping existing emails.
+
+    Rows are sent as multi-row ``INSERT ... ON CONFLICT (user_id, email) DO
+    NOTHING RETURNING id, email`` statements of up to ``batch_size`` rows, so
+    the number of round trips is ``ceil(len(contacts) / batch_size)`` plus
+    the commit.
+
+    Args:
+        session: Async SQLAlchemy session.
+        user_id: Owner user ID.
+        contacts: Validated contact fields (as produced by
+            ``ContactCreate.model_dump()``); emails should be unique.
+        batch_size: Max rows per INSERT statement.
+
+    Returns:
+        Mapping of email to new contact ID for the rows that were inserted.
+        Emails that already existed for the user are absent.
+    """
+    dialect = session.get_bind().dialect.name
+    insert = pg_insert if dialect == "postgresql" else sqlite_insert
+    created: dict[str, int] = {}
+    for start in range(0, len(contacts), batch_size):
+        rows = [
+            {
+                **contact,
+                "user_id": user_id,
+                "birthday_doy": birthday_ordinal(contact.get("birthday")),
+            }
+            for contact in contacts[start : start + batch_size]
+        ]
+        stmt = (
+            insert(Contact)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=["user_id", "email"])
+            .returning(Contact.id, Contact.email)
+        )
+        res = await session.execute(stmt)
+        created.update({email: contact_id for contact_id, email in res.all()})
+    await session.commit()
+    if created:
+        await bump_contacts_version(user_id)
+    return created
+
+
+IMPORT_COLUMNS = (
+    "seq",
+    "first_name",
+    "last_name",
+    "email",
+    "phone",
+    "birthday",
+    "birthday_doy",
+    "extra_info",
+)
+
+_CREATE_IMPORT_STAGING = text(
+    """
+    CREATE TEMP TABLE contacts_import (
+        seq bigint NOT NULL,
+        first_name varchar(100) NOT NULL,
+        last_name varchar(100) NOT NULL,
+        email varchar(255) NOT NULL,
+        phone varchar(50) NOT NULL,
+        birthday date,
+        birthday_doy smallint,
+        extra_info text
+    ) ON COMMIT DROP
+    """
+)
+
+# Later rows win over earlier rows with the same email. Optional fields that
+# are empty in the import keep their stored value, and rows whose values are
+# unchanged are not rewritten.
+_MERGE_IMPORT_STAGING = text(
+    """
+    WITH upserted AS (
+        INSERT INTO contacts AS c (
+            user_id, first_name, last_name, email, phone,
+            birthday, birthday_doy, extra_info
+        )
+        SELECT DISTINCT ON (email)
+            CAST(:user_id AS integer), first_name, last_name, email, phone,
+            birthday, birthday_doy, extra_info
+        FROM contacts_import
+        ORDER BY email, seq DESC
+        ON CONFLICT ON CONSTRAINT uq_contacts_user_email DO UPDATE SET
+            first_name = EXCLUDED.first_name,
+            last_name = EXCLUDED.last_name,
+            phone = EXCLUDED.phone,
+            birthday = COALESCE(EXCLUDED.birthday, c.birthday),
+            birthday_doy = COALESCE(EXCLUDED.birthday_doy, c.birthday_doy),
+            extra_info = COALESCE(EXCLUDED.extra_info, c.extra_info),
+            updated_at = now()
+        WHERE (c.first_name, c.last_name, c.phone) IS DISTINCT FROM
+              (EXCLUDED.first_name, EXCLUDED.last_name, EXCLUDED.phone)
+           OR (EXCLUDED.birthday IS NOT NULL AND EXCLUDED.birthday IS DISTINCT FROM c.birthday)
+           OR (EXCLUDED.extra_info IS NOT NULL AND EXCLUDED.extra_info IS DISTINCT FROM c.extra_info)
+        RETURNING (xmax = 0) AS inserted
+    )
+    SELECT
+        count(*) FILTER (WHERE inserted) AS inserted,
+        count(*) FILTER (WHERE NOT inserted) AS updated,
+        (SELECT count(DISTINCT email) FROM contacts_import) AS staged
+    FROM upserted
+    """
+)
+
+
+async def import_contacts(
+    session: AsyncSession,
+    user_id: int,
+    chunks: AsyncIterator[Sequence[dict[str, Any]]],
+) -> dict[str, int]:
+    """Load validated contacts with COPY and merge them in one statement.
+
+    Each chunk is copied into a transaction-scoped temporary staging table
+    over the asyncpg binary COPY protocol, then a single set-based
+    ``INSERT ... ON CONFLICT ON CONSTRAINT uq_contacts_user_email DO UPDATE``
+    merges the staging table into ``contacts``. PostgreSQL only.
+
+    Args:
+        session: Async SQLAlchemy session bound to PostgreSQL/asyncpg.
+        user_id: Owner user ID.
+        chunks: Async iterator of validated contact field batches (as
+            produced by ``ContactCreate.model_dump()``).
+
+    Returns:
+        Mapping with ``inserted``, ``updated`` and ``unchanged`` counts of
+        distinct emails.
+    """
+    await session.execute(_CREATE_IMPORT_STAGING)
+    connection = await session.connection()
+    raw = await connection.get_raw_connection()
+    copy_conn = raw.driver_connection
+
+    seq = 0
+    async for chunk in chunks:
+        records = []
+        for contact in chunk:
+            records.append(
+                (
+                    seq,
+                    contact["first_name"],
+                    contact["last_name"],
+                    contact["email"],
+                    contact["phone"],
+                    contact.get("birthday"),
+                    birthday_ordinal(contact.get("birthday")),
+                    contact.get("extra_info"),
+                )
+            )
+            seq += 1
+        if records:
+            await copy_conn.copy_records_to_table(
+                "contacts_import", records=records, columns=IMPORT_COLUMNS
+            )
+
+    res = await session.execute(_MERGE_IMPORT_STAGING, {"user_id": user_id})
+    inserted, updated, staged = res.one()
+    await session.commit()
+    if inserted or updated:
+        await bump_contacts_version(user_id)
+    return {
+        "inserted": inserted,
+        "updated": updated,
+        "unchanged": staged - inserted - updated,
+    }
+
+
 async def update_contact(
     session: AsyncSession,
     contact: Contact,
@@ -148,6 +542,7 @@ async def update_contact(
 
     await session.commit()
     await session.refresh(contact)
+    await bump_contacts_version(contact.user_id)
     return contact
 
 
@@ -161,8 +556,116 @@ async def delete_contact(session: AsyncSession, contact: Contact) -> None:
     Returns:
         None
     """
+    user_id = contact.user_id
     await session.delete(contact)
     await session.commit()
+    await bump_contacts_version(user_id)
+
+
+def _bulk_batches(user_id: int, ids: Sequence[int] | None, conditions: list):
+    """Yield WHERE clauses for bulk statements, one per batch of IDs.
+
+    Without ``ids`` a single clause covers every contact matching
+    ``conditions``; otherwise IDs are split into ``BULK_BATCH_SIZE`` chunks.
+    """
+    owner = Contact.user_id == user_id
+    if ids is None:
+        yield and_(owner, *conditions)
+        return
+    for start in range(0, len(ids), BULK_BATCH_SIZE):
+        batch = ids[start : start + BULK_BATCH_SIZE]
+        yield and_(owner, Contact.id.in_(batch), *conditions)
+
+
+async def bulk_update_contacts(
+    session: AsyncSession,
+    user_id: int,
+    values: dict[str, Any],
+    *,
+    ids: Sequence[int] | None = None,
+    first_name: str | None = None,
+    last_name: str | None = None,
+    email: str | None = None,
+) -> list[int]:
+    """Apply the same changes to many contacts with set-based UPDATEs.
+
+    Contacts are selected by ``ids``, by the ``list_contacts`` substring
+    filters, or both (intersection). Runs one ``UPDATE ... RETURNING id`` per
+    batch of IDs, or a single statement when selecting by filters only, and
+    commits once.
+
+    Args:
+        session: Async SQLAlchemy session.
+        user_id: Owner user ID; contacts of other users are never touched.
+        values: Column values to set (e.g. ``{"extra_info": "VIP"}``).
+        ids: Optional contact IDs to update.
+        first_name: Optional case-insensitive filter by first name (substring).
+        last_name: Optional case-insensitive filter by last name (substring).
+        email: Optional case-insensitive filter by email (substring).
+
+    Returns:
+        IDs of the updated contacts.
+    """
+    values = dict(values)
+    if "birthday" in values:
+        values["birthday_doy"] = birthday_ordinal(values["birthday"])
+    conditions = _contact_filters(first_name, last_name, email)
+    updated: list[int] = []
+    for where in _bulk_batches(user_id, ids, conditions):
+        stmt = (
+            update(Contact)
+            .where(where)
+            .values(**values)
+            .returning(Contact.id)
+            .execution_options(synchronize_session=False)
+        )
+        res = await session.execute(stmt)
+        updated.extend(res.scalars().all())
+    await session.commit()
+    if updated:
+        await bump_contacts_version(user_id)
+    return updated
+
+
+async def bulk_delete_contacts(
+    session: AsyncSession,
+    user_id: int,
+    *,
+    ids: Sequence[int] | None = None,
+    first_name: str | None = None,
+    last_name: str | None = None,
+    email: str | None = None,
+) -> list[int]:
+    """Delete many contacts with set-based ``DELETE ... RETURNING id`` statements.
+
+    Selection works as in :func:`bulk_update_contacts`.
+
+    Args:
+        session: Async SQLAlchemy session.
+        user_id: Owner user ID; contacts of other users are never touched.
+        ids: Optional contact IDs to delete.
+        first_name: Optional case-insensitive filter by first name (substring).
+        last_name: Optional case-insensitive filter by last name (substring).
+        email: Optional case-insensitive filter by email (substring).
+
+    Returns:
+        IDs of the deleted contacts.
+    """
+    conditions = _contact_filters(first_name, last_name, email)
+    deleted: list[int] = []
+    for where in _bulk_batches(user_id, ids, conditions):
+        stmt = (
+            delete(Contact)
+            .where(where)
+            .returning(Contact.id)
+            .execution_options(synchronize_session=False)
+        )
+        res = await session.execute(stmt)
+        deleted.extend(res.scalars().all())
+    await session.commit()
+    if deleted:
+        await bump_contacts_version(user_id)
+    return deleted
 
 
 async def upcoming_birthdays(
@@ -171,48 +674,44 @@ async def upcoming_birthdays(
     days: int = 7,
     limit: int = 100,
     offset: int = 0,
+    today: date | None = None,
 ):
-    """Return contacts with birthdays within the next N days using SQL-side filtering.
+    """Return contacts with birthdays within the next N days, soonest first.
+
+    Matches on the indexed ``birthday_doy`` month-day ordinal, so the query is
+    a range scan of ``(user_id, birthday_doy)`` (two ranges when the window
+    wraps past 31 December). In non-leap years, 29 February birthdays are
+    celebrated on 1 March.
 
     Args:
         session: Async SQLAlchemy session.
         user_id: Owner user ID.
-        days: Window size in days to check ahead.
+        days: Window size in days to check ahead (today is included).
         limit: Max number of records to return.
         offset: Number of records to skip.
+        today: Reference date; defaults to the server's current date.
 
     Returns:
         List of Contact objects with birthdays within the window.
     """
-    today = func.current_date()
-    # SQLAlchemy func doesn't support keyword args for PostgreSQL make_interval; use positional:
-    # make_interval(years, months, weeks, days, hours, mins, secs)
-    window_end = cast(func.current_date() + func.make_interval(0, 0, 0, days, 0, 0, 0), Date)
-
-    # Build the next upcoming birthday date for the current year,
-    # adding 1 year when the month-day has already passed today.
-    bday_mmdd_lt_today = func.to_char(Contact.birthday, "MM-DD") < func.to_char(today, "MM-DD")
-    next_year = cast(func.date_part("year", today), Integer) + case(
-        (bday_mmdd_lt_today, 1), else_=0
-    )
-    next_birthday_date = func.make_date(
-        next_year,
-        cast(func.date_part("month", Contact.birthday), Integer),
-        cast(func.date_part("day", Contact.birthday), Integer),
-    )
-
-    stmt: Select = (
-        select(Contact)
-        .where(
-            Contact.user_id == user_id,
-            Contact.birthday.is_not(None),
-            next_birthday_date >= today,
-            next_birthday_date <= window_end,
-        )
-        .order_by(next_birthday_date)
-        .limit(limit)
-        .offset(offset)
-    )
+    today = today or date.today()
+    end = today + timedelta(days=days)
+    start_doy = birthday_ordinal(today)
+    end_doy = birthday_ordinal(end)
+    if today.month == 3 and today.day == 1 and not calendar.isleap(today.year):
+        start_doy = birthday_ordinal(date(2000, 2, 29))
+
+    doy = Contact.birthday_doy
+    if start_doy <= end_doy and days < 365:
+        window = doy.between(start_doy, end_doy)
+        order = (doy,)
+    else:
+        # Wraps past 31 December (or spans a whole year): rest of this year first
+        window = or_(doy >= start_doy, doy <= end_doy) if days < 365 else doy.is_not(None)
+        order = (case((doy >= start_doy, 0), else_=1), doy)
+
+    stmt: Select = select(Contact).where(Contact.user_id == user_id, window)
+    stmt = stmt.order_by(*order, Contact.id).limit(limit).offset(offset)
 
     res = await session.execute(stmt)
     return res.scalars().all()
@@ -0,0 +1,107 @@
+"""Repository functions for the email outbox."""
+from datetime import datetime, timedelta, timezone
+from typing import Mapping, Sequence
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import EmailOutbox
+
+
+async def enqueue_email(
+    session: AsyncSession, *, kind: str, recipient: str, token: str
+) -> EmailOutbox:
+    """Add an email to the outbox without committing.
+
+    The row becomes visible to the worker only when the caller commits, so
+    it is sent if and only if the surrounding transaction succeeds.
+
+    Args:
+        session: Async SQLAlchemy session.
+        kind: Mailer template name (``verify`` or ``reset``).
+        recipient: Recipient email address.
+        token: Token embedded in the email link.
+
+    Returns:
+        The pending outbox row.
+    """
+    email = EmailOutbox(
+        kind=kind,
+        recipient=recipient,
+        token=token,
+        next_attempt_at=datetime.now(timezone.utc),
+    )
+    session.add(email)
+    return email
+
+
+async def claim_emails(
+    session: AsyncSession, limit: int, lease_seconds: float
+) -> list[EmailOutbox]:
+    """Claim a batch of due emails and commit.
+
+    Rows are locked with ``FOR UPDATE SKIP LOCKED`` so concurrent workers
+    never claim the same row, and are leased by moving ``next_attempt_at``
+    ``lease_seconds`` ahead; the lock is released on commit, and if the
+    worker dies before recording the outcome the rows become due again
+    once the lease expires.
+
+    Args:
+        session: Async SQLAlchemy session.
+        limit: Maximum rows to claim.
+        lease_seconds: Seconds the claimed rows are hidden from other workers.
+
+    Returns:
+        Claimed rows, oldest due first, with ``attempts`` incremented.
+    """
+    now = datetime.now(timezone.utc)
+    res = await session.execute(
+        select(EmailOutbox)
+        .where(EmailOutbox.status == "pending", EmailOutbox.next_attempt_at <= now)
+        .order_by(EmailOutbox.next_attempt_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    emails = list(res.scalars())
+    if emails:
+        lease_until = now + timedelta(seconds=lease_seconds)
+        await session.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.id.in_([e.id for e in emails]))
+            .values(attempts=EmailOutbox.attempts + 1, next_attempt_at=lease_until)
+            .execution_options(synchronize_session=False)
+        )
+        for email in emails:
+            email.attempts += 1
+            email.next_attempt_at = lease_until
+    await session.commit()
+    return emails
+
+
+async def complete_emails(
+    session: AsyncSession,
+    sent_ids: Sequence[int],
+    failures: Mapping[int, tuple[str, datetime | None]],
+) -> None:
+    """Record the outcome of a claimed batch and commit.
+
+    Args:
+        session: Async SQLAlchemy session.
+        sent_ids: IDs accepted by the SMTP server; these rows are deleted.
+        failures: ID -> ``(error, retry_at)``; a ``retry_at`` of None marks
+            the row ``failed`` for good, otherwise it is retried then.
+    """
+    if sent_ids:
+        await session.execute(
+            delete(EmailOutbox).where(EmailOutbox.id.in_(list(sent_ids)))
+        )
+    for email_id, (error, retry_at) in failures.items():
+        values = {"last_error": error[:2000]}
+        if retry_at is None:
+            values["status"] = "failed"
+        else:
+            values["next_attempt_at"] = retry_at
+        await session.execute(
+            update(EmailOutbox).where(EmailOutbox.id == email_id).values(**values)
+        )
+    await session.commit()
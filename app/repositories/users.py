@@ -2,6 +2,7 @@
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.cache import invalidate_user
 from app.models import User
 
 
@@ -34,7 +35,7 @@ async def get_user_by_id(session: AsyncSession, user_id: int) -> User | None:
 
 
 async def create_user(
-    session: AsyncSession, *, email: str, hashed_password: str
+    session: AsyncSession, *, email: str, hashed_password: str, commit: bool = True
 ) -> User:
     """Create and persist a new user.
 
@@ -42,12 +43,17 @@ async def create_user(
         session: Async SQLAlchemy session.
         email: User email (must be unique).
         hashed_password: Bcrypt hashed password.
+        commit: When False, only flush (assigning the ID) so the caller can
+            add more rows to the same transaction and commit them together.
 
     Returns:
         Newly created User.
     """
     user = User(email=email, hashed_password=hashed_password, is_verified=False)
     session.add(user)
+    if not commit:
+        await session.flush()
+        return user
     await session.commit()
     await session.refresh(user)
     return user
@@ -66,6 +72,7 @@ async def set_user_verified(session: AsyncSession, user: User) -> User:
     user.is_verified = True
     await session.commit()
     await session.refresh(user)
+    await invalidate_user(user.id)
     return user
 
 
@@ -85,6 +92,7 @@ async def update_avatar_url(
     user.avatar_url = avatar_url
     await session.commit()
     await session.refresh(user)
+    await invalidate_user(user.id)
     return user
 
 
@@ -104,4 +112,5 @@ async def update_password(
     user.hashed_password = hashed_password
     await session.commit()
     await session.refresh(user)
+    await invalidate_user(user.id)
     return user
@@ -1,13 +1,13 @@
 """Authentication endpoints and email verification helpers."""
-from fastapi import APIRouter, Depends, HTTPException, Query, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordRequestForm
 
 from app.auth import (
     create_access_token,
     create_refresh_token,
-    hash_password,
-    verify_password,
+    hash_password_async,
+    verify_password_async,
 )
 from app.db import get_session
 from app.repositories.users import (
@@ -17,81 +17,15 @@ from app.repositories.users import (
     set_user_verified,
 )
 from app.schemas import RefreshRequest, Token, UserCreate, UserRead, PasswordResetConfirm
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from app.config import settings
+from app import outbox_worker
+from app.repositories.outbox import enqueue_email
+from app.tracing import TracedRoute
 
-router = APIRouter(prefix="/auth", tags=["auth"])
-
-def get_fastmail_config() -> ConnectionConfig:
-    """Build and return a FastMail ConnectionConfig from application settings.
-
-    Returns:
-        ConnectionConfig instance ready to be used with FastMail.
-    """
-    use_credentials = (
-        settings.mail_use_credentials
-        if settings.mail_use_credentials is not None
-        else bool(settings.mail_username)
-    )
-    return ConnectionConfig(
-        MAIL_USERNAME=settings.mail_username or "",
-        MAIL_PASSWORD=settings.mail_password or "",
-        MAIL_FROM=settings.mail_from,
-        MAIL_PORT=settings.mail_port,
-        MAIL_SERVER=settings.mail_server,
-        MAIL_STARTTLS=settings.mail_starttls,
-        MAIL_SSL_TLS=settings.mail_ssl_tls,
-        USE_CREDENTIALS=use_credentials,
-        VALIDATE_CERTS=False,
-    )
-
-
-async def send_verification_email(email: str, token: str) -> None:
-    """Send an email with a verification link to the given address.
-
-    Args:
-        email: Recipient email address.
-        token: JWT token used to verify email ownership.
-
-    Returns:
-        None
-    """
-    base = settings.public_base_url.rstrip("/")
-    verification_link = f"{base}/auth/verify?token={token}"
-    message = MessageSchema(
-        subject="Verify your email",
-        recipients=[email],
-        body=f"Please verify your email by clicking the link: {verification_link}",
-        subtype=MessageType.plain,
-    )
-    fm = FastMail(get_fastmail_config())
-    await fm.send_message(message)
-
-
-async def send_password_reset_email(email: str, token: str) -> None:
-    """Send a password reset email with secure token link.
-
-    Args:
-        email: Recipient email address.
-        token: JWT token used to reset password.
-
-    Returns:
-        None
-    """
-    base = settings.public_base_url.rstrip("/")
-    reset_link = f"{base}/auth/reset-password?token={token}"
-    message = MessageSchema(
-        subject="Reset your password",
-        recipients=[email],
-        body=f"You requested a password reset. Use this link to proceed: {reset_link}",
-        subtype=MessageType.plain,
-    )
-    fm = FastMail(get_fastmail_config())
-    await fm.send_message(message)
+router = APIRouter(prefix="/auth", tags=["auth"], route_class=TracedRoute)
 
 
 @router.post("/register", response_model=UserRead, status_code=status.HTTP_201_CREATED)
-async def register(payload: UserCreate, background_tasks: BackgroundTasks, session: AsyncSession = Depends(get_session)):
+async def register(payload: UserCreate, session: AsyncSession = Depends(get_session)):
     existing = await get_user_by_email(session, payload.email)
     if existing:
         raise HTTPException(
@@ -99,13 +33,19 @@ async def register(payload: UserCreate, background_tasks: BackgroundTasks, sessi
             detail="User with this email already exists",
         )
     user = await create_user(
-        session, email=payload.email, hashed_password=hash_password(payload.password)
+        session,
+        email=payload.email,
+        hashed_password=await hash_password_async(payload.password),
+        commit=False,
     )
-    # Send verification email
+    # Queue the verification email in the same transaction as the user
     verify_token = create_access_token(
         {"sub": str(user.id), "email": user.email, "scope": "verify"}
     )
-    background_tasks.add_task(send_verification_email, user.email, verify_token)
+    await enqueue_email(session, kind="verify", recipient=user.email, token=verify_token)
+    await session.commit()
+    await session.refresh(user)
+    outbox_worker.notify()
     return UserRead.model_validate(user)
 
 
@@ -115,7 +55,9 @@ async def login(
     session: AsyncSession = Depends(get_session),
 ):
     user = await get_user_by_email(session, form_data.username)
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await verify_password_async(
+        form_data.password, user.hashed_password
+    ):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email or password"
         )
@@ -161,7 +103,6 @@ async def refresh(
 
 @router.post("/request-verification")
 async def request_verification_token(
-    background_tasks: BackgroundTasks,
     email: str = Query(...),
     session: AsyncSession = Depends(get_session),
 ):
@@ -173,13 +114,14 @@ async def request_verification_token(
     token = create_access_token(
         {"sub": str(user.id), "email": user.email, "scope": "verify"}
     )
-    background_tasks.add_task(send_verification_email, user.email, token)
+    await enqueue_email(session, kind="verify", recipient=user.email, token=token)
+    await session.commit()
+    outbox_worker.notify()
     return {"detail": "Verification email sent", "verification_token": token}
 
 
 @router.post("/request-password-reset")
 async def request_password_reset(
-    background_tasks: BackgroundTasks,
     email: str = Query(...),
     session: AsyncSession = Depends(get_session),
 ):
@@ -191,7 +133,9 @@ async def request_password_reset(
     token = create_access_token(
         {"sub": str(user.id), "email": user.email, "scope": "reset"}
     )
-    background_tasks.add_task(send_password_reset_email, user.email, token)
+    await enqueue_email(session, kind="reset", recipient=user.email, token=token)
+    await session.commit()
+    outbox_worker.notify()
     # For test/dev parity, return token like verification flow
     return {"detail": "Password reset email sent", "reset_token": token}
 
@@ -221,7 +165,7 @@ async def reset_password(
         )
 
     from app.repositories.users import update_password
-    hashed = hash_password(payload.new_password)
+    hashed = await hash_password_async(payload.new_password)
     await update_password(session, user, hashed)
     return {"detail": "Password updated successfully"}
 
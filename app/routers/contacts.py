@@ -1,21 +1,193 @@
 """Contacts API endpoints."""
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+import csv
+import hashlib
+import io
+import json
+from datetime import date
+from typing import Any, AsyncIterator, Awaitable, Callable, Literal
+
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    File,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    UploadFile,
+    status,
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter, ValidationError
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app import db
 from app.db import get_session
-from app.auth import get_current_user
+from app.importers import iter_csv_records, iter_vcard_records, next_valid_chunk
+from app.auth import get_current_user, get_read_session
+from app.cache import (
+    contacts_cache_key,
+    contacts_version,
+    get_cached_response,
+    seconds_until_midnight,
+    set_cached_response,
+    wrote_recently,
+)
+from app.config import settings
+from app.pagination import decode_cursor, encode_cursor
 from app.repositories.contacts import (
+    CONTACT_SORT_KEYS,
+    EXPORT_COLUMNS,
+    bulk_create_contacts,
+    bulk_delete_contacts,
+    bulk_update_contacts,
+    contact_sort_values,
+    contact_updated_at,
+    contacts_change_marker,
     create_contact,
     delete_contact,
     get_contact,
+    import_contacts,
     list_contacts,
+    search_contacts,
+    stream_contacts,
     upcoming_birthdays,
     update_contact,
 )
-from app.schemas import ContactCreate, ContactRead, ContactUpdate
+from app.schemas import (
+    ContactBulkAffected,
+    ContactBulkItemResult,
+    ContactBulkResult,
+    ContactBulkSelection,
+    ContactBulkUpdate,
+    ContactCreate,
+    ContactImportResult,
+    ContactRead,
+    ContactUpdate,
+)
+from app.tracing import TracedRoute
+
+router = APIRouter(prefix="/api/contacts", tags=["contacts"], route_class=TracedRoute)
+
+# Deep OFFSET pages make the database scan and discard every skipped row;
+# clients that need to go further should follow the keyset cursor instead.
+MAX_OFFSET = 10_000
+MAX_BULK_ITEMS = 5_000
+# Rejected rows are counted in full but only this many are described.
+MAX_IMPORT_ERRORS = 100
+
+_CONTACT = TypeAdapter(ContactRead)
+_CONTACT_LIST = TypeAdapter(list[ContactRead])
+
+
+def _parse_cursor(cursor: str, sort: str, types: tuple[type, ...]) -> list[Any]:
+    """Decode a page cursor and check it matches the requested sort order.
+
+    ``types`` lists the expected type of each keyset value, so a tampered
+    cursor is rejected with 400 instead of failing in the database.
+    """
+    try:
+        payload = decode_cursor(cursor)
+    except ValueError:
+        payload = {}
+    keys = payload.get("k")
+    if (
+        payload.get("s") != sort
+        or not isinstance(keys, list)
+        or len(keys) != len(types)
+        or not all(isinstance(k, t) for k, t in zip(keys, types))
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+    return keys
 
-router = APIRouter(prefix="/api/contacts", tags=["contacts"])
+
+def _set_next_page(
+    request: Request, response: Response, sort: str, keys: list[Any]
+) -> None:
+    """Expose the next page cursor via X-Next-Cursor and Link headers."""
+    next_cursor = encode_cursor({"s": sort, "k": keys})
+    next_url = request.url.remove_query_params("offset").include_query_params(
+        cursor=next_cursor
+    )
+    response.headers["X-Next-Cursor"] = next_cursor
+    response.headers["Link"] = f'<{next_url}>; rel="next"'
+
+
+def _etag(request: Request, seed: Any) -> str:
+    """Build a strong ETag from the request path, query and a change marker."""
+    query = sorted(request.query_params.multi_items())
+    raw = f"{request.url.path}?{query}|{seed}".encode("utf-8")
+    return '"' + hashlib.sha256(raw).hexdigest()[:32] + '"'
+
+
+def _not_modified(request: Request, etag: str | None) -> bool:
+    """Check ``If-None-Match`` against ``etag`` (weak comparison, RFC 9110)."""
+    header = request.headers.get("if-none-match")
+    if not header or etag is None:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+
+def _not_modified_response(etag: str) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag, "Cache-Control": "private, no-cache"},
+    )
+
+
+async def _cached_read(
+    request: Request,
+    response: Response,
+    user_id: int,
+    adapter: TypeAdapter,
+    change_marker: Callable[[], Awaitable[Any]],
+    load: Callable[[], Awaitable[Any]],
+    ttl: int,
+    seed: tuple[Any, ...] = (),
+) -> Response:
+    """Serve a contact read with an ETag, from the response cache when possible.
+
+    The ETag and the cache key are derived from the user's contacts
+    generation, which every write bumps after committing, so any write
+    makes both stale. Without Redis there is no generation and the ETag
+    falls back to ``change_marker()``, a cheap query over the underlying
+    rows. ``If-None-Match`` is answered with 304 before ``load`` runs.
+    Headers that ``load`` sets on ``response`` are cached along with the
+    body; ``seed`` holds further ETag inputs, e.g. the current date.
+    """
+    version = await contacts_version(user_id)
+    key = contacts_cache_key(
+        user_id, version, request.url.path, request.query_params.multi_items()
+    )
+    if key is not None:
+        cached = await get_cached_response(key)
+        if cached is not None:
+            body, headers = cached
+            if _not_modified(request, headers.get("etag")):
+                return _not_modified_response(headers["etag"])
+            return Response(body, media_type="application/json", headers=headers)
+    marker = f"v{version}" if version is not None else await change_marker()
+    etag = _etag(request, (*seed, marker))
+    if _not_modified(request, etag):
+        return _not_modified_response(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    body = adapter.dump_json(await load())
+    headers = {
+        name: value
+        for name, value in response.headers.items()
+        if name not in ("content-length", "content-type")
+    }
+    if key is not None:
+        await set_cached_response(key, body, headers, ttl)
+    return Response(body, media_type="application/json", headers=headers)
 
 
 @router.post("", response_model=ContactRead, status_code=status.HTTP_201_CREATED)
@@ -38,57 +210,350 @@ async def create_contact_endpoint(
     return ContactRead.model_validate(contact)
 
 
+@router.post("/bulk", response_model=ContactBulkResult)
+async def bulk_create_contacts_endpoint(
+    items: list[dict[str, Any]] = Body(..., max_length=MAX_BULK_ITEMS),
+    session: AsyncSession = Depends(get_session),
+    current_user=Depends(get_current_user),
+) -> ContactBulkResult:
+    """Create many contacts at once, reporting the outcome of each item.
+
+    Items are validated individually, so invalid entries are reported without
+    rejecting the whole request. An item is a ``conflict`` if its email
+    already exists for the user or appeared earlier in the same request.
+    """
+    uid = int(current_user["id"])
+    results: list[ContactBulkItemResult] = []
+    to_insert: dict[str, dict[str, Any]] = {}
+    pending: list[tuple[ContactBulkItemResult, str]] = []
+    for index, item in enumerate(items):
+        try:
+            contact = ContactCreate.model_validate(item)
+        except ValidationError as e:
+            results.append(
+                ContactBulkItemResult(
+                    index=index,
+                    status="invalid",
+                    errors=e.errors(include_url=False, include_context=False),
+                )
+            )
+            continue
+        result = ContactBulkItemResult(index=index, status="conflict")
+        results.append(result)
+        if contact.email not in to_insert:
+            to_insert[contact.email] = contact.model_dump()
+            pending.append((result, contact.email))
+
+    created = await bulk_create_contacts(
+        session, user_id=uid, contacts=list(to_insert.values())
+    )
+    for result, contact_email in pending:
+        if contact_email in created:
+            result.status = "created"
+            result.id = created[contact_email]
+
+    return ContactBulkResult(
+        created=len(created),
+        conflicts=sum(r.status == "conflict" for r in results),
+        invalid=sum(r.status == "invalid" for r in results),
+        items=results,
+    )
+
+
+def _bulk_selection(selection: ContactBulkSelection) -> dict[str, Any]:
+    """Translate a bulk selection into repository keyword arguments.
+
+    Requires IDs or at least one filter, so an empty body can never match
+    every contact of the user.
+    """
+    filters = selection.filter.model_dump(exclude_none=True) if selection.filter else {}
+    filters = {name: value for name, value in filters.items() if value}
+    if selection.ids is None and not filters:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide ids or at least one filter",
+        )
+    return {"ids": selection.ids, **filters}
+
+
+@router.post("/bulk/update", response_model=ContactBulkAffected)
+async def bulk_update_contacts_endpoint(
+    payload: ContactBulkUpdate,
+    session: AsyncSession = Depends(get_session),
+    current_user=Depends(get_current_user),
+) -> ContactBulkAffected:
+    """Apply the same changes to every selected contact (by IDs and/or filter)."""
+    uid = int(current_user["id"])
+    values = payload.changes.model_dump(exclude_none=True)
+    if not values:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="No changes provided"
+        )
+    ids = await bulk_update_contacts(
+        session, user_id=uid, values=values, **_bulk_selection(payload)
+    )
+    return ContactBulkAffected(count=len(ids), ids=ids)
+
+
+@router.post("/bulk/delete", response_model=ContactBulkAffected)
+async def bulk_delete_contacts_endpoint(
+    payload: ContactBulkSelection,
+    session: AsyncSession = Depends(get_session),
+    current_user=Depends(get_current_user),
+) -> ContactBulkAffected:
+    """Delete every selected contact (by IDs and/or filter)."""
+    uid = int(current_user["id"])
+    ids = await bulk_delete_contacts(session, user_id=uid, **_bulk_selection(payload))
+    return ContactBulkAffected(count=len(ids), ids=ids)
+
+
+@router.post("/import", response_model=ContactImportResult)
+async def import_contacts_endpoint(
+    file: UploadFile = File(...),
+    import_format: Literal["csv", "vcard"] | None = Query(
+        None, alias="format", description="Defaults to the upload's type"
+    ),
+    session: AsyncSession = Depends(get_session),
+    current_user=Depends(get_current_user),
+) -> ContactImportResult:
+    """Import contacts from a CSV or vCard file, merging on email.
+
+    The upload is parsed and validated in chunks off the event loop and fed
+    to the database with COPY, so large address books never sit in memory
+    as a whole. Existing contacts with the same email are updated.
+    """
+    uid = int(current_user["id"])
+    if import_format is None:
+        filename = (file.filename or "").lower()
+        is_vcard = filename.endswith((".vcf", ".vcard")) or (
+            file.content_type or ""
+        ).endswith(("/vcard", "/x-vcard"))
+        import_format = "vcard" if is_vcard else "csv"
+    parse = iter_vcard_records if import_format == "vcard" else iter_csv_records
+    records = parse(file.file)
+    rejected = 0
+    errors: list[dict[str, Any]] = []
+
+    async def valid_chunks():
+        nonlocal rejected
+        while (chunk := await run_in_threadpool(next_valid_chunk, records)) is not None:
+            valid, invalid = chunk
+            rejected += len(invalid)
+            errors.extend(invalid[: MAX_IMPORT_ERRORS - len(errors)])
+            yield valid
+
+    try:
+        counts = await import_contacts(session, user_id=uid, chunks=valid_chunks())
+    except csv.Error as e:
+        await session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"Malformed file: {e}"
+        ) from e
+    return ContactImportResult(**counts, rejected=rejected, errors=errors)
+
+
 @router.get("", response_model=list[ContactRead])
 async def list_contacts_endpoint(
+    request: Request,
+    response: Response,
     first_name: str | None = Query(None),
     last_name: str | None = Query(None),
     email: str | None = Query(None),
+    sort: Literal["id", "name"] = Query("id"),
+    cursor: str | None = Query(None, description="Opaque cursor from X-Next-Cursor"),
     limit: int = Query(100, ge=1, le=1000),
-    offset: int = Query(0, ge=0),
-    session: AsyncSession = Depends(get_session),
+    offset: int = Query(0, ge=0, le=MAX_OFFSET),
+    session: AsyncSession = Depends(get_read_session),
     current_user=Depends(get_current_user),
 ):
+    """List contacts using offset or keyset (cursor) pagination.
+
+    When more rows are available, the response carries the cursor of the next
+    page in the ``X-Next-Cursor`` header and a ``Link: <...>; rel="next"``
+    header pointing at it. Responses carry an ``ETag``; send it back in
+    ``If-None-Match`` to get 304 when nothing changed.
+    """
     uid = int(current_user["id"])
-    contacts = await list_contacts(
-        session,
-        user_id=uid,
-        first_name=first_name,
-        last_name=last_name,
-        email=email,
-        limit=limit,
-        offset=offset,
+    after = None
+    if cursor is not None:
+        if offset:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="cursor and offset cannot be combined",
+            )
+        types = tuple(col.type.python_type for col in CONTACT_SORT_KEYS[sort])
+        after = _parse_cursor(cursor, sort, types)
+
+    async def load() -> list[ContactRead]:
+        contacts = await list_contacts(
+            session,
+            user_id=uid,
+            first_name=first_name,
+            last_name=last_name,
+            email=email,
+            limit=limit + 1,
+            offset=offset,
+            sort=sort,
+            after=after,
+        )
+        if len(contacts) > limit:
+            contacts = contacts[:limit]
+            _set_next_page(
+                request, response, sort, contact_sort_values(contacts[-1], sort)
+            )
+        return [ContactRead.model_validate(c) for c in contacts]
+
+    return await _cached_read(
+        request,
+        response,
+        uid,
+        _CONTACT_LIST,
+        lambda: contacts_change_marker(session, uid),
+        load,
+        settings.contacts_cache_ttl_seconds,
     )
-    return [ContactRead.model_validate(c) for c in contacts]
+
+
+async def _export_rows(
+    user_id: int, export_format: str, use_primary: bool = False
+) -> AsyncIterator[bytes]:
+    """Encode a user's contacts as CSV or NDJSON, one chunk per fetched batch.
+
+    Opens its own read session: dependency-provided sessions are closed
+    before a streaming response body is sent.
+    """
+    columns = [col.key for col in EXPORT_COLUMNS]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if export_format == "csv":
+        writer.writerow(columns)
+        yield buffer.getvalue().encode("utf-8")
+    async with await db.open_read_session(use_primary) as session:
+        async for rows in stream_contacts(session, user_id):
+            buffer.seek(0)
+            buffer.truncate()
+            if export_format == "csv":
+                writer.writerows([row[c] for c in columns] for row in rows)
+            else:
+                for row in rows:
+                    buffer.write(json.dumps(dict(row), default=str))
+                    buffer.write("\n")
+            yield buffer.getvalue().encode("utf-8")
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_contacts_endpoint(
+    export_format: Literal["csv", "ndjson"] = Query("csv", alias="format"),
+    current_user=Depends(get_current_user),
+) -> StreamingResponse:
+    """Stream every contact of the current user as CSV or NDJSON."""
+    uid = int(current_user["id"])
+    use_primary = await wrote_recently(uid)
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        _export_rows(uid, export_format, use_primary),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="contacts.{export_format}"'
+        },
+    )
+
+
+@router.get("/search", response_model=list[ContactRead])
+async def search_contacts_endpoint(
+    request: Request,
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    cursor: str | None = Query(None, description="Opaque cursor from X-Next-Cursor"),
+    limit: int = Query(50, ge=1, le=200),
+    session: AsyncSession = Depends(get_read_session),
+    current_user=Depends(get_current_user),
+):
+    """Search contacts by names, email, phone and extra info, most relevant first.
+
+    Paginated with the same cursor headers as the list endpoint.
+    """
+    uid = int(current_user["id"])
+    after = None
+    if cursor is not None:
+        after = _parse_cursor(cursor, "rank", ((int, float), int))
+    rows = await search_contacts(
+        session, user_id=uid, query=q, limit=limit + 1, after=after
+    )
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last, last_rank = rows[-1]
+        _set_next_page(request, response, "rank", [last_rank, last.id])
+    return [ContactRead.model_validate(contact) for contact, _ in rows]
 
 
 @router.get("/upcoming_birthdays", response_model=list[ContactRead])
 async def upcoming_birthdays_endpoint(
+    request: Request,
+    response: Response,
     days: int = Query(7, ge=1, le=31),
     limit: int = Query(100, ge=1, le=1000),
     offset: int = Query(0, ge=0),
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
     current_user=Depends(get_current_user),
 ):
     uid = int(current_user["id"])
-    contacts = await upcoming_birthdays(
-        session, user_id=uid, days=days, limit=limit, offset=offset
+
+    async def load() -> list[ContactRead]:
+        contacts = await upcoming_birthdays(
+            session, user_id=uid, days=days, limit=limit, offset=offset
+        )
+        return [ContactRead.model_validate(c) for c in contacts]
+
+    # The window moves at midnight, so entries must not outlive the day
+    ttl = min(settings.contacts_cache_ttl_seconds, seconds_until_midnight())
+    return await _cached_read(
+        request,
+        response,
+        uid,
+        _CONTACT_LIST,
+        lambda: contacts_change_marker(session, uid),
+        load,
+        ttl,
+        seed=(date.today(),),
     )
-    return [ContactRead.model_validate(c) for c in contacts]
 
 
 @router.get("/{contact_id}", response_model=ContactRead)
 async def get_contact_endpoint(
+    request: Request,
+    response: Response,
     contact_id: int,
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
     current_user=Depends(get_current_user),
 ):
     uid = int(current_user["id"])
-    contact = await get_contact(session, uid, contact_id)
-    if not contact:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found"
-        )
-    return ContactRead.model_validate(contact)
+
+    async def change_marker() -> Any:
+        updated_at = await contact_updated_at(session, uid, contact_id)
+        if updated_at is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found"
+            )
+        return updated_at
+
+    async def load() -> ContactRead:
+        contact = await get_contact(session, uid, contact_id)
+        if not contact:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found"
+            )
+        return ContactRead.model_validate(contact)
+
+    return await _cached_read(
+        request,
+        response,
+        uid,
+        _CONTACT,
+        change_marker,
+        load,
+        settings.contacts_cache_ttl_seconds,
+    )
 
 
 @router.put("/{contact_id}", response_model=ContactRead)
@@ -1,9 +1,10 @@
 """User profile endpoints."""
+import asyncio
 import time
+from io import BytesIO
 
-import cloudinary
-import cloudinary.uploader
 from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status, Request
+from opentelemetry.trace import SpanKind
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.limiter import limiter
 
@@ -12,8 +13,17 @@ from app.config import settings
 from app.db import get_session
 from app.repositories.users import get_user_by_id, update_avatar_url
 from app.schemas import UserRead
+from app.storage import (
+    StorageNotConfigured,
+    UploadTooLarge,
+    check_upload_size,
+    generate_thumbnails,
+    get_storage,
+    thumbnails_enabled,
+)
+from app.tracing import TracedRoute, span
 
-router = APIRouter(prefix="/api/users", tags=["users"])
+router = APIRouter(prefix="/api/users", tags=["users"], route_class=TracedRoute)
 
 
 @router.get("/me", response_model=UserRead)
@@ -38,26 +48,47 @@ async def update_avatar(
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
-    cloud_url = settings.cloudinary_url
-    if not cloud_url:
+    if not (file.content_type or "").startswith("image/"):
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Cloudinary is not configured",
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Avatar must be an image",
         )
-    cloudinary.config(cloudinary_url=cloud_url)
     try:
-        upload_result = cloudinary.uploader.upload(
-            file.file,
-            folder="avatars",
-            public_id=f"user_{current_user['id']}",
-            overwrite=True,
-            resource_type="image",
+        await check_upload_size(file, settings.avatar_max_bytes)
+    except UploadTooLarge:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Avatar must not exceed {settings.avatar_max_bytes} bytes",
         )
+    try:
+        storage = get_storage()
+    except StorageNotConfigured as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        ) from e
+
+    key = f"user_{current_user['id']}"
+    data = None
+    if thumbnails_enabled():
+        data = await file.read()
+        await file.seek(0)
+    try:
+        with span(f"{storage.name}.upload", SpanKind.CLIENT, {"storage.key": key}):
+            # The original uploads in a thread while thumbnails render in the pool
+            avatar_url, thumbnails = await asyncio.gather(
+                storage.save_async(key, file.file, file.content_type),
+                generate_thumbnails(data),
+            )
+            await asyncio.gather(
+                *(
+                    storage.save_async(f"{key}_{size}", BytesIO(png), "image/png")
+                    for size, png in thumbnails.items()
+                )
+            )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_502_BAD_GATEWAY, detail="Avatar upload failed"
         ) from e
 
-    avatar_url = upload_result.get("secure_url")
     user = await update_avatar_url(session, db_user, avatar_url)
     return UserRead.model_validate(user)
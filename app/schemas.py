@@ -1,4 +1,5 @@
 from datetime import date, datetime
+from typing import Any, Literal
 
 from pydantic import BaseModel, EmailStr, Field
 
@@ -70,3 +71,54 @@ class ContactRead(ContactBase):
     model_config = {
         "from_attributes": True,
     }
+
+
+class ContactBulkItemResult(BaseModel):
+    index: int
+    status: Literal["created", "conflict", "invalid"]
+    id: int | None = None
+    errors: list[dict[str, Any]] | None = None
+
+
+class ContactBulkResult(BaseModel):
+    created: int
+    conflicts: int
+    invalid: int
+    items: list[ContactBulkItemResult]
+
+
+class ContactImportResult(BaseModel):
+    inserted: int
+    updated: int
+    unchanged: int
+    rejected: int
+    errors: list[dict[str, Any]]
+
+
+class ContactFilter(BaseModel):
+    first_name: str | None = None
+    last_name: str | None = None
+    email: str | None = None
+
+
+class ContactBulkSelection(BaseModel):
+    ids: list[int] | None = Field(None, max_length=10_000)
+    filter: ContactFilter | None = None
+
+
+class ContactBulkChanges(BaseModel):
+    # Email is unique per user, so it cannot be set on many contacts at once
+    first_name: str | None = Field(None, min_length=1, max_length=100)
+    last_name: str | None = Field(None, min_length=1, max_length=100)
+    phone: str | None = Field(None, min_length=3, max_length=50)
+    birthday: date | None = None
+    extra_info: str | None = None
+
+
+class ContactBulkUpdate(ContactBulkSelection):
+    changes: ContactBulkChanges
+
+
+class ContactBulkAffected(BaseModel):
+    count: int
+    ids: list[int]
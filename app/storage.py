@@ -0,0 +1,268 @@
+"""Avatar storage backends and thumbnail generation.
+
+``AVATAR_STORAGE`` selects Cloudinary or a local directory served under
+``MEDIA_URL_PATH``, which works offline. Backends are synchronous (the
+Cloudinary SDK is) and always run in a worker thread via
+:meth:`AvatarStorage.save_async`, so uploads never block the event loop.
+
+Thumbnails of ``AVATAR_THUMBNAIL_SIZES`` are rendered with Pillow in a
+process pool, when Pillow is installed, and stored next to the original as
+``<key>_<size>``.
+
+Oversized uploads are refused from their ``Content-Length`` header by
+:class:`UploadSizeLimitMiddleware`, before the body is received; bodies
+without one are spooled and measured by :func:`check_upload_size`.
+"""
+import asyncio
+import logging
+import mimetypes
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from multiprocessing import get_context
+from pathlib import Path
+from typing import BinaryIO
+
+import cloudinary
+import cloudinary.uploader
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+
+from app.config import settings
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; thumbnails are skipped without it
+    Image = ImageOps = None
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from an upload at a time
+CHUNK_SIZE = 64 * 1024
+# Allowance for multipart boundaries and part headers around the file
+MULTIPART_OVERHEAD = 16 * 1024
+
+
+class StorageNotConfigured(Exception):
+    """The selected storage backend is missing required settings."""
+
+
+class UploadTooLarge(Exception):
+    """An upload exceeded the configured size limit."""
+
+
+class AvatarStorage:
+    """Destination for avatar images; subclasses implement :meth:`save`."""
+
+    name = "storage"
+
+    def save(self, key: str, fileobj: BinaryIO, content_type: str) -> str:
+        """Store an image synchronously and return its public URL.
+
+        Args:
+            key: Object name without extension, e.g. ``user_42``.
+            fileobj: Image data, read from the current position.
+            content_type: MIME type of the image.
+
+        Returns:
+            Public URL of the stored image.
+        """
+        raise NotImplementedError
+
+    async def save_async(self, key: str, fileobj: BinaryIO, content_type: str) -> str:
+        """Run :meth:`save` in a worker thread."""
+        return await run_in_threadpool(self.save, key, fileobj, content_type)
+
+
+class CloudinaryStorage(AvatarStorage):
+    """Upload avatars to Cloudinary, overwriting earlier versions."""
+
+    name = "cloudinary"
+
+    def __init__(self, cloudinary_url: str, folder: str = "avatars"):
+        self.cloudinary_url = cloudinary_url
+        self.folder = folder
+
+    def save(self, key: str, fileobj: BinaryIO, content_type: str) -> str:
+        cloudinary.config(cloudinary_url=self.cloudinary_url)
+        result = cloudinary.uploader.upload(
+            fileobj,
+            folder=self.folder,
+            public_id=key,
+            overwrite=True,
+            resource_type="image",
+        )
+        return result.get("secure_url")
+
+
+class LocalStorage(AvatarStorage):
+    """Write avatars below a directory that the app serves as static files.
+
+    Files are written to a temporary name and renamed into place, so readers
+    never see a partial image.
+    """
+
+    name = "local"
+
+    def __init__(self, root: str | Path, base_url: str, folder: str = "avatars"):
+        self.directory = Path(root) / folder
+        self.base_url = f"{base_url.rstrip('/')}/{folder}"
+
+    def save(self, key: str, fileobj: BinaryIO, content_type: str) -> str:
+        extension = mimetypes.guess_extension(content_type or "") or ".bin"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    chunk = fileobj.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    out.write(chunk)
+            os.replace(tmp_path, self.directory / f"{key}{extension}")
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        # Versioned URL, since every upload of a user overwrites the same file
+        return f"{self.base_url}/{key}{extension}?v={time.time_ns()}"
+
+
+def get_storage() -> AvatarStorage:
+    """Return the backend selected by ``AVATAR_STORAGE``.
+
+    Raises:
+        StorageNotConfigured: If Cloudinary is selected but ``CLOUDINARY_URL`` is unset.
+    """
+    if settings.avatar_storage == "local":
+        return LocalStorage(
+            settings.media_root,
+            f"{settings.public_base_url.rstrip('/')}{settings.media_url_path}",
+        )
+    if not settings.cloudinary_url:
+        raise StorageNotConfigured("Cloudinary is not configured")
+    return CloudinaryStorage(settings.cloudinary_url)
+
+
+async def check_upload_size(file: UploadFile, max_bytes: int) -> int:
+    """Measure a spooled upload in chunks, enforcing ``max_bytes``, then rewind it.
+
+    Runs after the request body was received; the size of the body itself
+    is capped earlier by :class:`UploadSizeLimitMiddleware`.
+
+    Returns:
+        Size of the upload in bytes.
+
+    Raises:
+        UploadTooLarge: If the file is larger than ``max_bytes``.
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise UploadTooLarge
+    size = 0
+    while True:
+        chunk = await file.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadTooLarge
+    await file.seek(0)
+    return size
+
+
+def thumbnails_enabled() -> bool:
+    """Tell whether thumbnails are configured and Pillow is available."""
+    return Image is not None and bool(settings.avatar_thumbnail_size_list)
+
+
+def render_thumbnails(data: bytes, sizes: tuple[int, ...]) -> dict[int, bytes]:
+    """Render PNG thumbnails fitting ``size`` x ``size`` boxes (runs in a worker process)."""
+    with Image.open(BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source)
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+    thumbnails = {}
+    for size in sizes:
+        thumb = image.copy()
+        thumb.thumbnail((size, size))
+        out = BytesIO()
+        thumb.save(out, "PNG", optimize=True)
+        thumbnails[size] = out.getvalue()
+    return thumbnails
+
+
+_thumbnail_pool: ProcessPoolExecutor | None = None
+
+
+def _get_thumbnail_pool() -> ProcessPoolExecutor:
+    global _thumbnail_pool
+    if _thumbnail_pool is None:
+        # spawn: forking a process that runs threads (bcrypt pool) is unsafe
+        _thumbnail_pool = ProcessPoolExecutor(
+            max_workers=settings.avatar_thumbnail_workers, mp_context=get_context("spawn")
+        )
+    return _thumbnail_pool
+
+
+async def generate_thumbnails(data: bytes | None) -> dict[int, bytes]:
+    """Render thumbnails of an image in the process pool.
+
+    Returns:
+        Size -> PNG bytes; empty when thumbnails are disabled or the data
+        is not a readable image.
+    """
+    if data is None or not thumbnails_enabled():
+        return {}
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(
+            _get_thumbnail_pool(),
+            render_thumbnails,
+            data,
+            tuple(settings.avatar_thumbnail_size_list),
+        )
+    except Exception:
+        logger.warning("Could not render avatar thumbnails", exc_info=True)
+        return {}
+
+
+def shutdown_thumbnail_pool() -> None:
+    """Stop the thumbnail worker processes, if started."""
+    global _thumbnail_pool
+    if _thumbnail_pool is not None:
+        _thumbnail_pool.shutdown(wait=False, cancel_futures=True)
+        _thumbnail_pool = None
+
+
+class UploadSizeLimitMiddleware:
+    """ASGI middleware refusing oversized upload bodies before they are read.
+
+    Requests to ``paths`` whose ``Content-Length`` exceeds ``max_bytes``
+    plus :data:`MULTIPART_OVERHEAD` get a 413 without the body being
+    received or spooled to disk.
+
+    Args:
+        app: Wrapped ASGI application.
+        paths: Exact upload paths to check.
+        max_bytes: Largest accepted file, defaults to ``AVATAR_MAX_BYTES``.
+    """
+
+    def __init__(self, app, paths: tuple[str, ...], max_bytes: int | None = None):
+        self.app = app
+        self.paths = frozenset(paths)
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in self.paths:
+            max_bytes = self.max_bytes or settings.avatar_max_bytes
+            length = dict(scope["headers"]).get(b"content-length", b"")
+            if length.isdigit() and int(length) > max_bytes + MULTIPART_OVERHEAD:
+                response = JSONResponse(
+                    status_code=413,
+                    content={"detail": f"Avatar must not exceed {max_bytes} bytes"},
+                    headers={"Connection": "close"},
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
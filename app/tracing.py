@@ -0,0 +1,295 @@
+"""Request tracing with the OpenTelemetry SDK.
+
+Finished spans are written by the SDK's console exporter as one JSON
+object per line to stdout or a file, so traces can be inspected without a
+collector. Incoming W3C ``traceparent`` headers are continued and sampled
+parents are always kept; new traces are sampled with ``TRACE_SAMPLE_RATIO``.
+"""
+import os
+import sys
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+from fastapi.routing import APIRoute
+from opentelemetry import trace
+from opentelemetry.context import Context
+from opentelemetry.sdk.resources import SERVICE_NAME, Resource
+from opentelemetry.sdk.trace import ReadableSpan, SpanProcessor, TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+from opentelemetry.trace import Span, SpanKind, Status, StatusCode
+from opentelemetry.trace.propagation.tracecontext import TraceContextTextMapPropagator
+from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+
+# Longest SQL statement kept in db.statement attributes
+MAX_STATEMENT_LENGTH = 2000
+
+_propagator = TraceContextTextMapPropagator()
+
+
+def _json_line(span: ReadableSpan) -> str:
+    return span.to_json(indent=None) + os.linesep
+
+
+def build_tracer_provider(processor: SpanProcessor, sample_ratio: float) -> TracerProvider:
+    """Create a tracer provider sampling new traces with ``sample_ratio``.
+
+    Traces continued from a ``traceparent`` keep the caller's decision.
+    Spans are tagged ``service.name=contacts-api`` unless
+    ``OTEL_SERVICE_NAME`` is set.
+
+    Args:
+        processor: Span processor receiving finished spans.
+        sample_ratio: Share of new traces to record, 0 to 1.
+    """
+    provider = TracerProvider(
+        sampler=ParentBased(TraceIdRatioBased(sample_ratio)),
+        resource=Resource.create(
+            {SERVICE_NAME: os.environ.get("OTEL_SERVICE_NAME", "contacts-api")}
+        ),
+    )
+    provider.add_span_processor(processor)
+    return provider
+
+
+def _build_tracer_provider() -> TracerProvider | None:
+    if settings.trace_exporter == "none":
+        return None
+    if settings.trace_exporter == "console":
+        out = sys.stdout
+    else:
+        out = open(settings.trace_file, "a", encoding="utf-8", buffering=1)
+    exporter = ConsoleSpanExporter(out=out, formatter=_json_line)
+    return build_tracer_provider(BatchSpanProcessor(exporter), settings.trace_sample_ratio)
+
+
+# Not registered as the global OpenTelemetry provider, so tests can swap it
+tracer_provider = _build_tracer_provider()
+
+
+def _tracer() -> trace.Tracer:
+    return tracer_provider.get_tracer(__name__)
+
+
+def flush() -> None:
+    """Export spans still buffered by the batch processor, e.g. on shutdown."""
+    if tracer_provider is not None:
+        tracer_provider.force_flush()
+
+
+def current_span() -> Span | None:
+    """Return the active span, or None when the request is not sampled."""
+    active = trace.get_current_span()
+    return active if active.is_recording() else None
+
+
+def _record_error(target: Span, error: BaseException) -> None:
+    """Mark ``target`` as failed with ``error`` recorded as an exception event."""
+    target.record_exception(error)
+    target.set_status(Status(StatusCode.ERROR, f"{type(error).__name__}: {error}"))
+
+
+def start_span(
+    name: str,
+    kind: SpanKind = SpanKind.INTERNAL,
+    attributes: dict[str, Any] | None = None,
+) -> Span | None:
+    """Start a child of the active span without activating it.
+
+    Use for leaf operations timed by callbacks; call ``Span.end``.
+
+    Returns:
+        The span, or None when there is no sampled parent.
+    """
+    if tracer_provider is None or not trace.get_current_span().is_recording():
+        return None
+    return _tracer().start_span(name, kind=kind, attributes=attributes)
+
+
+@contextmanager
+def span(
+    name: str,
+    kind: SpanKind = SpanKind.INTERNAL,
+    attributes: dict[str, Any] | None = None,
+) -> Iterator[Span | None]:
+    """Run a block inside a child span of the active span.
+
+    A no-op (yielding None) when the request is not being traced, so
+    unsampled requests do not create spans.
+
+    Args:
+        name: Span name, e.g. ``smtp.send``.
+        kind: OpenTelemetry span kind.
+        attributes: Initial span attributes.
+    """
+    child = start_span(name, kind, attributes)
+    if child is None:
+        yield None
+        return
+    with trace.use_span(child, end_on_exit=True):
+        yield child
+
+
+@contextmanager
+def root_span(
+    name: str,
+    kind: SpanKind = SpanKind.INTERNAL,
+    attributes: dict[str, Any] | None = None,
+) -> Iterator[Span | None]:
+    """Run a block as the root of a new trace, for work outside any request.
+
+    Sampled with ``TRACE_SAMPLE_RATIO``. Yields None when tracing is off or
+    the trace is not sampled.
+
+    Args:
+        name: Span name, e.g. ``outbox.dispatch``.
+        kind: OpenTelemetry span kind.
+        attributes: Initial span attributes.
+    """
+    if tracer_provider is None:
+        yield None
+        return
+    # An empty context has no parent span, so this starts a new trace
+    root = _tracer().start_span(name, context=Context(), kind=kind, attributes=attributes)
+    if not root.is_recording():
+        root.end()
+        yield None
+        return
+    with trace.use_span(root, end_on_exit=True):
+        yield root
+
+
+def _traceresponse(target: Span) -> str:
+    context = target.get_span_context()
+    return f"00-{context.trace_id:032x}-{context.span_id:016x}-01"
+
+
+class TracingMiddleware:
+    """ASGI middleware opening a SERVER span per sampled HTTP request.
+
+    Continues the caller's trace from ``traceparent`` (respecting its
+    sampled flag) and returns the server span in a ``traceresponse`` header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or tracer_provider is None:
+            await self.app(scope, receive, send)
+            return
+        carrier = {
+            name.decode("latin-1"): value.decode("latin-1") for name, value in scope["headers"]
+        }
+        server = _tracer().start_span(
+            scope["method"],
+            context=_propagator.extract(carrier),
+            kind=SpanKind.SERVER,
+            attributes={"http.request.method": scope["method"], "url.path": scope["path"]},
+        )
+        if not server.is_recording():
+            server.end()
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                server.set_attribute("http.response.status_code", message["status"])
+                if message["status"] >= 500:
+                    server.set_status(Status(StatusCode.ERROR))
+                message.setdefault("headers", [])
+                message["headers"] = [
+                    *message["headers"],
+                    (b"traceresponse", _traceresponse(server).encode("latin-1")),
+                ]
+            await send(message)
+
+        try:
+            with trace.use_span(server):
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            if getattr(route, "path", None):
+                server.update_name(f"{scope['method']} {route.path}")
+                server.set_attribute("http.route", route.path)
+            server.end()
+
+
+class TracedRoute(APIRoute):
+    """APIRoute that wraps dependency resolution and the endpoint in a span."""
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        name = f"handler {self.endpoint.__name__}"
+
+        async def traced_handler(request):
+            with span(name, attributes={"code.function": self.endpoint.__name__}):
+                return await handler(request)
+
+        return traced_handler
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_db_span(conn, cursor, statement, parameters, context, executemany):
+    db_span = start_span(
+        "db.query",
+        SpanKind.CLIENT,
+        {
+            "db.system": conn.dialect.name,
+            "db.operation": statement.lstrip().split(None, 1)[0].upper() if statement else "",
+            "db.statement": statement[:MAX_STATEMENT_LENGTH],
+        },
+    )
+    if db_span is not None:
+        context._trace_span = db_span
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _end_db_span(conn, cursor, statement, parameters, context, executemany):
+    db_span = getattr(context, "_trace_span", None)
+    if db_span is not None:
+        db_span.end()
+
+
+@event.listens_for(Engine, "handle_error")
+def _fail_db_span(exception_context):
+    context = exception_context.execution_context
+    db_span = getattr(context, "_trace_span", None) if context is not None else None
+    if db_span is not None:
+        _record_error(db_span, exception_context.original_exception)
+        db_span.end()
+
+
+class TracedPipeline(Pipeline):
+    """Redis pipeline emitting one span per round trip."""
+
+    async def execute(self, raise_on_error: bool = True):
+        commands = [args[0] for args, _ in self.command_stack]
+        with span(
+            "redis.pipeline",
+            SpanKind.CLIENT,
+            {"db.system": "redis", "db.operation": " ".join(map(str, commands))},
+        ):
+            return await super().execute(raise_on_error)
+
+
+class TracedRedis(Redis):
+    """Redis client emitting a span per command."""
+
+    async def execute_command(self, *args, **options):
+        with span(
+            f"redis.{args[0]}".lower(),
+            SpanKind.CLIENT,
+            {"db.system": "redis", "db.operation": str(args[0])},
+        ):
+            return await super().execute_command(*args, **options)
+
+    def pipeline(self, transaction: bool = True, shard_hint: Any = None) -> TracedPipeline:
+        return TracedPipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
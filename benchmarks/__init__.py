@@ -0,0 +1 @@
+"""Performance benchmarks for the Contacts API (run against PostgreSQL)."""
@@ -0,0 +1,367 @@
+"""Replay a realistic request mix against the API and report per-endpoint latency.
+
+Each virtual user registers its own account, seeds ``--contacts`` contacts
+through the bulk endpoint and then loops over a weighted mix of scenarios
+(login, /api/users/me, filtered list, upcoming birthdays, get, create,
+update, delete) for ``--duration`` seconds. ``--users 1,8,32`` runs one
+stage per concurrency level. For every stage and endpoint the report shows
+request count, errors, RPS and p50/p95/p99 latency.
+
+Results can be saved with ``--output`` and compared between commits with
+``--compare``; the exit status is 1 when the p95 latency of any endpoint
+grew, or total RPS dropped, by more than ``--threshold`` percent.
+
+Usage:
+    # against a running server
+    poetry run python -m benchmarks.loadtest --base-url http://localhost:8000 --output before.json
+    # in-process app (uses DATABASE_URL / REDIS_URL), rate limits disabled
+    poetry run python -m benchmarks.loadtest --in-process --no-rate-limit --users 1,8,32
+    poetry run python -m benchmarks.loadtest --in-process --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from contextlib import AsyncExitStack
+from datetime import date, datetime, timezone
+from typing import Any
+
+import httpx
+
+from benchmarks.login_storm import percentile
+
+PASSWORD = "LoadTestPassw0rd!"
+
+# Default relative weights of each scenario in the mix
+DEFAULT_MIX = {
+    "login": 5,
+    "me": 15,
+    "list": 25,
+    "list_filtered": 10,
+    "birthdays": 15,
+    "get": 10,
+    "create": 10,
+    "update": 7,
+    "delete": 3,
+}
+
+
+def fake_contact(rng: random.Random) -> dict[str, Any]:
+    first = rng.choice(["Anna", "Bohdan", "Olena", "Taras", "Iryna", "Maksym", "Sofia"])
+    last = rng.choice(["Shevchenko", "Kovalenko", "Bondarenko", "Tkachenko", "Kravets"])
+    return {
+        "first_name": first,
+        "last_name": last,
+        "email": f"{first.lower()}.{uuid.uuid4().hex[:10]}@example.com",
+        "phone": f"+380{rng.randrange(10**8, 10**9)}",
+        "birthday": date(
+            rng.randrange(1960, 2005), rng.randrange(1, 13), rng.randrange(1, 29)
+        ).isoformat(),
+    }
+
+
+class VirtualUser:
+    """One simulated client with its own account and contacts."""
+
+    def __init__(self, client: httpx.AsyncClient, rng: random.Random, record):
+        self.client = client
+        self.rng = rng
+        self.record = record
+        self.email = f"load-{uuid.uuid4().hex[:12]}@example.com"
+        self.headers: dict[str, str] = {}
+        self.contact_ids: list[int] = []
+
+    async def setup(self, contacts: int) -> None:
+        r = await self.client.post(
+            "/auth/register", json={"email": self.email, "password": PASSWORD}
+        )
+        r.raise_for_status()
+        await self.login(timed=False)
+        if contacts:
+            r = await self.client.post(
+                "/api/contacts/bulk",
+                headers=self.headers,
+                json=[fake_contact(self.rng) for _ in range(contacts)],
+            )
+            r.raise_for_status()
+            self.contact_ids = [
+                item["id"] for item in r.json()["items"] if item["status"] == "created"
+            ]
+
+    async def request(self, name: str, method: str, url: str, **kwargs) -> httpx.Response | None:
+        started = time.perf_counter()
+        try:
+            r = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.record(name, time.perf_counter() - started, None)
+            return None
+        self.record(name, time.perf_counter() - started, r.status_code)
+        return r
+
+    async def login(self, timed: bool = True) -> None:
+        data = {"username": self.email, "password": PASSWORD}
+        if timed:
+            r = await self.request("login", "POST", "/auth/login", data=data)
+        else:
+            r = await self.client.post("/auth/login", data=data)
+        if r is not None and r.status_code == 200:
+            self.headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+    async def run(self, scenario: str) -> None:
+        h = self.headers
+        if scenario == "login":
+            await self.login()
+        elif scenario == "me":
+            await self.request("me", "GET", "/api/users/me", headers=h)
+        elif scenario == "list":
+            await self.request(
+                "list", "GET", "/api/contacts", headers=h, params={"limit": 50}
+            )
+        elif scenario == "list_filtered":
+            params = self.rng.choice(
+                [{"first_name": "an"}, {"last_name": "enko"}, {"email": "example"}]
+            )
+            await self.request(
+                "list_filtered", "GET", "/api/contacts", headers=h, params=params
+            )
+        elif scenario == "birthdays":
+            await self.request(
+                "birthdays",
+                "GET",
+                "/api/contacts/upcoming_birthdays",
+                headers=h,
+                params={"days": 7},
+            )
+        elif scenario == "get" and self.contact_ids:
+            cid = self.rng.choice(self.contact_ids)
+            await self.request("get", "GET", f"/api/contacts/{cid}", headers=h)
+        elif scenario == "create":
+            r = await self.request(
+                "create", "POST", "/api/contacts", headers=h, json=fake_contact(self.rng)
+            )
+            if r is not None and r.status_code == 201:
+                self.contact_ids.append(r.json()["id"])
+        elif scenario == "update" and self.contact_ids:
+            cid = self.rng.choice(self.contact_ids)
+            await self.request(
+                "update",
+                "PUT",
+                f"/api/contacts/{cid}",
+                headers=h,
+                json={"extra_info": uuid.uuid4().hex},
+            )
+        elif scenario == "delete" and len(self.contact_ids) > 1:
+            cid = self.contact_ids.pop(self.rng.randrange(len(self.contact_ids)))
+            await self.request("delete", "DELETE", f"/api/contacts/{cid}", headers=h)
+
+
+async def run_stage(
+    client: httpx.AsyncClient, users: int, args: argparse.Namespace, mix: dict[str, int]
+) -> dict[str, Any]:
+    samples: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+    statuses: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    recording = False
+
+    def record(name: str, elapsed: float, status: int | None) -> None:
+        if not recording:
+            return
+        statuses[name][str(status)] += 1
+        if status is None or status >= 400:
+            errors[name] += 1
+        else:
+            samples[name].append(elapsed)
+
+    vus = [
+        VirtualUser(client, random.Random(args.seed * 1000 + i), record)
+        for i in range(users)
+    ]
+    await asyncio.gather(*(vu.setup(args.contacts) for vu in vus))
+
+    scenarios, weights = zip(*mix.items())
+
+    async def loop(vu: VirtualUser, until: float) -> None:
+        while time.perf_counter() < until:
+            await vu.run(vu.rng.choices(scenarios, weights)[0])
+            if args.think_time:
+                await asyncio.sleep(vu.rng.uniform(0, 2 * args.think_time))
+
+    await asyncio.gather(*(loop(vu, time.perf_counter() + args.warmup) for vu in vus))
+    recording = True
+    started = time.perf_counter()
+    await asyncio.gather(*(loop(vu, started + args.duration) for vu in vus))
+    elapsed = time.perf_counter() - started
+
+    endpoints = {}
+    for name in sorted(set(samples) | set(errors)):
+        ok = samples[name]
+        endpoints[name] = {
+            "requests": len(ok) + errors[name],
+            "errors": errors[name],
+            "statuses": dict(statuses[name]),
+            "rps": round((len(ok) + errors[name]) / elapsed, 2),
+            "p50_ms": round(percentile(ok, 50), 3),
+            "p95_ms": round(percentile(ok, 95), 3),
+            "p99_ms": round(percentile(ok, 99), 3),
+        }
+    everything = [s for values in samples.values() for s in values]
+    total = len(everything) + sum(errors.values())
+    return {
+        "users": users,
+        "duration_s": round(elapsed, 3),
+        "total": {
+            "requests": total,
+            "errors": sum(errors.values()),
+            "rps": round(total / elapsed, 2),
+            "p50_ms": round(percentile(everything, 50), 3),
+            "p95_ms": round(percentile(everything, 95), 3),
+            "p99_ms": round(percentile(everything, 99), 3),
+        },
+        "endpoints": endpoints,
+    }
+
+
+def print_stage(stage: dict[str, Any]) -> None:
+    print(f"\n== {stage['users']} virtual users, {stage['duration_s']:.1f}s ==")
+    print(f"{'endpoint':<15}{'reqs':>8}{'errors':>8}{'rps':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+    rows = [*stage["endpoints"].items(), ("TOTAL", stage["total"])]
+    for name, e in rows:
+        print(
+            f"{name:<15}{e['requests']:>8}{e['errors']:>8}{e['rps']:>10.1f}"
+            f"{e['p50_ms']:>9.1f}ms{e['p95_ms']:>8.1f}ms{e['p99_ms']:>8.1f}ms"
+        )
+
+
+def compare(current: dict[str, Any], baseline: dict[str, Any], threshold: float) -> bool:
+    """Print per-endpoint deltas against a baseline run; return True on regression."""
+    print(f"\n== compared with {baseline.get('commit') or 'baseline'} ==")
+    regressed = False
+    old_stages = {s["users"]: s for s in baseline["stages"]}
+    for stage in current["stages"]:
+        old = old_stages.get(stage["users"])
+        if old is None:
+            continue
+        print(f"-- {stage['users']} users")
+        rows = [*stage["endpoints"].items(), ("TOTAL", stage["total"])]
+        for name, e in rows:
+            before = old["total"] if name == "TOTAL" else old["endpoints"].get(name)
+            if not before or not before["p95_ms"] or not before["rps"]:
+                continue
+            p95 = (e["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100
+            rps = (e["rps"] - before["rps"]) / before["rps"] * 100
+            # Per-endpoint throughput follows the random mix; gate on the total
+            flag = p95 > threshold or (name == "TOTAL" and rps < -threshold)
+            regressed |= flag
+            print(
+                f"{name:<15} p95 {before['p95_ms']:>8.1f} -> {e['p95_ms']:>8.1f}ms ({p95:+6.1f}%)"
+                f"  rps {before['rps']:>8.1f} -> {e['rps']:>8.1f} ({rps:+6.1f}%)"
+                f"{'  REGRESSION' if flag else ''}"
+            )
+    return regressed
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_mix(value: str | None) -> dict[str, int]:
+    if not value:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in DEFAULT_MIX:
+            raise SystemExit(f"unknown scenario {name!r}; choose from {', '.join(DEFAULT_MIX)}")
+        mix[name] = int(weight or 1)
+    return mix
+
+
+async def main(args: argparse.Namespace) -> int:
+    mix = parse_mix(args.mix)
+    async with AsyncExitStack() as stack:
+        limits = httpx.Limits(max_connections=max(args.users) + 10)
+        if args.in_process:
+            from app.limiter import limiter
+            from app.main import app, lifespan
+
+            if args.no_rate_limit:
+                limiter.enabled = False
+            await stack.enter_async_context(lifespan(app))
+            # Background e-mail failures must not fail the measured request
+            transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+            client = httpx.AsyncClient(
+                transport=transport, base_url="http://loadtest", timeout=60
+            )
+        else:
+            client = httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60)
+        await stack.enter_async_context(client)
+
+        stages = []
+        for users in args.users:
+            stage = await run_stage(client, users, args, mix)
+            print_stage(stage)
+            stages.append(stage)
+
+    result = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "target": "in-process" if args.in_process else args.base_url,
+        "mix": mix,
+        "config": {
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "contacts": args.contacts,
+            "think_time": args.think_time,
+            "seed": args.seed,
+        },
+        "stages": stages,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nsaved {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(result, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--base-url", default="http://localhost:8000")
+    target.add_argument(
+        "--in-process", action="store_true", help="drive app.main.app via ASGI"
+    )
+    parser.add_argument(
+        "--users",
+        type=lambda v: [int(n) for n in v.split(",")],
+        default=[8],
+        help="comma-separated virtual user counts, one stage each",
+    )
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--contacts", type=int, default=200, help="contacts seeded per user")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean pause between requests (s)")
+    parser.add_argument("--mix", help="weights, e.g. list=5,me=2,create=1")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--no-rate-limit", action="store_true", help="disable rate limits (in-process only)")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold in percent")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,87 @@
+"""Measure latency of unrelated endpoints while the API handles a login storm.
+
+Registers one user, then runs ``--concurrency`` clients that log in as fast
+as they can for ``--duration`` seconds. Meanwhile a probe requests
+``--probe-path`` (``/health`` by default) every ``--probe-interval`` seconds
+and records its latency. If bcrypt ran on the event loop, probe p99 would
+grow to roughly the cost of one bcrypt call times the number of queued
+logins. With the worker pool it stays close to the idle baseline.
+
+Usage (against a running server):
+    poetry run python -m benchmarks.login_storm --base-url http://localhost:8000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Return the ``pct`` percentile (0-100) of ``samples`` in milliseconds."""
+    if not samples:
+        return float("nan")
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index] * 1000
+
+
+async def probe(client: httpx.AsyncClient, path: str, interval: float, until: float) -> list[float]:
+    samples = []
+    while time.perf_counter() < until:
+        started = time.perf_counter()
+        r = await client.get(path)
+        r.raise_for_status()
+        samples.append(time.perf_counter() - started)
+        await asyncio.sleep(interval)
+    return samples
+
+
+async def login_loop(client: httpx.AsyncClient, email: str, password: str, until: float) -> int:
+    logins = 0
+    while time.perf_counter() < until:
+        r = await client.post("/auth/login", data={"username": email, "password": password})
+        r.raise_for_status()
+        logins += 1
+    return logins
+
+
+async def main(args: argparse.Namespace) -> None:
+    email = f"storm-{uuid.uuid4().hex[:12]}@example.com"
+    password = "StormPassw0rd!"
+    limits = httpx.Limits(max_connections=args.concurrency + 10)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        r = await client.post("/auth/register", json={"email": email, "password": password})
+        r.raise_for_status()
+
+        idle = await probe(
+            client, args.probe_path, args.probe_interval, time.perf_counter() + 2
+        )
+        until = time.perf_counter() + args.duration
+        probe_task = asyncio.create_task(
+            probe(client, args.probe_path, args.probe_interval, until)
+        )
+        logins = await asyncio.gather(
+            *(login_loop(client, email, password, until) for _ in range(args.concurrency))
+        )
+        storm = await probe_task
+
+    print(f"logins: {sum(logins)} in {args.duration}s ({sum(logins) / args.duration:.1f}/s)")
+    for label, samples in (("idle", idle), ("storm", storm)):
+        print(
+            f"{args.probe_path} {label:<5} n={len(samples):<5} "
+            f"p50={percentile(samples, 50):.1f}ms p99={percentile(samples, 99):.1f}ms "
+            f"mean={statistics.fmean(samples) * 1000:.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--probe-path", default="/health")
+    parser.add_argument("--probe-interval", type=float, default=0.01)
+    asyncio.run(main(parser.parse_args()))
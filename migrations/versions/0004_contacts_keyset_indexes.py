@@ -0,0 +1,30 @@
+"""Add composite indexes for keyset pagination of contacts
+
+Revision ID: 0004_contacts_keyset_indexes
+Revises: 0003_user_roles
+Create Date: 2026-10-17
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004_contacts_keyset_indexes"
+down_revision: Union[str, Sequence[str], None] = "0003_user_roles"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_contacts_user_id_id", "contacts", ["user_id", "id"])
+    op.create_index(
+        "ix_contacts_user_name",
+        "contacts",
+        ["user_id", "last_name", "first_name", "id"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_contacts_user_name", table_name="contacts")
+    op.drop_index("ix_contacts_user_id_id", table_name="contacts")
@@ -0,0 +1,36 @@
+"""Enable pg_trgm and add trigram indexes for contact substring filters
+
+Revision ID: 0005_contacts_trigram_indexes
+Revises: 0004_contacts_keyset_indexes
+Create Date: 2026-10-17
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005_contacts_trigram_indexes"
+down_revision: Union[str, Sequence[str], None] = "0004_contacts_keyset_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = ("first_name", "last_name", "email")
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for column in COLUMNS:
+        op.create_index(
+            f"ix_contacts_{column}_trgm",
+            "contacts",
+            [sa.text(f"lower({column}) gin_trgm_ops")],
+            postgresql_using="gin",
+        )
+
+
+def downgrade() -> None:
+    for column in COLUMNS:
+        op.drop_index(f"ix_contacts_{column}_trgm", table_name="contacts")
+    # The extension is left installed: other objects may depend on it.
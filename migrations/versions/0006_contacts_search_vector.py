@@ -0,0 +1,51 @@
+"""Add generated full-text search vector to contacts
+
+Revision ID: 0006_contacts_search_vector
+Revises: 0005_contacts_trigram_indexes
+Create Date: 2026-10-17
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006_contacts_search_vector"
+down_revision: Union[str, Sequence[str], None] = "0005_contacts_trigram_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Names rank above email, email above phone, phone above free-text notes.
+# The 'simple' configuration is used because names and addresses must not be
+# stemmed or dropped as stop words.
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('simple', coalesce(first_name, '') || ' ' || coalesce(last_name, '')), 'A')"
+    " || setweight(to_tsvector('simple', coalesce(email, '')), 'B')"
+    " || setweight(to_tsvector('simple', coalesce(phone, '')), 'C')"
+    " || setweight(to_tsvector('simple', coalesce(extra_info, '')), 'D')"
+)
+
+
+def upgrade() -> None:
+    op.add_column(
+        "contacts",
+        sa.Column(
+            "search_vector",
+            postgresql.TSVECTOR(),
+            sa.Computed(SEARCH_VECTOR_SQL, persisted=True),
+            nullable=True,
+        ),
+    )
+    op.create_index(
+        "ix_contacts_search_vector",
+        "contacts",
+        ["search_vector"],
+        postgresql_using="gin",
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_contacts_search_vector", table_name="contacts")
+    op.drop_column("contacts", "search_vector")
@@ -0,0 +1,35 @@
+"""Add indexed birthday month-day ordinal to contacts
+
+Revision ID: 0007_contacts_birthday_doy
+Revises: 0006_contacts_search_vector
+Create Date: 2026-10-17
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007_contacts_birthday_doy"
+down_revision: Union[str, Sequence[str], None] = "0006_contacts_search_vector"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("contacts", sa.Column("birthday_doy", sa.SmallInteger(), nullable=True))
+    # Backfill with the same formula as app.models.birthday_ordinal
+    op.execute(
+        "UPDATE contacts "
+        "SET birthday_doy = EXTRACT(MONTH FROM birthday) * 100 + EXTRACT(DAY FROM birthday) "
+        "WHERE birthday IS NOT NULL"
+    )
+    op.create_index(
+        "ix_contacts_user_birthday_doy", "contacts", ["user_id", "birthday_doy"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_contacts_user_birthday_doy", table_name="contacts")
+    op.drop_column("contacts", "birthday_doy")
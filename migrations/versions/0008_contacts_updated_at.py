@@ -0,0 +1,37 @@
+"""Add updated_at to contacts
+
+Revision ID: 0008_contacts_updated_at
+Revises: 0007_contacts_birthday_doy
+Create Date: 2026-10-17
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008_contacts_updated_at"
+down_revision: Union[str, Sequence[str], None] = "0007_contacts_birthday_doy"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "contacts",
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.text("NOW()"),
+        ),
+    )
+    op.create_index(
+        "ix_contacts_user_updated_at", "contacts", ["user_id", "updated_at"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_contacts_user_updated_at", table_name="contacts")
+    op.drop_column("contacts", "updated_at")
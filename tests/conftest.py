@@ -1,4 +1,5 @@
 import os
+from contextlib import contextmanager
 
 import pytest
 import pytest_asyncio
@@ -10,6 +11,7 @@ from sqlalchemy.ext.asyncio import (
 )
 from sqlalchemy.pool import StaticPool
 
+from app.metrics import count_queries
 from app.models import Base
 
 @pytest.fixture(scope="session")
@@ -51,3 +53,18 @@ async def session(engine: AsyncEngine):
     )
     async with SessionLocal() as s:
         yield s
+
+
+@pytest.fixture
+def query_budget():
+    """Context manager factory failing the test if a block exceeds a query budget."""
+
+    @contextmanager
+    def budget(max_queries: int):
+        with count_queries() as stats:
+            yield stats
+        assert stats.count <= max_queries, (
+            f"expected at most {max_queries} queries, ran {stats.count}"
+        )
+
+    return budget
@@ -1,3 +1,5 @@
+import re
+
 import pytest
 
 from fastapi.testclient import TestClient
@@ -60,3 +62,20 @@ def test_client(
 
     with TestClient(main.app) as client:
         yield client
+
+
+@pytest.fixture
+def assert_query_budget():
+    """Check the query count reported in a response's Server-Timing header."""
+
+    def check(response, max_queries: int) -> int:
+        match = re.search(r'db;[^,]*desc="(\d+) queries"', response.headers["Server-Timing"])
+        assert match, response.headers["Server-Timing"]
+        count = int(match.group(1))
+        assert count <= max_queries, (
+            f"{response.request.method} {response.request.url.path}: "
+            f"expected at most {max_queries} queries, ran {count}"
+        )
+        return count
+
+    return check
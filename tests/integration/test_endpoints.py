@@ -41,6 +41,36 @@ def test_request_verification_and_verify(test_client, fake):
     assert rv2.json()["detail"].lower().startswith("email")
 
 
+def test_auth_emails_delivered_from_outbox(test_client, maildev_container, fake):
+    import time
+
+    import httpx
+
+    client = test_client
+    emails = [fake.unique.email() for _ in range(5)]
+    for email in emails:
+        r = client.post("/auth/register", json={"email": email, "password": "StrongPassw0rd!"})
+        assert r.status_code == 201, r.text
+
+    # Delivered asynchronously by the outbox dispatcher running in the API
+    host = maildev_container.get_container_host_ip()
+    port = maildev_container.get_exposed_port(1080)
+    deadline = time.monotonic() + 10
+    while True:
+        inbox = httpx.get(f"http://{host}:{port}/email").json()
+        delivered = {m["to"][0]["address"]: m for m in inbox}
+        if set(emails) <= set(delivered) or time.monotonic() > deadline:
+            break
+        time.sleep(0.2)
+    for email in emails:
+        message = delivered[email]
+        assert message["subject"] == "Verify your email"
+        assert "/auth/verify?token=" in message["text"]
+
+    stats = client.get("/health/mailer").json()
+    assert stats["connects_total"] < stats["sent_total"]
+
+
 def test_login_and_me_endpoint(test_client, fake):
     client = test_client
     email = fake.unique.email()
@@ -148,6 +178,324 @@ def test_contacts_crud_endpoints(test_client, fake):
     assert missing.status_code == 404
 
 
+def test_list_contacts_cursor_pagination(test_client, fake):
+    client = test_client
+    email = fake.unique.email()
+    password = "StrongPassw0rd!"
+
+    r = client.post("/auth/register", json={"email": email, "password": password})
+    assert r.status_code == 201, r.text
+    r = client.post(
+        "/auth/login",
+        data={"username": email, "password": password},
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    assert r.status_code == 200, r.text
+    access = r.json()["access_token"]
+
+    created = set()
+    for _ in range(5):
+        c = client.post(
+            "/api/contacts",
+            headers=auth_headers(access),
+            json={
+                "first_name": fake.first_name(),
+                "last_name": fake.last_name(),
+                "email": fake.unique.email(),
+                "phone": fake.unique.phone_number(),
+            },
+        )
+        assert c.status_code == 201, c.text
+        created.add(c.json()["id"])
+
+    seen = []
+    params = {"limit": 2, "sort": "name"}
+    while True:
+        page = client.get("/api/contacts", headers=auth_headers(access), params=params)
+        assert page.status_code == 200, page.text
+        seen.extend(c["id"] for c in page.json())
+        next_cursor = page.headers.get("X-Next-Cursor")
+        if not next_cursor:
+            assert "Link" not in page.headers
+            break
+        assert 'rel="next"' in page.headers["Link"]
+        params = {"limit": 2, "sort": "name", "cursor": next_cursor}
+    assert len(seen) == len(created)
+    assert set(seen) == created
+
+    bad = client.get(
+        "/api/contacts",
+        headers=auth_headers(access),
+        params={"cursor": "not-a-cursor"},
+    )
+    assert bad.status_code == 400
+
+
+def test_contact_reads_cached_until_write(test_client, fake):
+    client = test_client
+    email = fake.unique.email()
+    password = "StrongPassw0rd!"
+
+    r = client.post("/auth/register", json={"email": email, "password": password})
+    assert r.status_code == 201, r.text
+    r = client.post(
+        "/auth/login",
+        data={"username": email, "password": password},
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    assert r.status_code == 200, r.text
+    headers = auth_headers(r.json()["access_token"])
+
+    payload = {
+        "first_name": fake.first_name(),
+        "last_name": fake.last_name(),
+        "email": fake.unique.email(),
+        "phone": fake.unique.phone_number(),
+    }
+    c = client.post("/api/contacts", headers=headers, json=payload)
+    assert c.status_code == 201, c.text
+    cid = c.json()["id"]
+
+    first = client.get("/api/contacts", headers=headers, params={"limit": 1})
+    again = client.get("/api/contacts", headers=headers, params={"limit": 1})
+    assert first.status_code == again.status_code == 200
+    assert again.content == first.content
+    assert again.headers.get("X-Next-Cursor") == first.headers.get("X-Next-Cursor")
+    assert client.get(f"/api/contacts/{cid}", headers=headers).json() == first.json()[0]
+
+    # Every write path bumps the per-user generation
+    u = client.put(f"/api/contacts/{cid}", headers=headers, json={"first_name": "Renamed"})
+    assert u.status_code == 200, u.text
+    listed = client.get("/api/contacts", headers=headers, params={"limit": 1})
+    assert listed.json()[0]["first_name"] == "Renamed"
+    assert client.get(f"/api/contacts/{cid}", headers=headers).json()["first_name"] == "Renamed"
+
+    d = client.delete(f"/api/contacts/{cid}", headers=headers)
+    assert d.status_code == 204
+    assert client.get("/api/contacts", headers=headers).json() == []
+    assert client.get(f"/api/contacts/{cid}", headers=headers).status_code == 404
+
+
+def test_contact_reads_conditional_get(test_client, fake):
+    client = test_client
+    email = fake.unique.email()
+    password = "StrongPassw0rd!"
+
+    r = client.post("/auth/register", json={"email": email, "password": password})
+    assert r.status_code == 201, r.text
+    r = client.post(
+        "/auth/login",
+        data={"username": email, "password": password},
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    assert r.status_code == 200, r.text
+    headers = auth_headers(r.json()["access_token"])
+
+    c = client.post(
+        "/api/contacts",
+        headers=headers,
+        json={
+            "first_name": fake.first_name(),
+            "last_name": fake.last_name(),
+            "email": fake.unique.email(),
+            "phone": fake.unique.phone_number(),
+            "birthday": date.today().isoformat(),
+        },
+    )
+    assert c.status_code == 201, c.text
+    cid = c.json()["id"]
+
+    urls = ["/api/contacts", f"/api/contacts/{cid}", "/api/contacts/upcoming_birthdays"]
+    etags = {}
+    for url in urls:
+        first = client.get(url, headers=headers)
+        assert first.status_code == 200, first.text
+        etags[url] = first.headers["ETag"]
+        again = client.get(url, headers={**headers, "If-None-Match": etags[url]})
+        assert again.status_code == 304
+        assert again.content == b""
+        assert again.headers["ETag"] == etags[url]
+
+    u = client.put(f"/api/contacts/{cid}", headers=headers, json={"first_name": "Changed"})
+    assert u.status_code == 200, u.text
+    for url in urls:
+        changed = client.get(url, headers={**headers, "If-None-Match": etags[url]})
+        assert changed.status_code == 200, url
+        assert changed.headers["ETag"] != etags[url]
+
+
+def test_metrics_endpoint(test_client, fake):
+    client = test_client
+    assert client.get("/health").status_code == 200
+
+    r = client.get("/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain")
+    body = r.text
+    assert "# TYPE http_request_duration_seconds histogram" in body
+    assert 'http_request_duration_seconds_count{method="GET",route="/health",status="200"}' in body
+    assert "db_query_duration_seconds_bucket" in body
+    assert 'cache_requests_total{namespace="auth"' in body
+
+
+def test_contact_endpoints_query_budget(test_client, assert_query_budget, fake):
+    client = test_client
+    email = fake.unique.email()
+    password = "StrongPassw0rd!"
+
+    r = client.post("/auth/register", json={"email": email, "password": password})
+    assert r.status_code == 201, r.text
+    r = client.post(
+        "/auth/login",
+        data={"username": email, "password": password},
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    assert r.status_code == 200, r.text
+    headers = auth_headers(r.json()["access_token"])
+
+    # Budgets include one user lookup when the auth cache is cold
+    c = client.post(
+        "/api/contacts",
+        headers=headers,
+        json={
+            "first_name": fake.first_name(),
+            "last_name": fake.last_name(),
+            "email": fake.unique.email(),
+            "phone": fake.unique.phone_number(),
+        },
+    )
+    assert c.status_code == 201, c.text
+    assert_query_budget(c, 3)
+    cid = c.json()["id"]
+
+    assert_query_budget(client.get("/api/contacts", headers=headers), 2)
+    assert_query_budget(client.get(f"/api/contacts/{cid}", headers=headers), 2)
+    u = client.put(f"/api/contacts/{cid}", headers=headers, json={"first_name": "Changed"})
+    assert u.status_code == 200, u.text
+    assert_query_budget(u, 3)
+    d = client.delete(f"/api/contacts/{cid}", headers=headers)
+    assert d.status_code == 204
+    assert_query_budget(d, 2)
+
+
+def test_search_contacts_ranked(test_client, fake):
+    client = test_client
+    email = fake.unique.email()
+    password = "StrongPassw0rd!"
+
+    r = client.post("/auth/register", json={"email": email, "password": password})
+    assert r.status_code == 201, r.text
+    r = client.post(
+        "/auth/login",
+        data={"username": email, "password": password},
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    assert r.status_code == 200, r.text
+    access = r.json()["access_token"]
+
+    def create(first_name: str, last_name: str, extra_info: str | None) -> int:
+        c = client.post(
+            "/api/contacts",
+            headers=auth_headers(access),
+            json={
+                "first_name": first_name,
+                "last_name": last_name,
+                "email": fake.unique.email(),
+                "phone": fake.unique.phone_number(),
+                "extra_info": extra_info,
+            },
+        )
+        assert c.status_code == 201, c.text
+        return c.json()["id"]
+
+    by_name = create("Marigold", "Baker", None)
+    by_note = create("Alice", "Jones", "Met at the marigold festival")
+    create("Bob", "Stone", "Plumber")
+
+    res = client.get(
+        "/api/contacts/search", headers=auth_headers(access), params={"q": "marig"}
+    )
+    assert res.status_code == 200, res.text
+    assert [c["id"] for c in res.json()] == [by_name, by_note]
+
+    first = client.get(
+        "/api/contacts/search",
+        headers=auth_headers(access),
+        params={"q": "marigold", "limit": 1},
+    )
+    assert first.status_code == 200, first.text
+    assert [c["id"] for c in first.json()] == [by_name]
+    nxt = client.get(
+        "/api/contacts/search",
+        headers=auth_headers(access),
+        params={"q": "marigold", "limit": 1, "cursor": first.headers["X-Next-Cursor"]},
+    )
+    assert nxt.status_code == 200, nxt.text
+    assert [c["id"] for c in nxt.json()] == [by_note]
+
+
+def test_import_contacts_csv_and_vcard(test_client, fake):
+    client = test_client
+    email = fake.unique.email()
+    password = "StrongPassw0rd!"
+
+    r = client.post("/auth/register", json={"email": email, "password": password})
+    assert r.status_code == 201, r.text
+    r = client.post(
+        "/auth/login",
+        data={"username": email, "password": password},
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    assert r.status_code == 200, r.text
+    access = r.json()["access_token"]
+
+    existing_email = fake.unique.email()
+    c = client.post(
+        "/api/contacts",
+        headers=auth_headers(access),
+        json={
+            "first_name": "Old",
+            "last_name": "Name",
+            "email": existing_email,
+            "phone": "12345",
+        },
+    )
+    assert c.status_code == 201, c.text
+
+    csv_body = (
+        "First Name,Last Name,Email,Phone,Birthday\n"
+        f"New,Name,{existing_email},12345,1990-07-14\n"
+        f"Fresh,Person,{fake.unique.email()},55555,\n"
+        "Broken,Row,not-an-email,1,\n"
+    )
+    files = {"file": ("contacts.csv", BytesIO(csv_body.encode()), "text/csv")}
+    imp = client.post("/api/contacts/import", headers=auth_headers(access), files=files)
+    assert imp.status_code == 200, imp.text
+    body = imp.json()
+    assert (body["inserted"], body["updated"], body["rejected"]) == (1, 1, 1)
+    assert body["errors"][0]["line"] == 4
+
+    got = client.get(f"/api/contacts/{c.json()['id']}", headers=auth_headers(access))
+    assert got.json()["first_name"] == "New"
+    assert got.json()["birthday"] == "1990-07-14"
+
+    vcard_email = fake.unique.email()
+    vcf = (
+        "BEGIN:VCARD\r\nVERSION:3.0\r\nN:Card;Vee;;;\r\n"
+        f"EMAIL;TYPE=INTERNET:{vcard_email}\r\nTEL:+1 555 0100\r\n"
+        "NOTE:Imported\r\nEND:VCARD\r\n"
+    )
+    files = {"file": ("contacts.vcf", BytesIO(vcf.encode()), "text/vcard")}
+    imp = client.post("/api/contacts/import", headers=auth_headers(access), files=files)
+    assert imp.status_code == 200, imp.text
+    assert imp.json()["inserted"] == 1
+
+    found = client.get(
+        "/api/contacts", headers=auth_headers(access), params={"email": vcard_email}
+    )
+    assert [c["extra_info"] for c in found.json()] == ["Imported"]
+
+
 def test_upcoming_birthdays_endpoint(test_client, fake):
     client = test_client
     email = fake.unique.email()
@@ -294,6 +642,26 @@ def test_rate_limit_on_me_endpoint(test_client, fake):
     limiter.reset()
 
 
+def test_rate_limit_is_per_user(test_client, fake):
+    client = test_client
+    tokens = []
+    for _ in range(2):
+        email = fake.unique.email()
+        r = client.post("/auth/register", json={"email": email, "password": "StrongPass2!"})
+        assert r.status_code == 201, r.text
+        r = client.post("/auth/login", data={"username": email, "password": "StrongPass2!"})
+        assert r.status_code == 200, r.text
+        tokens.append(r.json()["access_token"])
+
+    for _ in range(50):
+        client.get("/api/users/me", headers=auth_headers(tokens[0]))
+    limited = client.get("/api/users/me", headers=auth_headers(tokens[0]))
+    assert limited.status_code == 429
+    assert int(limited.headers["Retry-After"]) >= 1
+    # Counted in Redis under the first user's id, not the shared client address
+    assert client.get("/api/users/me", headers=auth_headers(tokens[1])).status_code == 200
+
+
 def test_password_reset_flow(test_client, fake):
     client = test_client
     email = fake.unique.email()
@@ -417,3 +785,68 @@ def test_update_avatar_allowed_for_admin(test_client, fake, mocker):
     resp = client.put("/api/users/me/avatar", headers=auth_headers(access), files=files)
     assert resp.status_code == 200, resp.text
     assert resp.json()["avatar_url"] == "https://cdn.example.com/avatar.png"
+
+
+def test_update_avatar_local_storage(test_client, fake, tmp_path, monkeypatch):
+    from app.config import settings
+    from app.db import AsyncSessionLocal
+
+    client = test_client
+    email = fake.unique.email()
+    password = "StrongPassw0rd!"
+    r = client.post("/auth/register", json={"email": email, "password": password})
+    assert r.status_code == 201, r.text
+    r = client.post(
+        "/auth/login",
+        data={"username": email, "password": password},
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    access = r.json()["access_token"]
+    user_id = client.get("/api/users/me", headers=auth_headers(access)).json()["id"]
+
+    async def promote(uid: int):
+        async with AsyncSessionLocal() as s:
+            await s.execute(update(User).where(User.id == uid).values(role="admin"))
+            await s.commit()
+
+    asyncio.run(promote(user_id))
+
+    monkeypatch.setattr(settings, "avatar_storage", "local")
+    monkeypatch.setattr(settings, "media_root", str(tmp_path))
+    monkeypatch.setattr(settings, "avatar_max_bytes", 1024)
+
+    files = {"file": ("avatar.png", BytesIO(b"fake-png"), "image/png")}
+    resp = client.put("/api/users/me/avatar", headers=auth_headers(access), files=files)
+    assert resp.status_code == 200, resp.text
+    assert f"/media/avatars/user_{user_id}.png?v=" in resp.json()["avatar_url"]
+    assert (tmp_path / "avatars" / f"user_{user_id}.png").read_bytes() == b"fake-png"
+
+    files = {"file": ("avatar.png", BytesIO(b"x" * 2048), "image/png")}
+    resp = client.put("/api/users/me/avatar", headers=auth_headers(access), files=files)
+    assert resp.status_code == 413, resp.text
+
+    files = {"file": ("avatar.txt", BytesIO(b"hello"), "text/plain")}
+    resp = client.put("/api/users/me/avatar", headers=auth_headers(access), files=files)
+    assert resp.status_code == 415, resp.text
+
+
+def test_overload_sheds_heavy_routes_first(test_client, monkeypatch):
+    from app.overload import concurrency_limiter
+
+    client = test_client
+    before = client.get("/health/overload").json()
+    assert before["in_flight"] == 0
+
+    # Simulate a saturated worker: every slot is taken and requests are slow
+    monkeypatch.setattr(concurrency_limiter, "in_flight", int(concurrency_limiter.limit))
+    monkeypatch.setattr(concurrency_limiter, "latency", 10.0)
+    r = client.get("/api/contacts")
+    assert r.status_code == 503
+    assert int(r.headers["Retry-After"]) >= 1
+    # Health checks bypass the limiter
+    assert client.get("/health").status_code == 200
+    monkeypatch.undo()
+
+    after = client.get("/health/overload").json()
+    assert after["rejected_total"]["low"] == before["rejected_total"]["low"] + 1
+    assert after["in_flight"] == 0
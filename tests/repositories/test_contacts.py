@@ -4,10 +4,17 @@ from datetime import date, timedelta
 from app.auth import hash_password
 from app.repositories.users import create_user
 from app.repositories.contacts import (
+    bulk_create_contacts,
+    bulk_delete_contacts,
+    bulk_update_contacts,
+    contact_sort_values,
+    contact_updated_at,
+    contacts_change_marker,
     create_contact,
     delete_contact,
     get_contact,
     list_contacts,
+    stream_contacts,
     upcoming_birthdays,
     update_contact,
 )
@@ -80,13 +87,7 @@ async def test_create_list_get_update_delete_contacts(session, mocker, fake):
 
 
 @pytest.mark.asyncio
-async def test_upcoming_birthdays_postgres_only(session, fake):
-    # Skip if not using PostgreSQL (function relies on PostgreSQL-specific SQL)
-    engine = session.bind
-    engine_url = getattr(engine, "url", None)
-    if engine_url is None or "postgresql" not in str(engine_url):
-        pytest.skip("upcoming_birthdays requires PostgreSQL")
-
+async def test_upcoming_birthdays(session, fake):
     user = await create_user(session, email=fake.unique.email(), hashed_password=hash_password(fake.password(length=12)))
 
     today = date.today()
@@ -148,3 +149,237 @@ async def test_upcoming_birthdays_postgres_only(session, fake):
     assert "soon@example.com" in emails
     assert "past@example.com" not in emails
     assert "later@example.com" not in emails
+
+
+@pytest.mark.asyncio
+async def test_list_contacts_keyset_pagination(session, fake):
+    user = await create_user(session, email=fake.unique.email(), hashed_password=hash_password(fake.password(length=12)))
+    names = [("Ann", "Smith"), ("Bob", "Adams"), ("Cid", "Smith"), ("Dan", "Brown"), ("Eve", "Adams")]
+    for first, last in names:
+        await create_contact(
+            session,
+            user_id=user.id,
+            first_name=first,
+            last_name=last,
+            email=fake.unique.email(),
+            phone=fake.phone_number(),
+        )
+
+    for sort, expected in (
+        ("id", ["Ann", "Bob", "Cid", "Dan", "Eve"]),
+        ("name", ["Bob", "Eve", "Dan", "Ann", "Cid"]),
+    ):
+        seen = []
+        after = None
+        while True:
+            page = await list_contacts(session, user_id=user.id, limit=2, sort=sort, after=after)
+            if not page:
+                break
+            seen.extend(c.first_name for c in page)
+            after = contact_sort_values(page[-1], sort)
+        assert seen == expected
+
+
+@pytest.mark.asyncio
+async def test_list_contacts_filters_escape_wildcards(session, fake):
+    user = await create_user(session, email=fake.unique.email(), hashed_password=hash_password(fake.password(length=12)))
+    for first in ("Ann_Marie", "Annamarie", "100% Real"):
+        await create_contact(
+            session,
+            user_id=user.id,
+            first_name=first,
+            last_name="Doe",
+            email=fake.unique.email(),
+            phone=fake.phone_number(),
+        )
+
+    underscored = await list_contacts(session, user_id=user.id, first_name="n_m")
+    assert [c.first_name for c in underscored] == ["Ann_Marie"]
+    percent = await list_contacts(session, user_id=user.id, first_name="0%")
+    assert [c.first_name for c in percent] == ["100% Real"]
+    mixed_case = await list_contacts(session, user_id=user.id, first_name="ANNA")
+    assert [c.first_name for c in mixed_case] == ["Annamarie"]
+
+
+@pytest.mark.asyncio
+async def test_upcoming_birthdays_year_wrap_and_feb_29(session, fake):
+    user = await create_user(session, email=fake.unique.email(), hashed_password=hash_password(fake.password(length=12)))
+    birthdays = {
+        "dec30": date(1990, 12, 30),
+        "jan02": date(1985, 1, 2),
+        "jan20": date(1985, 1, 20),
+        "feb28": date(1970, 2, 28),
+        "feb29": date(1996, 2, 29),
+        "mar01": date(1980, 3, 1),
+        "mar05": date(1980, 3, 5),
+    }
+    for name, birthday in birthdays.items():
+        await create_contact(
+            session,
+            user_id=user.id,
+            first_name=name,
+            last_name="Person",
+            email=fake.unique.email(),
+            phone=fake.phone_number(),
+            birthday=birthday,
+        )
+
+    async def upcoming(today: date, days: int) -> list[str]:
+        contacts = await upcoming_birthdays(session, user_id=user.id, days=days, today=today)
+        return [c.first_name for c in contacts]
+
+    # Window wraps past New Year: December first, then January
+    assert await upcoming(date(2025, 12, 29), 7) == ["dec30", "jan02"]
+    # Non-leap year: 29 February is celebrated on 1 March
+    assert await upcoming(date(2025, 3, 1), 2) == ["feb29", "mar01"]
+    assert await upcoming(date(2025, 2, 27), 1) == ["feb28"]
+    # Leap year: 29 February is its own day
+    assert await upcoming(date(2024, 2, 28), 1) == ["feb28", "feb29"]
+    assert await upcoming(date(2024, 3, 1), 2) == ["mar01"]
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_contacts_skips_existing(session, mocker, fake):
+    user = await create_user(session, email=fake.unique.email(), hashed_password=hash_password(fake.password(length=12)))
+    existing = await create_contact(
+        session,
+        user_id=user.id,
+        first_name="Old",
+        last_name="Contact",
+        email=fake.unique.email(),
+        phone=fake.phone_number(),
+    )
+    execute_spy = mocker.spy(session, "execute")
+
+    rows = [
+        {
+            "first_name": fake.first_name(),
+            "last_name": fake.last_name(),
+            "email": fake.unique.email(),
+            "phone": fake.phone_number(),
+            "birthday": date(1990, 7, 14),
+            "extra_info": None,
+        }
+        for _ in range(5)
+    ]
+    rows.append({**rows[0], "email": existing.email})
+    created = await bulk_create_contacts(session, user_id=user.id, contacts=rows, batch_size=4)
+
+    assert set(created) == {row["email"] for row in rows[:5]}
+    assert execute_spy.call_count == 2  # ceil(6 / 4) INSERT statements
+    contact = await get_contact(session, user_id=user.id, contact_id=created[rows[0]["email"]])
+    assert contact.birthday_doy == 714
+
+
+@pytest.mark.asyncio
+async def test_stream_contacts_batches(session, fake):
+    user = await create_user(session, email=fake.unique.email(), hashed_password=hash_password(fake.password(length=12)))
+    other = await create_user(session, email=fake.unique.email(), hashed_password=hash_password(fake.password(length=12)))
+    rows = [
+        {
+            "first_name": fake.first_name(),
+            "last_name": fake.last_name(),
+            "email": fake.unique.email(),
+            "phone": fake.phone_number(),
+            "birthday": None,
+            "extra_info": None,
+        }
+        for _ in range(7)
+    ]
+    created = await bulk_create_contacts(session, user_id=user.id, contacts=rows)
+    await bulk_create_contacts(session, user_id=other.id, contacts=rows[:2])
+
+    batches = [batch async for batch in stream_contacts(session, user_id=user.id, batch_size=3)]
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    streamed = [row for batch in batches for row in batch]
+    assert [row["id"] for row in streamed] == sorted(created.values())
+    assert streamed[0]["email"] == rows[0]["email"]
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_and_delete_contacts(session, mocker, fake):
+    user = await create_user(session, email=fake.unique.email(), hashed_password=hash_password(fake.password(length=12)))
+    other = await create_user(session, email=fake.unique.email(), hashed_password=hash_password(fake.password(length=12)))
+    rows = [
+        {
+            "first_name": fake.first_name(),
+            "last_name": "Smith" if i % 2 else "Jones",
+            "email": fake.unique.email(),
+            "phone": fake.phone_number(),
+            "birthday": None,
+            "extra_info": None,
+        }
+        for i in range(6)
+    ]
+    mine = await bulk_create_contacts(session, user_id=user.id, contacts=rows)
+    theirs = await bulk_create_contacts(session, user_id=other.id, contacts=rows)
+    smiths = sorted(mine[row["email"]] for row in rows if row["last_name"] == "Smith")
+    execute_spy = mocker.spy(session, "execute")
+
+    updated = await bulk_update_contacts(
+        session, user_id=user.id, values={"extra_info": "VIP", "birthday": date(1990, 2, 3)}, last_name="smi"
+    )
+    assert sorted(updated) == smiths
+    assert execute_spy.call_count == 1
+    contact = await get_contact(session, user_id=user.id, contact_id=smiths[0])
+    await session.refresh(contact)
+    assert (contact.extra_info, contact.birthday_doy) == ("VIP", 203)
+
+    # IDs of another user's contacts are ignored
+    deleted = await bulk_delete_contacts(
+        session, user_id=user.id, ids=[smiths[0], *theirs.values()]
+    )
+    assert deleted == [smiths[0]]
+    remaining = await list_contacts(session, user_id=other.id)
+    assert len(remaining) == len(theirs)
+
+
+@pytest.mark.asyncio
+async def test_contacts_change_marker_tracks_writes(session, fake):
+    user = await create_user(session, email=fake.unique.email(), hashed_password=hash_password(fake.password(length=12)))
+    assert await contacts_change_marker(session, user.id) == (0, None, None)
+
+    contacts = [
+        await create_contact(
+            session,
+            user_id=user.id,
+            first_name=fake.first_name(),
+            last_name=fake.last_name(),
+            email=fake.unique.email(),
+            phone=fake.phone_number(),
+        )
+        for _ in range(2)
+    ]
+    after_create = await contacts_change_marker(session, user.id)
+    assert after_create[:2] == (2, contacts[-1].id)
+    assert after_create[2] is not None
+    assert await contact_updated_at(session, user.id, contacts[0].id) is not None
+    assert await contact_updated_at(session, user.id + 1, contacts[0].id) is None
+
+    await delete_contact(session, contacts[0])
+    assert await contacts_change_marker(session, user.id) != after_create
+    assert await contact_updated_at(session, user.id, contacts[0].id) is None
+
+
+@pytest.mark.asyncio
+async def test_contact_crud_query_budget(session, query_budget, fake):
+    user = await create_user(session, email=fake.unique.email(), hashed_password=hash_password(fake.password(length=12)))
+
+    with query_budget(2):  # INSERT + refresh
+        contact = await create_contact(
+            session,
+            user_id=user.id,
+            first_name=fake.first_name(),
+            last_name=fake.last_name(),
+            email=fake.unique.email(),
+            phone=fake.phone_number(),
+        )
+    with query_budget(1):
+        await list_contacts(session, user_id=user.id, limit=10)
+    with query_budget(1):
+        contact = await get_contact(session, user.id, contact.id)
+    with query_budget(2):  # UPDATE + refresh
+        await update_contact(session, contact, first_name="Changed")
+    with query_budget(1):
+        await delete_contact(session, contact)
+
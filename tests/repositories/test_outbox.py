@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select
+
+from app.auth import hash_password
+from app.models import EmailOutbox, User
+from app.repositories.outbox import claim_emails, complete_emails, enqueue_email
+from app.repositories.users import create_user
+
+
+@pytest.mark.asyncio
+async def test_outbox_row_shares_user_transaction(session, fake):
+    email = fake.unique.email()
+    user = await create_user(
+        session, email=email, hashed_password=hash_password("x" * 12), commit=False
+    )
+    assert user.id is not None
+    await enqueue_email(session, kind="verify", recipient=email, token="t")
+    await session.rollback()
+
+    assert (await session.execute(select(User))).scalars().all() == []
+    assert (await session.execute(select(EmailOutbox))).scalars().all() == []
+
+
+@pytest.mark.asyncio
+async def test_claim_and_complete_emails(session, fake):
+    for n in range(3):
+        await enqueue_email(session, kind="verify", recipient=fake.unique.email(), token=f"t{n}")
+    await session.commit()
+
+    claimed = await claim_emails(session, limit=2, lease_seconds=60)
+    assert len(claimed) == 2
+    assert all(e.attempts == 1 for e in claimed)
+    # Leased rows are not claimed again
+    rest = await claim_emails(session, limit=10, lease_seconds=60)
+    assert len(rest) == 1
+    assert {e.id for e in rest}.isdisjoint(e.id for e in claimed)
+
+    sent, retried = claimed
+    retry_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+    await complete_emails(
+        session,
+        [sent.id],
+        {retried.id: ("boom", retry_at), rest[0].id: ("dead", None)},
+    )
+    session.expire_all()
+    rows = {e.id: e for e in (await session.execute(select(EmailOutbox))).scalars()}
+    assert sent.id not in rows
+    assert rows[retried.id].status == "pending"
+    assert rows[retried.id].last_error == "boom"
+    assert rows[rest[0].id].status == "failed"
+
+    # Only the retried row is due again
+    again = await claim_emails(session, limit=10, lease_seconds=60)
+    assert [e.id for e in again] == [retried.id]
+    assert again[0].attempts == 2
@@ -1,12 +1,14 @@
 import pytest
 
 from app.auth import hash_password
+from app.cache import token_cache
 from app.repositories.users import (
     create_user,
     get_user_by_email,
     get_user_by_id,
     set_user_verified,
     update_avatar_url,
+    update_password,
 )
 
 
@@ -46,3 +48,25 @@ async def test_set_user_verified_and_avatar(session, mocker, fake):
     user = await update_avatar_url(session, user, new_avatar_url)
     assert user.avatar_url == new_avatar_url
     assert commit_spy.call_count == 3  # update_avatar_url commits
+
+
+@pytest.mark.asyncio
+async def test_user_updates_evict_cached_tokens(session, fake):
+    user = await create_user(session, email=fake.unique.email(), hashed_password=hash_password(fake.password(length=12)))
+    other = await create_user(session, email=fake.unique.email(), hashed_password=hash_password(fake.password(length=12)))
+
+    for update in (
+        lambda: set_user_verified(session, user),
+        lambda: update_avatar_url(session, user, fake.image_url()),
+        lambda: update_password(session, user, hash_password(fake.password(length=12))),
+    ):
+        token_cache.set("token-a", {"id": user.id})
+        token_cache.set("token-b", {"id": user.id})
+        token_cache.set("token-other", {"id": other.id})
+
+        await update()
+
+        assert token_cache.get("token-a") is None
+        assert token_cache.get("token-b") is None
+        assert token_cache.get("token-other") == {"id": other.id}
+    token_cache.clear()
@@ -0,0 +1,77 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+from app import auth
+
+
+@pytest.fixture
+def hasher():
+    yield
+    auth.shutdown_password_hasher()
+
+
+@pytest.mark.asyncio
+async def test_hashing_runs_off_the_event_loop(hasher, monkeypatch):
+    threads = []
+
+    def slow_hash(password: str) -> str:
+        threads.append(threading.current_thread().name)
+        time.sleep(0.2)
+        return f"hashed:{password}"
+
+    monkeypatch.setattr(auth, "hash_password", slow_hash)
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    task = asyncio.create_task(ticker())
+    try:
+        assert await auth.hash_password_async("secret") == "hashed:secret"
+    finally:
+        task.cancel()
+    assert threads[0].startswith("bcrypt")
+    # The loop kept running while the hash was computed
+    assert ticks >= 10
+
+
+@pytest.mark.asyncio
+async def test_hasher_stats_count_calls_and_queueing(hasher, monkeypatch):
+    monkeypatch.setattr(auth.settings, "password_hash_workers", 1)
+    release = threading.Event()
+    monkeypatch.setattr(auth, "hash_password", lambda password: release.wait(5) and password)
+    before = auth.password_hasher_stats()
+
+    calls = [asyncio.create_task(auth.hash_password_async(str(n))) for n in range(3)]
+    await asyncio.sleep(0.05)
+    busy = auth.password_hasher_stats()
+    assert busy["workers"] == 1
+    assert busy["in_flight"] == before["in_flight"] + 3
+    assert busy["queued"] == 2
+
+    release.set()
+    assert await asyncio.gather(*calls) == ["0", "1", "2"]
+    after = auth.password_hasher_stats()
+    assert after["in_flight"] == before["in_flight"]
+    assert after["completed"] == before["completed"] + 3
+    assert after["wait_seconds_total"] > before["wait_seconds_total"]
+
+
+@pytest.mark.asyncio
+async def test_health_hasher_reports_stats(hasher):
+    from app.main import app
+
+    await auth.verify_password_async("secret", auth.hash_password("secret"))
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.get("/health/hasher")
+    assert r.status_code == 200
+    assert r.json() == auth.password_hasher_stats()
+    assert r.json()["completed"] >= 1
@@ -0,0 +1,114 @@
+import pytest
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+
+from app import cache
+from app.cache import TokenCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    return clock
+
+
+def test_token_cache_evicts_least_recently_used():
+    tokens = TokenCache(maxsize=2, ttl=60)
+    tokens.set("a", {"id": 1})
+    tokens.set("b", {"id": 2})
+    assert tokens.get("a") == {"id": 1}
+    tokens.set("c", {"id": 1})
+
+    assert len(tokens) == 2
+    assert tokens.get("b") is None
+    # The reverse index forgets evicted digests too
+    assert tokens._by_user == {1: {"a", "c"}}
+
+    tokens.set("d", {"id": 3})
+    assert tokens.get("a") is None
+    assert tokens._by_user == {1: {"c"}, 3: {"d"}}
+
+
+def test_token_cache_expiry(clock):
+    tokens = TokenCache(maxsize=10, ttl=60)
+    tokens.set("long", {"id": 1}, ttl=3600)
+    tokens.set("short", {"id": 1}, ttl=5)
+    tokens.set("expired", {"id": 2}, ttl=0)
+
+    assert tokens.get("expired") is None
+    clock.now += 6
+    assert tokens.get("short") is None
+    assert tokens.get("long") == {"id": 1}
+    # The TTL is capped at the cache's own
+    clock.now += 55
+    assert tokens.get("long") is None
+    assert len(tokens) == 0
+    assert tokens._by_user == {}
+
+
+def test_token_cache_disabled():
+    tokens = TokenCache(maxsize=0, ttl=60)
+    tokens.set("a", {"id": 1})
+    assert tokens.get("a") is None
+    assert len(tokens) == 0
+
+
+def test_token_cache_evict_user():
+    tokens = TokenCache(maxsize=10, ttl=60)
+    tokens.set("a", {"id": 1})
+    tokens.set("b", {"id": 1})
+    tokens.set("c", {"id": 2})
+    # Re-caching a digest for another user moves it in the index
+    tokens.set("b", {"id": 2})
+
+    tokens.evict_user(2)
+    assert tokens.get("a") == {"id": 1}
+    assert tokens.get("b") is None
+    assert tokens.get("c") is None
+    tokens.evict_user(2)
+    assert tokens._by_user == {1: {"a"}}
+
+
+@pytest.fixture
+def memory_backend(monkeypatch):
+    monkeypatch.setattr(cache, "redis_client", None)
+    backend = InMemoryBackend()
+    monkeypatch.setattr(InMemoryBackend, "_store", {})
+    FastAPICache.init(backend, prefix="test-cache")
+    yield backend
+    FastAPICache.reset()
+    cache.token_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_invalidate_user_without_redis(memory_backend):
+    for n in range(4):
+        key = f"test-cache:auth:user:digest-{n}"
+        await memory_backend.set(key, b"{}", 60)
+        await cache.remember_user_token(n % 2, key, 60)
+        cache.token_cache.set(f"digest-{n}", {"id": n % 2})
+    await memory_backend.set("test-cache:contacts:other", b"[]", 60)
+
+    await cache.invalidate_user(1)
+
+    assert cache.token_cache.get("digest-0") == {"id": 0}
+    assert cache.token_cache.get("digest-1") is None
+    assert await memory_backend.get("test-cache:auth:user:digest-0") is None
+    assert await memory_backend.get("test-cache:contacts:other") == b"[]"
+
+
+@pytest.mark.asyncio
+async def test_invalidate_user_before_cache_init(monkeypatch):
+    monkeypatch.setattr(cache, "redis_client", None)
+    cache.token_cache.set("digest", {"id": 7})
+    await cache.invalidate_user(7)
+    assert cache.token_cache.get("digest") is None
@@ -0,0 +1,287 @@
+import csv
+import io
+import json
+from datetime import date, datetime, timezone
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app import cache, db
+from app.auth import get_current_user
+from app.models import Contact
+from app.repositories.contacts import EXPORT_COLUMNS, create_contact
+from app.repositories.users import create_user
+from app.routers.contacts import MAX_BULK_ITEMS
+from app.routers.contacts import router as contacts_router
+
+
+def contact_payload(fake, **overrides) -> dict:
+    payload = {
+        "first_name": fake.first_name(),
+        "last_name": fake.last_name(),
+        "email": fake.unique.email(),
+        "phone": fake.msisdn(),
+    }
+    payload.update(overrides)
+    return payload
+
+
+@pytest.fixture
+async def user(session, fake):
+    return await create_user(session, email=fake.unique.email(), hashed_password="x")
+
+
+@pytest.fixture
+async def client(session, engine, user, monkeypatch):
+    monkeypatch.setattr(db, "AsyncSessionLocal", async_sessionmaker(bind=engine, expire_on_commit=False))
+    monkeypatch.setattr(cache, "redis_client", None)
+    app = FastAPI()
+    app.include_router(contacts_router)
+    app.dependency_overrides[get_current_user] = lambda: {"id": user.id, "role": "user"}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_reports_each_item(client, session, user, fake):
+    existing = await create_contact(session, user_id=user.id, **contact_payload(fake))
+    first = contact_payload(fake)
+    items = [
+        first,
+        contact_payload(fake, phone=None),
+        {**contact_payload(fake), "email": first["email"]},
+        contact_payload(fake, email=existing.email),
+        contact_payload(fake, email="not-an-email"),
+        contact_payload(fake),
+    ]
+
+    resp = await client.post("/api/contacts/bulk", json=items)
+    assert resp.status_code == 200, resp.text
+    body = resp.json()
+    assert (body["created"], body["conflicts"], body["invalid"]) == (2, 2, 2)
+    assert [item["index"] for item in body["items"]] == list(range(len(items)))
+    assert [item["status"] for item in body["items"]] == [
+        "created", "invalid", "conflict", "conflict", "invalid", "created"
+    ]
+    created_ids = [item["id"] for item in body["items"] if item["status"] == "created"]
+    assert len(set(created_ids)) == 2 and None not in created_ids
+    assert body["items"][1]["errors"][0]["loc"] == ["phone"]
+    assert body["items"][4]["errors"][0]["loc"] == ["email"]
+    assert body["items"][2]["id"] is None
+
+    listed = (await client.get("/api/contacts")).json()
+    assert {c["email"] for c in listed} == {existing.email, first["email"], items[5]["email"]}
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_rejects_malformed_bodies(client):
+    assert (await client.post("/api/contacts/bulk", json={"first_name": "x"})).status_code == 422
+    assert (await client.post("/api/contacts/bulk", json=["x"])).status_code == 422
+    too_many = [{}] * (MAX_BULK_ITEMS + 1)
+    assert (await client.post("/api/contacts/bulk", json=too_many)).status_code == 422
+
+    resp = await client.post("/api/contacts/bulk", json=[])
+    assert resp.status_code == 200
+    assert resp.json() == {"created": 0, "conflicts": 0, "invalid": 0, "items": []}
+
+
+@pytest.fixture
+async def saved_contacts(session, user, fake):
+    return [
+        await create_contact(session, user_id=user.id, **contact_payload(fake, birthday=date(1990, 2, n + 1)))
+        for n in range(3)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_export_csv(client, saved_contacts):
+    resp = await client.get("/api/contacts/export")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/csv")
+    assert resp.headers["content-disposition"] == 'attachment; filename="contacts.csv"'
+
+    rows = list(csv.reader(io.StringIO(resp.text)))
+    assert rows[0] == [col.key for col in EXPORT_COLUMNS]
+    assert rows[1:] == [
+        [str(c.id), c.first_name, c.last_name, c.email, c.phone, c.birthday.isoformat(), ""]
+        for c in saved_contacts
+    ]
+
+
+@pytest.mark.asyncio
+async def test_export_ndjson(client, saved_contacts, session, fake):
+    other = await create_user(session, email=fake.unique.email(), hashed_password="x")
+    await create_contact(session, user_id=other.id, **contact_payload(fake))
+
+    resp = await client.get("/api/contacts/export", params={"format": "ndjson"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/x-ndjson"
+    assert resp.headers["content-disposition"] == 'attachment; filename="contacts.ndjson"'
+
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert lines == [
+        {
+            "id": c.id,
+            "first_name": c.first_name,
+            "last_name": c.last_name,
+            "email": c.email,
+            "phone": c.phone,
+            "birthday": c.birthday.isoformat(),
+            "extra_info": None,
+        }
+        for c in saved_contacts
+    ]
+
+
+@pytest.mark.asyncio
+async def test_export_empty_and_unknown_format(client):
+    resp = await client.get("/api/contacts/export")
+    assert resp.status_code == 200
+    assert resp.text.splitlines() == [",".join(col.key for col in EXPORT_COLUMNS)]
+    assert (await client.get("/api/contacts/export", params={"format": "ndjson"})).text == ""
+    assert (await client.get("/api/contacts/export", params={"format": "xml"})).status_code == 422
+
+
+class FakeRedis:
+    """The string commands used by the contacts response cache."""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None, px=None):
+        self.data[key] = value
+
+    async def incr(self, key):
+        self.data[key] = int(self.data.get(key, 0)) + 1
+        return self.data[key]
+
+
+@pytest.mark.asyncio
+async def test_bulk_update(client, saved_contacts, session, fake):
+    other = await create_user(session, email=fake.unique.email(), hashed_password="x")
+    foreign = await create_contact(session, user_id=other.id, **contact_payload(fake))
+    first, second, third = saved_contacts
+
+    resp = await client.post(
+        "/api/contacts/bulk/update",
+        json={"ids": [first.id, third.id, foreign.id], "changes": {"extra_info": "VIP"}},
+    )
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["count"] == 2
+    assert sorted(resp.json()["ids"]) == [first.id, third.id]
+
+    resp = await client.post(
+        "/api/contacts/bulk/update",
+        json={"filter": {"email": second.email}, "changes": {"last_name": "Renamed"}},
+    )
+    assert resp.json() == {"count": 1, "ids": [second.id]}
+
+    resp = await client.get("/api/contacts/export", params={"format": "ndjson"})
+    exported = [json.loads(line) for line in resp.text.splitlines()]
+    assert [c["extra_info"] for c in exported] == ["VIP", None, "VIP"]
+    assert exported[1]["last_name"] == "Renamed"
+
+
+@pytest.mark.asyncio
+async def test_bulk_delete(client, saved_contacts, session, fake):
+    other = await create_user(session, email=fake.unique.email(), hashed_password="x")
+    foreign = await create_contact(session, user_id=other.id, **contact_payload(fake))
+    first, second, third = saved_contacts
+
+    resp = await client.post("/api/contacts/bulk/delete", json={"ids": [first.id, foreign.id]})
+    assert resp.json() == {"count": 1, "ids": [first.id]}
+    resp = await client.post("/api/contacts/bulk/delete", json={"filter": {"email": third.email}})
+    assert resp.json() == {"count": 1, "ids": [third.id]}
+    resp = await client.post("/api/contacts/bulk/delete", json={"ids": [first.id]})
+    assert resp.json() == {"count": 0, "ids": []}
+
+    assert [c["id"] for c in (await client.get("/api/contacts")).json()] == [second.id]
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_and_delete_validation(client, saved_contacts):
+    # Without ids or a filter every contact would match
+    resp = await client.post("/api/contacts/bulk/delete", json={})
+    assert resp.status_code == 400
+    resp = await client.post("/api/contacts/bulk/delete", json={"filter": {"email": ""}})
+    assert resp.status_code == 400
+    resp = await client.post("/api/contacts/bulk/update", json={"changes": {"extra_info": "x"}})
+    assert resp.status_code == 400
+    # Email is not a bulk change, so nothing is left to apply
+    resp = await client.post(
+        "/api/contacts/bulk/update", json={"ids": [saved_contacts[0].id], "changes": {"email": "a@b.c"}}
+    )
+    assert resp.status_code == 400
+
+    assert (await client.post("/api/contacts/bulk/update", json={"ids": [1]})).status_code == 422
+    resp = await client.post("/api/contacts/bulk/update", json={"ids": "all", "changes": {"extra_info": "x"}})
+    assert resp.status_code == 422
+    resp = await client.post("/api/contacts/bulk/delete", json={"ids": list(range(10_001))})
+    assert resp.status_code == 422
+    resp = await client.post(
+        "/api/contacts/bulk/update", json={"ids": [saved_contacts[0].id], "changes": {"first_name": ""}}
+    )
+    assert resp.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_bulk_writes_invalidate_cached_reads(client, saved_contacts, monkeypatch):
+    redis = FakeRedis()
+    monkeypatch.setattr(cache, "redis_client", redis)
+    first, second, third = saved_contacts
+
+    cached = (await client.get("/api/contacts")).json()
+    assert len(cached) == 3
+    assert any(key.startswith(f"contacts-cache:contacts:{first.user_id}:v0:") for key in redis.data)
+
+    resp = await client.post(
+        "/api/contacts/bulk/update", json={"ids": [first.id], "changes": {"extra_info": "VIP"}}
+    )
+    assert resp.json()["count"] == 1
+    listed = (await client.get("/api/contacts")).json()
+    assert listed[0]["extra_info"] == "VIP"
+
+    await client.post("/api/contacts/bulk/delete", json={"ids": [second.id]})
+    assert [c["id"] for c in (await client.get("/api/contacts")).json()] == [first.id, third.id]
+    assert redis.data[f"contacts-cache:contacts:{first.user_id}:version"] == 2
+
+
+@pytest.mark.asyncio
+async def test_etag_follows_the_contacts_generation(client, saved_contacts, session, monkeypatch):
+    monkeypatch.setattr(cache, "redis_client", FakeRedis())
+    first = saved_contacts[0]
+    urls = ["/api/contacts", f"/api/contacts/{first.id}", "/api/contacts/upcoming_birthdays"]
+    etags = {url: (await client.get(url)).headers["ETag"] for url in urls}
+    for url, etag in etags.items():
+        assert (await client.get(url, headers={"If-None-Match": etag})).status_code == 304
+
+    # A write whose transaction started before the latest one commits an
+    # older updated_at; count, max id and max updated_at stay the same
+    await session.execute(
+        update(Contact)
+        .where(Contact.id == first.id)
+        .values(extra_info="changed", updated_at=datetime(2000, 1, 1, tzinfo=timezone.utc))
+    )
+    await session.commit()
+    await cache.bump_contacts_version(first.user_id)
+
+    for url, etag in etags.items():
+        resp = await client.get(url, headers={"If-None-Match": etag})
+        assert resp.status_code == 200, url
+        assert resp.headers["ETag"] != etag
+    assert (await client.get(f"/api/contacts/{first.id}")).json()["extra_info"] == "changed"
+
+
+@pytest.mark.asyncio
+async def test_etag_without_redis_uses_the_change_marker(client, saved_contacts):
+    etag = (await client.get("/api/contacts")).headers["ETag"]
+    assert (await client.get("/api/contacts", headers={"If-None-Match": etag})).status_code == 304
+    await client.post("/api/contacts/bulk/delete", json={"ids": [saved_contacts[0].id]})
+    assert (await client.get("/api/contacts", headers={"If-None-Match": etag})).status_code == 200
+    assert (await client.get("/api/contacts/999999")).status_code == 404
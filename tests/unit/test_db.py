@@ -0,0 +1,167 @@
+import asyncio
+import itertools
+import time
+
+import httpx
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app import db
+
+
+@pytest.fixture
+async def small_pool_engine(tmp_path, monkeypatch):
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}",
+        poolclass=db.InstrumentedAsyncPool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.2,
+    )
+    monkeypatch.setattr(db.settings, "db_max_overflow", 0)
+    monkeypatch.setattr(db, "engine", engine)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_pool_counts_acquire_waits_and_timeouts(small_pool_engine):
+    async with small_pool_engine.connect() as held:
+        await held.execute(text("SELECT 1"))
+        with pytest.raises(PoolTimeoutError):
+            async with small_pool_engine.connect():
+                pass
+        busy = db.pool_stats()
+        assert busy["checked_out"] == 1
+        assert busy["size"] == 1
+
+    stats = db.pool_stats()
+    assert stats["pool"] == "InstrumentedAsyncPool"
+    assert stats["acquire_count"] == 2
+    assert stats["acquire_timeouts"] == 1
+    # The failed checkout waited for the whole pool timeout
+    assert stats["acquire_seconds_max"] >= 0.2
+    assert stats["acquire_seconds_total"] >= stats["acquire_seconds_max"]
+    assert stats["checked_out"] == 0
+
+
+@pytest.mark.asyncio
+async def test_health_pool_reports_pool_stats(small_pool_engine):
+    from app.main import app
+
+    async with small_pool_engine.connect() as held:
+        await held.execute(text("SELECT 1"))
+        with pytest.raises(PoolTimeoutError):
+            async with small_pool_engine.connect():
+                pass
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.get("/health/pool")
+    assert r.status_code == 200
+    body = r.json()
+    assert body["acquire_timeouts"] == 1
+    assert body["acquire_seconds_max"] >= 0.2
+    assert body["checked_out"] == 0
+
+
+async def _make_database(path, name: str):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.execute(text("CREATE TABLE whoami (name TEXT)"))
+        await conn.execute(text("INSERT INTO whoami VALUES (:name)"), {"name": name})
+    return engine
+
+
+async def _whoami(session) -> str:
+    async with session:
+        return (await session.execute(text("SELECT name FROM whoami"))).scalar_one()
+
+
+@pytest.fixture
+async def replicas(tmp_path, monkeypatch):
+    """Primary plus two replicas: index 0 cannot connect, index 1 works."""
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    from app import cache
+
+    primary = await _make_database(tmp_path / "primary.db", "primary")
+    replica = await _make_database(tmp_path / "replica.db", "replica")
+    dead = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'missing' / 'dead.db'}")
+    dead_maker = async_sessionmaker(bind=dead)
+    dead_attempts = []
+
+    def dead_session():
+        dead_attempts.append(1)
+        return dead_maker()
+
+    monkeypatch.setattr(db, "AsyncSessionLocal", async_sessionmaker(bind=primary))
+    monkeypatch.setattr(db, "ReplicaSessions", [dead_session, async_sessionmaker(bind=replica)])
+    monkeypatch.setattr(db, "_replica_down_until", [0.0, 0.0])
+    monkeypatch.setattr(db, "_replica_turn", itertools.count())
+    monkeypatch.setattr(db.settings, "database_replica_urls", "dead,replica")
+    monkeypatch.setattr(db.settings, "replica_retry_seconds", 0.2)
+    monkeypatch.setattr(db.settings, "read_your_writes_seconds", 0.2)
+    monkeypatch.setattr(cache, "redis_client", None)
+    monkeypatch.setattr(cache, "_local_recent_writes", {})
+    yield dead_attempts
+    for engine in (primary, replica, dead):
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_failed_replica_is_skipped_for_retry_window(replicas):
+    dead_attempts = replicas
+    # Round-robin starts at the dead replica, which fails and is skipped
+    assert await _whoami(await db.open_read_session()) == "replica"
+    assert len(dead_attempts) == 1
+    assert db._replica_down_until[0] > 0
+
+    for _ in range(4):
+        assert await _whoami(await db.open_read_session()) == "replica"
+    assert len(dead_attempts) == 1
+    assert db._replica_down_until[0] > time.monotonic()
+    assert db._replica_down_until[1] == 0.0
+
+    await asyncio.sleep(0.25)
+    # Retried once the window passed (its turn comes up within two reads)
+    for _ in range(2):
+        assert await _whoami(await db.open_read_session()) == "replica"
+    assert len(dead_attempts) == 2
+
+
+@pytest.mark.asyncio
+async def test_reads_fall_back_to_primary(replicas, monkeypatch):
+    monkeypatch.setattr(db, "ReplicaSessions", db.ReplicaSessions[:1])
+    monkeypatch.setattr(db, "_replica_down_until", [0.0])
+    assert await _whoami(await db.open_read_session()) == "primary"
+    # Skipped without another connect attempt while it is marked down
+    assert await _whoami(await db.open_read_session()) == "primary"
+    assert len(replicas) == 1
+    assert await _whoami(await db.open_read_session(use_primary=True)) == "primary"
+
+
+@pytest.mark.asyncio
+async def test_reads_stay_on_primary_after_a_write(replicas):
+    from app.auth import get_read_session
+    from app.cache import bump_contacts_version
+
+    async def read_as(user_id: int) -> str:
+        sessions = get_read_session(current_user={"id": user_id})
+        session = await anext(sessions)
+        try:
+            return (await session.execute(text("SELECT name FROM whoami"))).scalar_one()
+        finally:
+            await sessions.aclose()
+
+    assert await read_as(1) == "replica"
+    await bump_contacts_version(1)
+    assert await read_as(1) == "primary"
+    assert await read_as(1) == "primary"
+    # Other users are not pinned
+    assert await read_as(2) == "replica"
+
+    await asyncio.sleep(0.25)
+    assert await read_as(1) == "replica"
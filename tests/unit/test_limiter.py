@@ -0,0 +1,28 @@
+import pytest
+from starlette.requests import Request
+
+from app.limiter import get_remote_address, parse_limit
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [
+        ("50/minute", (50, 60)),
+        ("5 per second", (5, 1)),
+        ("100/10 minutes", (100, 600)),
+        ("1000/Day", (1000, 86400)),
+    ],
+)
+def test_parse_limit(value, expected):
+    assert parse_limit(value) == expected
+
+
+@pytest.mark.parametrize("value", ["50", "x/minute", "5/fortnight", "50/minute; 5/second"])
+def test_parse_limit_rejects_unknown_notation(value):
+    with pytest.raises(ValueError):
+        parse_limit(value)
+
+
+def test_get_remote_address():
+    assert get_remote_address(Request({"type": "http", "client": ("10.0.0.7", 5000)})) == "10.0.0.7"
+    assert get_remote_address(Request({"type": "http", "client": None})) == "127.0.0.1"
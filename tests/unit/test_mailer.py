@@ -0,0 +1,232 @@
+import asyncio
+import logging
+
+import aiosmtplib
+import pytest
+
+from app import mailer as mailer_module
+from app.mailer import Mailer
+
+
+class FakeSMTP:
+    """An aiosmtplib.SMTP connection recording what it was asked to send."""
+
+    def __init__(self, server: "FakeServer", options: dict):
+        self.server = server
+        self.options = options
+        self.sent: list[str] = []
+        self.connected = False
+        self.quit_called = False
+        self.closed = False
+
+    async def connect(self):
+        self.connected = True
+
+    async def sendmail(self, sender, recipients, content):
+        await self.server.gate.wait()
+        if not self.connected:
+            raise aiosmtplib.SMTPServerDisconnected("Not connected to SMTP server")
+        if self.server.disconnects:
+            self.server.disconnects -= 1
+            self.connected = False
+            raise aiosmtplib.SMTPServerDisconnected("Unexpected EOF received")
+        if recipients[0] in self.server.rejected:
+            raise aiosmtplib.SMTPResponseException(550, "Mailbox unavailable")
+        self.sent.append(recipients[0])
+
+    async def send_message(self, message):
+        await self.sendmail(message["From"], [message["To"]], message.as_bytes())
+
+    async def quit(self):
+        self.quit_called = True
+        self.connected = False
+
+    def close(self):
+        self.closed = True
+        self.connected = False
+
+
+class FakeServer:
+    def __init__(self):
+        self.connections: list[FakeSMTP] = []
+        # Disconnect on the next n messages
+        self.disconnects = 0
+        self.rejected: set[str] = set()
+        # Cleared to hold every message in flight
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    def __call__(self, **options) -> FakeSMTP:
+        connection = FakeSMTP(self, options)
+        self.connections.append(connection)
+        return connection
+
+    @property
+    def sent(self) -> list[str]:
+        return [recipient for c in self.connections for recipient in c.sent]
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = FakeServer()
+    monkeypatch.setattr(mailer_module.aiosmtplib, "SMTP", server)
+    return server
+
+
+@pytest.fixture
+async def make_mailer():
+    mailers = []
+
+    def make(**options) -> Mailer:
+        options = {"pool_size": 1, "batch_size": 10, "idle_timeout": 30.0, **options}
+        mailer = Mailer(
+            sender="app@example.com",
+            base_url="http://test/",
+            hostname="smtp.test",
+            port=2525,
+            username="app",
+            password="secret",
+            **options,
+        )
+        mailers.append(mailer)
+        return mailer
+
+    yield make
+    for mailer in mailers:
+        await mailer.close(timeout=0)
+
+
+def send_all(mailer: Mailer, *recipients: str) -> list[asyncio.Task]:
+    return [
+        asyncio.create_task(mailer.send_link("verify", recipient, f"token-{n}"))
+        for n, recipient in enumerate(recipients)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_queued_messages_share_one_connection(server, make_mailer, caplog):
+    mailer = make_mailer(batch_size=2)
+    recipients = [f"user{n}@example.com" for n in range(5)]
+    with caplog.at_level(logging.DEBUG, logger="app.mailer"):
+        await asyncio.gather(*send_all(mailer, *recipients))
+
+    (connection,) = server.connections
+    assert connection.sent == recipients
+    assert connection.options["hostname"] == "smtp.test"
+    assert connection.options["username"] == "app"
+    # Everything queued is sent in batches of at most batch_size
+    batches = [r.getMessage().split()[1] for r in caplog.records if r.getMessage().startswith("Sent")]
+    assert batches == ["2", "2", "1"]
+    assert mailer.stats() == {
+        "queued": 0,
+        "workers": 1,
+        "connections": 1,
+        "connects_total": 1,
+        "sent_total": 5,
+        "failed_total": 0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_non_ascii_recipients_are_sent_as_messages(server, make_mailer):
+    mailer = make_mailer()
+    await mailer.send_link("reset", "jürgen@example.com", "token")
+    assert server.sent == ["jürgen@example.com"]
+
+
+@pytest.mark.asyncio
+async def test_dropped_connection_is_reopened_and_the_message_retried(server, make_mailer):
+    mailer = make_mailer()
+    await mailer.send_link("verify", "first@example.com", "t")
+    server.disconnects = 1
+
+    await asyncio.gather(*send_all(mailer, "a@example.com", "b@example.com"))
+    first, second = server.connections
+    assert first.closed and not first.quit_called
+    assert first.sent == ["first@example.com"]
+    assert second.sent == ["a@example.com", "b@example.com"]
+    assert mailer.stats()["connections"] == 1
+    assert mailer.stats()["connects_total"] == 2
+
+
+@pytest.mark.asyncio
+async def test_message_fails_when_the_retry_is_dropped_too(server, make_mailer):
+    mailer = make_mailer()
+    server.disconnects = 2
+    down, after = send_all(mailer, "down@example.com", "after@example.com")
+
+    with pytest.raises(aiosmtplib.SMTPServerDisconnected):
+        await down
+    await after
+    assert server.sent == ["after@example.com"]
+    assert len(server.connections) == 3
+    assert mailer.stats()["failed_total"] == 1
+    assert mailer.stats()["connections"] == 1
+
+
+@pytest.mark.asyncio
+async def test_rejected_message_keeps_the_connection(server, make_mailer):
+    mailer = make_mailer()
+    server.rejected.add("nobody@example.com")
+    tasks = send_all(mailer, "a@example.com", "nobody@example.com", "b@example.com")
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    assert results[0] is None and results[2] is None
+    assert isinstance(results[1], aiosmtplib.SMTPResponseException)
+    assert results[1].code == 550
+    (connection,) = server.connections
+    assert connection.sent == ["a@example.com", "b@example.com"]
+    assert not connection.closed
+    assert mailer.stats()["sent_total"] == 2
+    assert mailer.stats()["failed_total"] == 1
+
+
+@pytest.mark.asyncio
+async def test_idle_connection_is_closed(server, make_mailer):
+    mailer = make_mailer(idle_timeout=0.05)
+    await mailer.send_link("verify", "a@example.com", "t")
+    assert mailer.stats()["connections"] == 1
+
+    await asyncio.sleep(0.1)
+    (connection,) = server.connections
+    assert connection.quit_called
+    assert mailer.stats()["connections"] == 0
+
+    await mailer.send_link("verify", "b@example.com", "t")
+    assert len(server.connections) == 2
+    assert mailer.stats()["connects_total"] == 2
+
+
+@pytest.mark.asyncio
+async def test_close_delivers_what_is_queued(server, make_mailer):
+    mailer = make_mailer(batch_size=1)
+    tasks = send_all(mailer, "a@example.com", "b@example.com", "c@example.com")
+    await asyncio.sleep(0)
+
+    await mailer.close()
+    await asyncio.gather(*tasks)
+    assert server.sent == ["a@example.com", "b@example.com", "c@example.com"]
+    (connection,) = server.connections
+    assert connection.quit_called
+    assert mailer.stats()["workers"] == 0
+    assert mailer.stats()["connections"] == 0
+
+
+@pytest.mark.asyncio
+async def test_close_cancels_messages_it_could_not_deliver(server, make_mailer):
+    mailer = make_mailer(batch_size=2)
+    server.gate.clear()
+    tasks = send_all(mailer, *(f"user{n}@example.com" for n in range(4)))
+    await asyncio.sleep(0.01)
+    # Two messages are in flight on the connection, two still queued
+    assert mailer.stats()["queued"] == 2
+
+    await mailer.close(timeout=0.01)
+    results = await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), 1)
+    assert all(isinstance(r, asyncio.CancelledError) for r in results)
+    assert server.sent == []
+    # The interrupted connection is dropped rather than reused for QUIT
+    (connection,) = server.connections
+    assert connection.closed and not connection.quit_called
+    assert mailer.stats()["connections"] == 0
+    assert mailer.stats()["queued"] == 0
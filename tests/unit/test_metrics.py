@@ -0,0 +1,205 @@
+import asyncio
+import logging
+import re
+
+import httpx
+import pytest
+from fastapi import FastAPI, HTTPException
+from prometheus_client import CollectorRegistry, generate_latest
+from sqlalchemy import text
+
+from app import metrics
+from app.metrics import (
+    REGISTRY,
+    MetricsMiddleware,
+    QueryTimingMiddleware,
+    StatsCollector,
+    hasher_metrics,
+    overload_metrics,
+    pool_metrics,
+)
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_render_escapes_label_values():
+    metrics.record_cache_lookup('we"ird\\name\nspace', "local", hit=True)
+    body = metrics.render().decode()
+    assert (
+        'cache_requests_total{layer="local",namespace="we\\"ird\\\\name\\nspace",result="hit"} 1.0'
+        in body
+    )
+    assert "# TYPE cache_requests_total counter" in body
+    assert "_created" not in body
+
+
+def test_histogram_buckets_are_cumulative():
+    for value in (0.003, 0.003, 0.5, 20.0):
+        metrics.db_query_duration_seconds.labels("test").observe(value)
+
+    buckets = {
+        bound: sample("db_query_duration_seconds_bucket", operation="test", le=bound)
+        for bound in ("0.0025", "0.005", "0.25", "1.0", "10.0", "+Inf")
+    }
+    assert buckets == {"0.0025": 0, "0.005": 2, "0.25": 2, "1.0": 3, "10.0": 3, "+Inf": 4}
+    assert sample("db_query_duration_seconds_count", operation="test") == 4
+    assert sample("db_query_duration_seconds_sum", operation="test") == pytest.approx(20.506)
+
+    body = metrics.render().decode()
+    bounds = re.findall(r'db_query_duration_seconds_bucket\{le="([^"]+)",operation="test"\}', body)
+    assert bounds == [str(float(b)) for b in metrics.DEFAULT_BUCKETS] + ["+Inf"]
+
+
+def test_scrape_time_stats_collector():
+    registry = CollectorRegistry()
+
+    def collect():
+        yield from pool_metrics({
+            "primary": {
+                "checked_out": 3,
+                "checked_in": 2,
+                "overflow_in_use": 1,
+                "acquire_count": 40,
+                "acquire_seconds_total": 1.5,
+                "acquire_timeouts": 2,
+            },
+            # NullPool-like replica without checkout counters
+            "replica0": {"pool": "NullPool"},
+        })
+        yield from hasher_metrics(
+            {"workers": 4, "in_flight": 6, "queued": 2, "completed": 10, "wait_seconds_total": 0.25}
+        )
+        yield from overload_metrics({
+            "limit": 8,
+            "in_flight": 5,
+            "queued": 0,
+            "admitted_total": 100,
+            "rejected_total": {"high": 0, "normal": 3, "low": 7},
+        })
+
+    registry.register(StatsCollector(collect))
+
+    get = registry.get_sample_value
+    assert get("db_pool_connections", {"pool": "primary", "state": "checked_out"}) == 3
+    assert get("db_pool_acquires_total", {"pool": "primary"}) == 40
+    assert get("db_pool_acquire_seconds_total", {"pool": "primary"}) == 1.5
+    assert get("db_pool_timeouts_total", {"pool": "primary"}) == 2
+    assert get("db_pool_acquires_total", {"pool": "replica0"}) is None
+    assert get("password_hasher_tasks", {"state": "queued"}) == 2
+    assert get("password_hasher_completed_total") == 10
+    assert get("password_hasher_wait_seconds_total") == 0.25
+    assert get("overload_concurrency", {"state": "limit"}) == 8
+    assert get("overload_admitted_total") == 100
+    assert get("overload_rejected_total", {"priority": "low"}) == 7
+
+    body = generate_latest(registry).decode()
+    assert "# TYPE db_pool_acquires_total counter" in body
+    assert "# TYPE overload_concurrency gauge" in body
+
+
+@pytest.fixture
+async def metrics_client():
+    app = FastAPI()
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        if item_id == 0:
+            raise HTTPException(404)
+        return {"id": item_id}
+
+    @app.get("/slow")
+    async def slow():
+        started.set()
+        await release.wait()
+        return {}
+
+    @app.get("/boom")
+    async def boom():
+        raise RuntimeError("boom")
+
+    transport = httpx.ASGITransport(app=MetricsMiddleware(app), raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client, started, release
+
+
+@pytest.mark.asyncio
+async def test_metrics_middleware_labels_by_route_template(metrics_client):
+    client, _, _ = metrics_client
+    labels = {"method": "GET", "route": "/items/{item_id}"}
+    before_ok = sample("http_request_duration_seconds_count", **labels, status="200")
+    before_missing = sample("http_request_duration_seconds_count", **labels, status="404")
+    before_unmatched = sample(
+        "http_request_duration_seconds_count", method="GET", route="<unmatched>", status="404"
+    )
+
+    for item_id in (1, 2, 0):
+        await client.get(f"/items/{item_id}")
+    await client.get("/nowhere")
+
+    assert sample("http_request_duration_seconds_count", **labels, status="200") == before_ok + 2
+    assert sample("http_request_duration_seconds_count", **labels, status="404") == before_missing + 1
+    assert sample(
+        "http_request_duration_seconds_count", method="GET", route="<unmatched>", status="404"
+    ) == before_unmatched + 1
+    assert sample("http_request_duration_seconds_count", method="GET", route="/items/1", status="200") == 0
+
+
+@pytest.mark.asyncio
+async def test_metrics_middleware_tracks_in_flight_and_failures(metrics_client):
+    client, started, release = metrics_client
+    before = sample("http_requests_in_flight")
+
+    request = asyncio.create_task(client.get("/slow"))
+    await started.wait()
+    assert sample("http_requests_in_flight") == before + 1
+    release.set()
+    await request
+    assert sample("http_requests_in_flight") == before
+
+    failed = sample("http_request_duration_seconds_count", method="GET", route="/boom", status="500")
+    assert (await client.get("/boom")).status_code == 500
+    assert sample("http_request_duration_seconds_count", method="GET", route="/boom", status="500") == failed + 1
+    assert sample("http_requests_in_flight") == before
+
+
+@pytest.fixture
+def timing_client(engine):
+    app = FastAPI()
+
+    @app.get("/queries/{count}")
+    async def run_queries(count: int):
+        async with engine.connect() as conn:
+            for _ in range(count):
+                await conn.execute(text("SELECT 1"))
+        return {}
+
+    transport = httpx.ASGITransport(app=QueryTimingMiddleware(app))
+    return httpx.AsyncClient(transport=transport, base_url="http://test")
+
+
+@pytest.mark.asyncio
+async def test_query_timing_middleware_reports_server_timing(timing_client):
+    selects = sample("db_query_duration_seconds_count", operation="select")
+    async with timing_client as client:
+        resp = await client.get("/queries/3")
+        timing = resp.headers["Server-Timing"]
+        assert re.fullmatch(r'db;dur=\d+\.\d{2};desc="3 queries", app;dur=\d+\.\d{2}', timing)
+        # Counts are per request, not per process
+        resp = await client.get("/queries/0")
+        assert 'desc="0 queries"' in resp.headers["Server-Timing"]
+    assert sample("db_query_duration_seconds_count", operation="select") == selects + 3
+
+
+@pytest.mark.asyncio
+async def test_slow_queries_are_logged_with_redacted_parameters(engine, monkeypatch, caplog):
+    monkeypatch.setattr(metrics.settings, "slow_query_ms", 0.000001)
+    with caplog.at_level(logging.WARNING, logger="app.slow_query"):
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT :secret"), {"secret": "hunter2"})
+    assert "hunter2" not in caplog.text
+    # sqlite binds positionally
+    assert "Slow query" in caplog.text and "parameters: ['<str>']" in caplog.text
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.trace import SpanKind, StatusCode
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app import db, outbox_worker, tracing
+from app.models import EmailOutbox
+from app.repositories.outbox import enqueue_email
+
+
+class FakeMailer:
+    hostname = "smtp.test"
+
+    def __init__(self, fail: dict[str, BaseException] | None = None):
+        self.fail = fail or {}
+        self.sent = []
+
+    async def send_link(self, template: str, recipient: str, token: str) -> None:
+        await asyncio.sleep(0)
+        if recipient in self.fail:
+            raise self.fail[recipient]
+        self.sent.append((template, recipient, token))
+
+
+@pytest.fixture
+async def outbox(session, engine, monkeypatch):
+    monkeypatch.setattr(db, "AsyncSessionLocal", async_sessionmaker(bind=engine, expire_on_commit=False))
+    for n, recipient in enumerate(["ok@example.com", "cancelled@example.com", "down@example.com"]):
+        await enqueue_email(session, kind="verify", recipient=recipient, token=f"t{n}")
+    await session.commit()
+    return session
+
+
+async def _rows(session) -> dict[str, EmailOutbox]:
+    session.expire_all()
+    return {e.recipient: e for e in (await session.execute(select(EmailOutbox))).scalars()}
+
+
+@pytest.mark.asyncio
+async def test_only_delivered_emails_are_deleted(outbox):
+    mailer = FakeMailer(
+        fail={
+            "cancelled@example.com": asyncio.CancelledError(),
+            "down@example.com": ConnectionRefusedError("down"),
+        }
+    )
+    assert await outbox_worker.dispatch_once(mailer) == 3
+    assert mailer.sent == [("verify", "ok@example.com", "t0")]
+
+    rows = await _rows(outbox)
+    assert set(rows) == {"cancelled@example.com", "down@example.com"}
+    # A send cancelled e.g. by Mailer.close() is retried, not counted as sent
+    assert rows["cancelled@example.com"].status == "pending"
+    assert rows["cancelled@example.com"].last_error.startswith("CancelledError")
+    assert rows["down@example.com"].status == "pending"
+    assert rows["down@example.com"].last_error == "ConnectionRefusedError: down"
+
+
+@pytest.fixture
+def exporter(monkeypatch):
+    exporter = InMemorySpanExporter()
+    provider = tracing.build_tracer_provider(SimpleSpanProcessor(exporter), sample_ratio=1.0)
+    monkeypatch.setattr(tracing, "tracer_provider", provider)
+    return exporter
+
+
+@pytest.mark.asyncio
+async def test_dispatch_round_is_traced_with_smtp_spans(outbox, exporter):
+    mailer = FakeMailer(fail={"down@example.com": ConnectionRefusedError("down")})
+    await outbox_worker.dispatch_once(mailer)
+
+    spans = exporter.get_finished_spans()
+    (root,) = [s for s in spans if s.name == "outbox.dispatch"]
+    assert root.parent is None
+    assert root.attributes["outbox.claimed"] == 3
+    sends = [s for s in spans if s.name == "smtp.send"]
+    assert len(sends) == 3
+    for send in sends:
+        assert send.context.trace_id == root.context.trace_id
+        assert send.parent.span_id == root.context.span_id
+        assert send.kind == SpanKind.CLIENT
+        assert send.attributes["server.address"] == "smtp.test"
+    (failed,) = [s for s in sends if s.status.status_code == StatusCode.ERROR]
+    assert failed.events[0].attributes["exception.type"] == "ConnectionRefusedError"
+    # The settling UPDATE belongs to the round's trace
+    assert any(
+        s.name == "db.query" and s.parent.span_id == root.context.span_id for s in spans
+    )
+
+
+@pytest.mark.asyncio
+async def test_idle_dispatch_round_is_not_exported(session, engine, monkeypatch, exporter):
+    monkeypatch.setattr(db, "AsyncSessionLocal", async_sessionmaker(bind=engine, expire_on_commit=False))
+    assert await outbox_worker.dispatch_once(FakeMailer()) == 0
+    assert exporter.get_finished_spans() == ()
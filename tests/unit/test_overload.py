@@ -0,0 +1,170 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app import overload
+from app.overload import (
+    PRIORITY_HIGH,
+    PRIORITY_LOW,
+    PRIORITY_NORMAL,
+    AdaptiveConcurrencyLimiter,
+    LoadSheddingMiddleware,
+)
+
+
+def make_limiter(**overrides) -> AdaptiveConcurrencyLimiter:
+    options = dict(
+        initial_limit=4,
+        min_limit=1,
+        max_limit=10,
+        latency_target=0.1,
+        queue_budget=5.0,
+        backoff_ratio=0.5,
+    )
+    options.update(overrides)
+    return AdaptiveConcurrencyLimiter(**options)
+
+
+@pytest.mark.asyncio
+async def test_limit_grows_while_fast_and_busy():
+    limiter = make_limiter()
+    for _ in range(4):
+        assert await limiter.acquire(PRIORITY_NORMAL)
+    # +1/limit per fast response while at least half the limit is in use
+    limiter.release(0.01)
+    assert limiter.limit == 4.25
+    limiter.release(0.01)
+    assert limiter.limit == pytest.approx(4.25 + 1 / 4.25)
+    limiter.release(0.01)
+    limiter.release(0.01)
+    assert limiter.in_flight == 0
+
+    # An idle worker does not grow the limit
+    await limiter.acquire(PRIORITY_NORMAL)
+    before = limiter.limit
+    limiter.release(0.01)
+    assert limiter.limit == before
+
+
+@pytest.mark.asyncio
+async def test_limit_shrinks_once_per_latency_on_slow_or_failed_responses():
+    limiter = make_limiter(initial_limit=8)
+    for _ in range(3):
+        await limiter.acquire(PRIORITY_NORMAL)
+    limiter.release(0.5)
+    assert limiter.limit == 4
+    # Responses already in flight during the overload do not shrink it again
+    limiter.release(0.5)
+    limiter.release(0.01, failed=True)
+    assert limiter.limit == 4
+
+    limiter._last_decrease -= 10
+    await limiter.acquire(PRIORITY_NORMAL)
+    limiter.release(0.01, failed=True)
+    assert limiter.limit == 2
+
+
+@pytest.mark.asyncio
+async def test_limit_stays_within_bounds():
+    limiter = make_limiter(initial_limit=1, max_limit=2)
+    for _ in range(20):
+        await limiter.acquire(PRIORITY_NORMAL)
+        limiter.release(0.01)
+    assert limiter.limit == 2
+    for _ in range(5):
+        limiter._last_decrease = 0.0
+        await limiter.acquire(PRIORITY_NORMAL)
+        limiter.release(1.0)
+    assert limiter.limit == 1
+
+
+@pytest.mark.asyncio
+async def test_waiters_are_admitted_by_priority_then_arrival():
+    limiter = make_limiter(initial_limit=1)
+    assert await limiter.acquire(PRIORITY_NORMAL)
+    admitted = []
+
+    async def request(name: str, priority: int):
+        assert await limiter.acquire(priority)
+        admitted.append(name)
+
+    tasks = []
+    for name, priority in [
+        ("low", PRIORITY_LOW),
+        ("normal-1", PRIORITY_NORMAL),
+        ("high", PRIORITY_HIGH),
+        ("normal-2", PRIORITY_NORMAL),
+    ]:
+        tasks.append(asyncio.create_task(request(name, priority)))
+        await asyncio.sleep(0)
+    assert limiter.stats()["queued"] == 4
+
+    for _ in tasks:
+        limiter.release(None)
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+    assert admitted == ["high", "normal-1", "normal-2", "low"]
+
+
+@pytest.mark.asyncio
+async def test_rejected_when_wait_exceeds_budget_with_retry_after():
+    limiter = make_limiter(initial_limit=1, queue_budget=1.0)
+    await limiter.acquire(PRIORITY_NORMAL)
+    limiter.latency = 1.5
+
+    # Low priority gets half the budget, high priority twice as much
+    assert not await limiter.acquire(PRIORITY_LOW)
+    assert not await limiter.acquire(PRIORITY_NORMAL)
+    high = asyncio.create_task(limiter.acquire(PRIORITY_HIGH))
+    await asyncio.sleep(0)
+    assert limiter.stats()["queued"] == 1
+    assert limiter.stats()["rejected_total"] == {"high": 0, "normal": 1, "low": 1}
+
+    # One waiter ahead: two turns of 1.5s on one slot
+    assert limiter.retry_after(PRIORITY_NORMAL) == 3
+    assert limiter.retry_after(PRIORITY_LOW) == 3
+    limiter.release(None)
+    assert await high
+
+
+@pytest.mark.asyncio
+async def test_middleware_sheds_with_503_and_retry_after(monkeypatch):
+    monkeypatch.setattr(overload.settings, "overload_protection", True)
+    limiter = make_limiter(initial_limit=1, max_limit=1, queue_budget=0.0)
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    transport = httpx.ASGITransport(app=LoadSheddingMiddleware(app, limiter))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        assert (await client.get("/api/contacts/1")).status_code == 200
+        await limiter.acquire(PRIORITY_NORMAL)
+        limiter.latency = 2.5
+        resp = await client.get("/api/contacts/1")
+        assert resp.status_code == 503
+        assert resp.headers["Retry-After"] == "3"
+        # Health checks bypass the limiter
+        assert (await client.get("/health")).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_bcrypt_routes_do_not_shrink_the_limit(monkeypatch):
+    monkeypatch.setattr(overload.settings, "overload_protection", True)
+    limiter = make_limiter(initial_limit=8, latency_target=0.01)
+
+    async def slow_app(scope, receive, send):
+        await asyncio.sleep(0.03)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    transport = httpx.ASGITransport(app=LoadSheddingMiddleware(slow_app, limiter))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        for path in ["/auth/login", "/auth/register", "/auth/reset-password"]:
+            assert (await client.post(path)).status_code == 200
+        assert limiter.limit == 8
+        assert limiter.stats()["admitted_total"] == 3
+
+        assert (await client.get("/api/contacts/1")).status_code == 200
+        assert limiter.limit == 4
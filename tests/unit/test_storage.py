@@ -0,0 +1,90 @@
+from io import BytesIO
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app import storage
+from app.auth import get_current_user
+from app.config import settings
+from app.db import get_session
+from app.repositories.users import create_user
+from app.routers.users import router as users_router
+
+
+@pytest.fixture
+async def avatar_client(session, fake, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "avatar_storage", "local")
+    monkeypatch.setattr(settings, "media_root", str(tmp_path))
+    monkeypatch.setattr(settings, "avatar_thumbnail_sizes", "16,32")
+    monkeypatch.setattr(settings, "avatar_thumbnail_workers", 1)
+    user = await create_user(session, email=fake.unique.email(), hashed_password="x")
+
+    async def current_session():
+        yield session
+
+    app = FastAPI()
+    app.include_router(users_router)
+    app.dependency_overrides[get_current_user] = lambda: {"id": user.id, "role": "admin"}
+    app.dependency_overrides[get_session] = current_session
+    app.add_middleware(storage.UploadSizeLimitMiddleware, paths=("/api/users/me/avatar",))
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client, user.id, tmp_path / "avatars"
+    storage.shutdown_thumbnail_pool()
+
+
+@pytest.mark.asyncio
+async def test_local_upload_writes_every_thumbnail_size(avatar_client):
+    Image = pytest.importorskip("PIL.Image")
+    client, user_id, directory = avatar_client
+    png = BytesIO()
+    Image.new("RGB", (100, 50), "red").save(png, "PNG")
+
+    files = {"file": ("avatar.png", png.getvalue(), "image/png")}
+    resp = await client.put("/api/users/me/avatar", files=files)
+    assert resp.status_code == 200, resp.text
+
+    assert (directory / f"user_{user_id}.png").read_bytes() == png.getvalue()
+    for size in settings.avatar_thumbnail_size_list:
+        with Image.open(directory / f"user_{user_id}_{size}.png") as thumb:
+            assert thumb.size == (size, size // 2)
+
+
+@pytest.mark.asyncio
+async def test_oversized_upload_is_refused_from_content_length(avatar_client, monkeypatch):
+    client, _, directory = avatar_client
+    monkeypatch.setattr(settings, "avatar_max_bytes", 1024)
+
+    files = {"file": ("avatar.png", b"x" * (1024 + storage.MULTIPART_OVERHEAD + 1), "image/png")}
+    resp = await client.put("/api/users/me/avatar", files=files)
+    assert resp.status_code == 413
+    assert not directory.exists()
+
+    # A small file goes through the middleware and is stored
+    resp = await client.put("/api/users/me/avatar", files={"file": ("a.png", b"x" * 1024, "image/png")})
+    assert resp.status_code == 200, resp.text
+
+
+@pytest.mark.asyncio
+async def test_size_limit_middleware_does_not_read_the_body():
+    async def app(scope, receive, send):
+        raise AssertionError("request reached the app")
+
+    async def receive():
+        raise AssertionError("body was read")
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    middleware = storage.UploadSizeLimitMiddleware(app, paths=("/upload",), max_bytes=10)
+    scope = {
+        "type": "http",
+        "method": "PUT",
+        "path": "/upload",
+        "headers": [(b"content-length", str(10 + storage.MULTIPART_OVERHEAD + 1).encode())],
+    }
+    await middleware(scope, receive, send)
+    assert sent[0]["status"] == 413
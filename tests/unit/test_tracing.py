@@ -0,0 +1,194 @@
+import json
+
+import httpx
+import pytest
+from fastapi import APIRouter, FastAPI
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.trace import SpanKind, StatusCode
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app import tracing
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+@pytest.fixture
+def use_tracing(monkeypatch):
+    """Install a tracer provider with the given sample ratio; returns its exporter."""
+
+    def install(sample_ratio: float = 1.0) -> InMemorySpanExporter:
+        exporter = InMemorySpanExporter()
+        provider = tracing.build_tracer_provider(SimpleSpanProcessor(exporter), sample_ratio)
+        monkeypatch.setattr(tracing, "tracer_provider", provider)
+        return exporter
+
+    return install
+
+
+@pytest.fixture
+async def client(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'trace.db'}")
+    router = APIRouter(route_class=tracing.TracedRoute)
+
+    @router.get("/items/{item_id}")
+    async def read_item(item_id: int):
+        async with engine.connect() as conn:
+            value = (await conn.execute(text("SELECT :v"), {"v": item_id})).scalar_one()
+        return {"value": value}
+
+    @router.get("/broken")
+    async def broken():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT * FROM missing"))
+
+    app = FastAPI()
+    app.include_router(router)
+    transport = httpx.ASGITransport(app=tracing.TracingMiddleware(app), raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+    await engine.dispose()
+
+
+def servers(exporter):
+    return [s for s in exporter.get_finished_spans() if s.kind == SpanKind.SERVER]
+
+
+@pytest.mark.asyncio
+async def test_middleware_nests_handler_and_db_spans(use_tracing, client):
+    exporter = use_tracing()
+    r = await client.get("/items/7")
+    assert r.status_code == 200
+
+    spans = {s.name: s for s in exporter.get_finished_spans()}
+    server = spans["GET /items/{item_id}"]
+    handler = spans["handler read_item"]
+    query = spans["db.query"]
+    assert server.kind == SpanKind.SERVER
+    assert server.parent is None
+    assert server.attributes["http.route"] == "/items/{item_id}"
+    assert server.attributes["http.response.status_code"] == 200
+    assert handler.parent.span_id == server.context.span_id
+    assert query.parent.span_id == handler.context.span_id
+    assert query.kind == SpanKind.CLIENT
+    assert query.attributes["db.statement"] == "SELECT ?"
+    assert {s.context.trace_id for s in spans.values()} == {server.context.trace_id}
+    assert r.headers["traceresponse"] == (
+        f"00-{server.context.trace_id:032x}-{server.context.span_id:016x}-01"
+    )
+
+
+@pytest.mark.asyncio
+async def test_failures_mark_spans_as_errors(use_tracing, client):
+    exporter = use_tracing()
+    assert (await client.get("/broken")).status_code == 500
+
+    spans = {s.name: s for s in exporter.get_finished_spans()}
+    query = spans["db.query"]
+    assert query.status.status_code == StatusCode.ERROR
+    assert query.events[0].name == "exception"
+    assert spans["handler broken"].status.status_code == StatusCode.ERROR
+    assert spans["GET /broken"].status.status_code == StatusCode.ERROR
+
+
+@pytest.mark.asyncio
+async def test_sampled_parent_is_continued(use_tracing, client):
+    # The caller's decision wins over the ratio
+    exporter = use_tracing(sample_ratio=0.0)
+    r = await client.get("/items/1", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"})
+    assert r.status_code == 200
+    (server,) = servers(exporter)
+    assert f"{server.context.trace_id:032x}" == TRACE_ID
+    assert f"{server.parent.span_id:016x}" == PARENT_ID
+    assert server.parent.is_remote
+    assert r.headers["traceresponse"].startswith(f"00-{TRACE_ID}-")
+
+
+@pytest.mark.asyncio
+async def test_unsampled_parent_is_not_recorded(use_tracing, client):
+    exporter = use_tracing(sample_ratio=1.0)
+    r = await client.get("/items/1", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-00"})
+    assert r.status_code == 200
+    assert exporter.get_finished_spans() == ()
+    assert "traceresponse" not in r.headers
+
+
+@pytest.mark.asyncio
+async def test_new_traces_follow_sample_ratio(use_tracing, client):
+    exporter = use_tracing(sample_ratio=0.0)
+    await client.get("/items/1")
+    assert exporter.get_finished_spans() == ()
+
+    exporter = use_tracing(sample_ratio=1.0)
+    await client.get("/items/1")
+    assert len(servers(exporter)) == 1
+
+
+@pytest.mark.parametrize(
+    "traceparent",
+    [
+        "garbage",
+        f"00-{TRACE_ID}-{PARENT_ID}",
+        f"00-{TRACE_ID[:-1]}g-{PARENT_ID}-01",
+        # Version ff is invalid
+        f"ff-{TRACE_ID}-{PARENT_ID}-01",
+        # All-zero ids are invalid
+        f"00-{'0' * 32}-{PARENT_ID}-01",
+        f"00-{TRACE_ID}-{'0' * 16}-01",
+    ],
+)
+@pytest.mark.asyncio
+async def test_invalid_traceparent_starts_a_new_trace(use_tracing, client, traceparent):
+    exporter = use_tracing(sample_ratio=1.0)
+    await client.get("/items/1", headers={"traceparent": traceparent})
+    (server,) = servers(exporter)
+    assert server.parent is None
+    assert server.context.trace_id not in (0, int(TRACE_ID, 16))
+
+
+@pytest.mark.asyncio
+async def test_no_spans_without_tracer_provider(client, monkeypatch):
+    monkeypatch.setattr(tracing, "tracer_provider", None)
+    r = await client.get("/items/1")
+    assert r.status_code == 200
+    assert "traceresponse" not in r.headers
+    assert tracing.current_span() is None
+    with tracing.root_span("job") as root, tracing.span("step") as child:
+        assert root is None and child is None
+
+
+def test_root_span_ignores_the_active_trace(use_tracing):
+    exporter = use_tracing()
+    with tracing.root_span("outer") as outer:
+        with tracing.root_span("job") as job:
+            assert tracing.current_span() is job
+            with tracing.span("step", attributes={"n": 1}):
+                pass
+        assert tracing.current_span() is outer
+
+    spans = {s.name: s for s in exporter.get_finished_spans()}
+    assert spans["job"].parent is None
+    assert spans["job"].context.trace_id != spans["outer"].context.trace_id
+    assert spans["step"].parent.span_id == spans["job"].context.span_id
+    assert spans["step"].attributes["n"] == 1
+
+
+def test_file_exporter_writes_json_lines(tmp_path, monkeypatch):
+    trace_file = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(tracing.settings, "trace_exporter", "file")
+    monkeypatch.setattr(tracing.settings, "trace_file", str(trace_file))
+    monkeypatch.setattr(tracing, "tracer_provider", tracing._build_tracer_provider())
+
+    with tracing.root_span("job", attributes={"job.id": 3}):
+        with tracing.span("step", SpanKind.CLIENT):
+            pass
+    tracing.flush()
+    tracing.tracer_provider.shutdown()
+
+    lines = [json.loads(line) for line in trace_file.read_text().splitlines()]
+    assert [line["name"] for line in lines] == ["step", "job"]
+    assert lines[0]["kind"] == "SpanKind.CLIENT"
+    assert lines[0]["parent_id"] == lines[1]["context"]["span_id"]
+    assert lines[1]["attributes"] == {"job.id": 3}